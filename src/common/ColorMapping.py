@@ -1,10 +1,32 @@
-import re
-import sys
+import functools
+import hashlib
+import json
+import os
 
 import matplotlib
 import colorsys
+import numpy
+import pandas
 
+from src.common.Utilities import print_to_console
 
+# Characters which are ignored when keys are compared, 'natural-wood' and 'natural_wood' are the same key
+_IGNORED_CHARACTERS = str.maketrans('', '', '-_')
+
+
+def normalize_key(value: str) -> str:
+    """Normalizes a key of the color table.
+
+    Args:
+        value (str): Name of a color or a tag value, e.g. natural_wood.
+
+    Returns:
+        str: The key without '-' and '_'.
+    """
+    return value.translate(_IGNORED_CHARACTERS)
+
+
+@functools.lru_cache(maxsize=None)
 def darken(hex_color, percent):
     """
     Dunkelt eine Hex-Farbe um den angegebenen Prozentsatz ab.
@@ -19,6 +41,7 @@ def darken(hex_color, percent):
     return matplotlib.colors.to_hex(dark_rgb)
 
 
+@functools.lru_cache(maxsize=None)
 def lighten(hex_color, percent):
     """
     Hellt eine Hex-Farbe um den angegebenen Prozentsatz auf.
@@ -34,8 +57,33 @@ def lighten(hex_color, percent):
 
 
 class ColorMapping:
+    """Colors of a style, compiled once into a table of normalized keys with precomputed RGBA tuples.
+
+    The attributes below are the default theme. Themes are json files in src/resources/themes with the colors
+    of the theme, an optional fallback color for keys without color and optionally the theme they extend:
+        {"extends": "default", "fallback": "#ffffff", "colors": {"roads": "#000000"}}
+    Without extends the theme only contains its own colors. Compiled themes are shared by all instances of a
+    process, they are compiled again as soon as one of their files changes.
+    """
+
+    path_to_themes = os.path.join('src', 'resources', 'themes')
+
+    # {(directory of the themes, theme): (versions of the theme files, (colors, rgba colors, fallback))}
+    _compiled_themes = {}
 
-    def __init__(self):
+    # {(theme, normalized key)} of the keys whose fallback was reported, a render looks them up many times
+    _reported_missing = set()
+
+    def __init__(self, theme: str = 'default', fallback: str | None = None):
+        """
+        Args:
+            theme (str, optional): Name of the theme. Defaults to 'default', the colors of this class.
+            fallback (str, optional): Color of keys without color, overrides the fallback of the theme. Without
+                fallback get_color raises a KeyError for those keys. Defaults to None.
+
+        Raises:
+            FileNotFoundError: If the theme does not exist.
+        """
 
         self.roads = '#808080'
         self.buildings = self.roads
@@ -155,13 +203,139 @@ class ColorMapping:
         self.scree = '#E9E1D9'
 
 
-    def get_color(self, value: str) -> str | None:
+        key = (os.path.abspath(self.path_to_themes), theme)
+        compiled = self._compiled_themes.get(key)
+        if compiled is None or any(self.file_version(path) != version for path, version in compiled[0]):
+            files = []
+            compiled = self._compiled_themes[key] = (files, self._compile(self._load_theme(theme, files)))
+        self._colors, self._rgba, theme_fallback = compiled[1]
+
+        self.theme = theme
+
+        self.fallback = theme_fallback if fallback is None else fallback
+        self._fallback_rgba = None if self.fallback is None else matplotlib.colors.to_rgba(self.fallback)
+
+        # Hash of the colors, it changes the key of rendered maps whenever the colors of the theme change
+        self.fingerprint = hashlib.sha256(json.dumps([self._colors, self.fallback], sort_keys=True)
+                                          .encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def file_version(path: str) -> str | None:
+        """Version of a theme file, changes whenever the file is rewritten, None if it does not exist."""
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+    def _load_theme(self, theme: str, files: list) -> tuple:
+        """Loads the colors and the fallback of a theme.
+
+        Args:
+            theme (str): Name of the theme.
+            files (list): The path and version of every file of the theme are appended to it.
+
+        Returns:
+            tuple: The colors in the order of their definition and the fallback color or None.
+        """
+        if theme == 'default':
+            return {key: value for key, value in vars(self).items() if isinstance(value, str)}, None
+
+        path = os.path.abspath(os.path.join(self.path_to_themes, f'{theme}.json'))
+        files.append((path, self.file_version(path)))
+        with open(path, 'r', encoding='utf-8') as f:
+            definition = json.load(f)
+
+        colors, fallback = {}, None
+        if 'extends' in definition:
+            colors, fallback = self._load_theme(definition['extends'], files)
+        colors.update(definition.get('colors', {}))
+
+        return colors, definition.get('fallback', fallback)
+
+    @staticmethod
+    def _compile(theme: tuple) -> tuple:
+        """Compiles the colors of a theme into tables of normalized keys. For keys which are equal after the
+        normalization, the first defined color is used.
+
+        Args:
+            theme (tuple): The colors and the fallback color of the theme.
+
+        Returns:
+            tuple: The hex colors, the RGBA colors and the fallback color.
+        """
+        colors, fallback = theme
+
+        compiled = {}
+        for key, value in colors.items():
+            compiled.setdefault(normalize_key(key), value)
+
+        return compiled, {key: matplotlib.colors.to_rgba(value) for key, value in compiled.items()}, fallback
+
+    def _missing(self, value: str):
+
+        if self.fallback is None:
+            raise KeyError(f'{value} was not found in the colors of theme {self.theme}!')
+
+        if (self.theme, normalize_key(value)) not in self._reported_missing:
+            self._reported_missing.add((self.theme, normalize_key(value)))
+            print_to_console(f'{value} was not found in theme {self.theme}, fallback {self.fallback} is used')
+
+    def get_color(self, value: str) -> str:
+        """Returns the color of a key.
+
+        Args:
+            value (str): Name of the color or a tag value, '-' and '_' are ignored.
+
+        Returns:
+            str: The color, the fallback color if the key has no color.
+
+        Raises:
+            KeyError: If the key has no color and there is no fallback.
+        """
+        color = self._colors.get(normalize_key(value))
+        if color is None:
+            self._missing(value)
+            return self.fallback
+
+        return color
+
+    def get_rgba(self, value: str, alpha: float | None = None) -> tuple:
+        """Returns the color of a key as RGBA tuple.
+
+        Args:
+            value (str): Name of the color or a tag value, '-' and '_' are ignored.
+            alpha (float, optional): Replaces the alpha of the color. Defaults to None.
+
+        Returns:
+            tuple: (red, green, blue, alpha) between 0 and 1.
+
+        Raises:
+            KeyError: If the key has no color and there is no fallback.
+        """
+        rgba = self._rgba.get(normalize_key(value))
+        if rgba is None:
+            self._missing(value)
+            rgba = self._fallback_rgba
+
+        return rgba if alpha is None else (*rgba[:3], alpha)
+
+    def map_series(self, series: pandas.Series, alpha: float | None = None) -> numpy.ndarray:
+        """Maps a whole category column to colors, each distinct value is only looked up once.
 
-        for k,v in self.__dict__.items():
+        Args:
+            series (pandas.Series): The values, e.g. the landuse column of a layer.
+            alpha (float, optional): Replaces the alpha of the colors. Defaults to None.
 
-            if re.sub('[-_]', "", k) == re.sub('[-_]', "", value):
+        Returns:
+            numpy.ndarray: Array of shape (len(series), 4) with the RGBA color of every value.
 
-                return v
+        Raises:
+            KeyError: If a value has no color and there is no fallback. Missing values (NaN) have no color.
+        """
+        codes, uniques = pandas.factorize(series, use_na_sentinel=False)
+        palette = numpy.array([self.get_rgba(value if isinstance(value, str) else str(value), alpha)
+                               for value in uniques], dtype=float).reshape(-1, 4)
 
-        print(value + " was not found!")
-        sys.exit(-1)
+        return palette[codes]
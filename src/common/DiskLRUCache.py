@@ -0,0 +1,147 @@
+import hashlib
+import os
+import time
+
+from src.common.SQLiteStore import SQLiteStore
+
+
+class DiskLRUCache(SQLiteStore):
+    """Cache of binary values, e.g. rendered images, in a directory with a size based LRU eviction.
+
+    Every value is stored in its own file, named by the hash of its key, and written atomically. The index of
+    the entries with their size and last access lives in a SQLite database in WAL mode, so the cache can be
+    shared by the threads and processes of a server. As soon as the size of all values exceeds max_bytes, the
+    least recently used values are removed.
+    """
+
+    schema = ('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+              'last_access REAL NOT NULL)',
+              'CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+
+    check_same_thread = False
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            path (str): Directory of the cache, created if it does not exist.
+            max_bytes (int, optional): Maximal size of all values in bytes. Defaults to 512 MB.
+        """
+        super().__init__(os.path.join(path, 'index.sqlite'))
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def arguments(self) -> dict:
+        return {'path': self.path, 'max_bytes': self.max_bytes}
+
+    def file_of(self, key: str) -> str:
+        """Path of the file of a value."""
+        return os.path.join(self.path, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def __contains__(self, key: str) -> bool:
+        return self.connection().execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def current_bytes(self) -> int:
+        return self.connection().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the value and marks it as recently used.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            bytes | None: The value or None, if it is not cached.
+        """
+        connection = self.connection()
+        if connection.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is None:
+            self.misses += 1
+            return None
+
+        try:
+            with open(self.file_of(key), 'rb') as f:
+                value = f.read()
+        except FileNotFoundError:
+            # Removed by the eviction of another process
+            self.remove(key)
+            self.misses += 1
+            return None
+
+        with connection:
+            connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        self.hits += 1
+
+        return value
+
+    def put(self, key: str, value: bytes):
+        """Stores the value and evicts the least recently used values, until the size is kept. A value which is
+        larger than max_bytes is not stored.
+
+        Args:
+            key (str): The key.
+            value (bytes): The value.
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        connection = self.connection()
+        path = self.file_of(key)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as f:
+            f.write(value)
+        os.replace(temporary_path, path)
+
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, len(value), time.time()))
+
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used values, until the size of all values is at most max_bytes."""
+
+        connection = self.connection()
+        excess = self.current_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+
+        evicted = []
+        for key, size in connection.execute('SELECT key, size FROM entries ORDER BY last_access, rowid'):
+            if excess <= 0:
+                break
+            evicted.append(key)
+            excess -= size
+
+        for key in evicted:
+            self.remove(key)
+        self.evictions += len(evicted)
+
+    def remove(self, key: str):
+
+        connection = self.connection()
+        with connection:
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self.file_of(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+
+        keys = [row[0] for row in self.connection().execute('SELECT key FROM entries')]
+        for key in keys:
+            self.remove(key)
+
+    def statistics(self) -> dict:
+        """Returns the counters of the cache.
+
+        Returns:
+            dict: hits, misses, evictions, entries and bytes.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self), 'bytes': self.current_bytes()}
@@ -0,0 +1,339 @@
+import lzma
+import os
+import struct
+import zlib
+from multiprocessing import Pool
+
+import numpy as np
+
+# Field numbers of the osm pbf format, see https://wiki.openstreetmap.org/wiki/PBF_Format
+BLOB_RAW = 1
+BLOB_ZLIB_DATA = 3
+BLOB_LZMA_DATA = 4
+HEADER_BLOCK_BBOX = 1
+HEADER_BLOCK_REQUIRED_FEATURES = 4
+HEADER_BLOCK_OPTIONAL_FEATURES = 5
+PRIMITIVE_BLOCK_GROUP = 2
+PRIMITIVE_BLOCK_GRANULARITY = 17
+PRIMITIVE_BLOCK_LAT_OFFSET = 19
+PRIMITIVE_BLOCK_LON_OFFSET = 20
+PRIMITIVE_GROUP_NODES = 1
+PRIMITIVE_GROUP_DENSE = 2
+NODE_LAT = 8
+NODE_LON = 9
+DENSE_NODES_LAT = 8
+DENSE_NODES_LON = 9
+
+
+def read_varint(data: bytes, position: int) -> tuple:
+
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def iter_fields(data: bytes):
+    """Iterates over the fields of a protobuf message.
+
+    Yields:
+        tuple: (field number, wire type, value), the value is an int for varints and bytes otherwise.
+    """
+    position = 0
+    length = len(data)
+    while position < length:
+        key, position = read_varint(data, position)
+        field, wire_type = key >> 3, key & 0x07
+
+        if wire_type == 0:
+            value, position = read_varint(data, position)
+        elif wire_type == 2:
+            size, position = read_varint(data, position)
+            value = data[position:position + size]
+            position += size
+        elif wire_type == 1:
+            value = data[position:position + 8]
+            position += 8
+        elif wire_type == 5:
+            value = data[position:position + 4]
+            position += 4
+        else:
+            raise ValueError(f'Unsupported protobuf wire type: {wire_type}')
+
+        yield field, wire_type, value
+
+
+def decode_packed_sint64(data: bytes) -> np.ndarray:
+    """Decodes a packed array of zigzag encoded varints with NumPy.
+
+    Args:
+        data (bytes): The packed field.
+
+    Returns:
+        np.ndarray: The values as int64.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if len(raw) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Every varint ends with a byte without the continuation bit
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+
+    # Adds the k-th byte of all varints which are longer than k bytes, coordinate deltas have only a few bytes
+    values = (raw[starts] & 0x7f).astype(np.uint64)
+    for k in range(1, int(lengths.max())):
+        selection = np.flatnonzero(lengths > k)
+        values[selection] |= (raw[starts[selection] + k] & 0x7f).astype(np.uint64) << np.uint64(7 * k)
+
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def decode_blob(data: bytes) -> bytes:
+
+    for field, _, value in iter_fields(data):
+        if field == BLOB_RAW:
+            return value
+        if field == BLOB_ZLIB_DATA:
+            return zlib.decompress(value)
+        if field == BLOB_LZMA_DATA:
+            return lzma.decompress(value)
+
+    raise ValueError('Unsupported blob compression, only raw, zlib and lzma are supported')
+
+
+def decode_node_coordinates(block: bytes) -> tuple | None:
+    """Decodes the coordinates of all nodes of a primitive block.
+
+    Args:
+        block (bytes): The decompressed primitive block.
+
+    Returns:
+        tuple | None: (lons, lats) as float64 arrays or None, if the block contains no nodes.
+    """
+    granularity = 100
+    lat_offset = 0
+    lon_offset = 0
+    lat_parts, lon_parts = [], []
+
+    for field, _, value in iter_fields(block):
+
+        if field == PRIMITIVE_BLOCK_GRANULARITY:
+            granularity = value
+        elif field == PRIMITIVE_BLOCK_LAT_OFFSET:
+            lat_offset = value
+        elif field == PRIMITIVE_BLOCK_LON_OFFSET:
+            lon_offset = value
+        elif field == PRIMITIVE_BLOCK_GROUP:
+
+            # A group contains only one type of objects, groups of ways and relations are skipped unparsed
+            if len(value) == 0 or read_varint(value, 0)[0] >> 3 not in (PRIMITIVE_GROUP_NODES, PRIMITIVE_GROUP_DENSE):
+                continue
+
+            for group_field, _, group_value in iter_fields(value):
+
+                if group_field == PRIMITIVE_GROUP_DENSE:
+                    for dense_field, _, dense_value in iter_fields(group_value):
+                        if dense_field == DENSE_NODES_LAT:
+                            lat_parts.append(np.cumsum(decode_packed_sint64(dense_value)))
+                        elif dense_field == DENSE_NODES_LON:
+                            lon_parts.append(np.cumsum(decode_packed_sint64(dense_value)))
+
+                elif group_field == PRIMITIVE_GROUP_NODES:
+                    lat, lon = 0, 0
+                    for node_field, _, node_value in iter_fields(group_value):
+                        if node_field == NODE_LAT:
+                            lat = zigzag(node_value)
+                        elif node_field == NODE_LON:
+                            lon = zigzag(node_value)
+                    lat_parts.append(np.array([lat], dtype=np.int64))
+                    lon_parts.append(np.array([lon], dtype=np.int64))
+
+    if len(lat_parts) == 0:
+        return None
+
+    lats = (lat_offset + granularity * np.concatenate(lat_parts)) * 1e-9
+    lons = (lon_offset + granularity * np.concatenate(lon_parts)) * 1e-9
+
+    return lons, lats
+
+
+def _bounds_of_blobs(args) -> tuple:
+    """Worker of PbfReader.compute_bounds, returns (lon min, lon max, lat min, lat max, node count, reached ways)
+    of the blobs, reached ways is set if the blobs of a file sorted by type ended with the nodes."""
+    path, blobs, sorted_by_type = args
+
+    bounds = [np.inf, -np.inf, np.inf, -np.inf, 0]
+    with open(path, 'rb') as f:
+        for offset, size in blobs:
+            f.seek(offset)
+            coordinates = decode_node_coordinates(decode_blob(f.read(size)))
+
+            if coordinates is None:
+                # In a file sorted by type all following blocks contain ways and relations only
+                if sorted_by_type:
+                    return tuple(bounds) + (True,)
+                continue
+
+            lons, lats = coordinates
+            if len(lons) > 0:
+                bounds = [min(bounds[0], lons.min()), max(bounds[1], lons.max()),
+                          min(bounds[2], lats.min()), max(bounds[3], lats.max()), bounds[4] + len(lons)]
+
+    return tuple(bounds) + (False,)
+
+
+class PbfReader:
+    """Reader for the header and the node coordinates of osm pbf files, without osmconvert or pyosmium."""
+
+    def __init__(self, path: str):
+
+        self.path = path
+        self.header_bbox = None
+        self.required_features = []
+        self.optional_features = []
+        self.data_blobs = []
+        self._read_structure()
+
+    def _read_structure(self):
+        """Reads the header block and the positions of all data blobs, the data blobs are skipped."""
+
+        file_size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            while f.tell() < file_size:
+
+                header_size = struct.unpack('>I', f.read(4))[0]
+                blob_type, data_size = None, 0
+                for field, _, value in iter_fields(f.read(header_size)):
+                    if field == 1:
+                        blob_type = value.decode('utf-8')
+                    elif field == 3:
+                        data_size = value
+
+                if blob_type == 'OSMHeader':
+                    self._read_header(decode_blob(f.read(data_size)))
+                elif blob_type == 'OSMData':
+                    self.data_blobs.append((f.tell(), data_size))
+                    f.seek(data_size, os.SEEK_CUR)
+                else:
+                    f.seek(data_size, os.SEEK_CUR)
+
+    def _read_header(self, header_block: bytes):
+
+        for field, _, value in iter_fields(header_block):
+            if field == HEADER_BLOCK_BBOX:
+                bbox = {bbox_field: zigzag(bbox_value) * 1e-9 for bbox_field, _, bbox_value in iter_fields(value)}
+                if len(bbox) == 4:
+                    # left, right, top, bottom
+                    self.header_bbox = (bbox[1], bbox[2], bbox[4], bbox[3])
+            elif field == HEADER_BLOCK_REQUIRED_FEATURES:
+                self.required_features.append(value.decode('utf-8'))
+            elif field == HEADER_BLOCK_OPTIONAL_FEATURES:
+                self.optional_features.append(value.decode('utf-8'))
+
+    @property
+    def sorted_by_type(self) -> bool:
+        """Whether all nodes are stored before the ways and relations, declared as optional feature."""
+        return 'Sort.Type_then_ID' in self.optional_features
+
+    def iter_node_coordinates(self):
+        """Iterates over the node coordinates of all data blobs.
+
+        Yields:
+            tuple: (lons, lats) as float64 arrays per blob.
+        """
+        with open(self.path, 'rb') as f:
+            for offset, size in self.data_blobs:
+                f.seek(offset)
+                coordinates = decode_node_coordinates(decode_blob(f.read(size)))
+                if coordinates is None:
+                    if self.sorted_by_type:
+                        break
+                    continue
+                yield coordinates
+
+    def compute_bounds(self, processes: int = 1) -> tuple | None:
+        """Computes the bounds of all nodes, the blobs are decoded in parallel.
+
+        Args:
+            processes (int, optional): Number of worker processes. Defaults to 1.
+
+        Returns:
+            tuple | None: (lon min, lon max, lat min, lat max, node count) or None, if the file contains no nodes.
+        """
+        # Contiguous ranges of blobs per task in file order, sorted files stop at the range with the first way
+        task_count = max(1, min(len(self.data_blobs), processes * 4))
+        size = max(1, -(-len(self.data_blobs) // task_count))
+        tasks = [(self.path, self.data_blobs[i:i + size], self.sorted_by_type)
+                 for i in range(0, len(self.data_blobs), size)]
+
+        if processes > 1 and len(tasks) > 1:
+            with Pool(processes=processes) as pool:
+                results = self._collect_bounds(pool.imap(_bounds_of_blobs, tasks))
+        else:
+            results = self._collect_bounds(map(_bounds_of_blobs, tasks))
+
+        node_count = sum(result[4] for result in results)
+        if node_count == 0:
+            return None
+
+        return (min(result[0] for result in results), max(result[1] for result in results),
+                min(result[2] for result in results), max(result[3] for result in results), node_count)
+
+    @staticmethod
+    def _collect_bounds(results) -> list:
+        """Collects the results of the tasks in order, the tasks after the first one which reached the ways of a
+        sorted file are not needed, they are dropped along with the pool."""
+
+        collected = []
+        for result in results:
+            collected.append(result)
+            if result[5]:
+                break
+        return collected
+
+    def statistics(self, use_header_bbox: bool = True, processes: int = 1) -> dict:
+        """Returns the bounds of the file in the format of osm_statistics_to_dict.
+
+        Args:
+            use_header_bbox (bool, optional): Uses the bounding box of the header, if present. It may be larger
+                than the data, e.g. the bounding box of an extract. Defaults to True.
+            processes (int, optional): Number of worker processes for decoding. Defaults to 1.
+
+        Returns:
+            dict: The statistics, an empty dict if the file contains no nodes.
+        """
+        if use_header_bbox and self.header_bbox is not None:
+            lon_min, lon_max, lat_min, lat_max = self.header_bbox
+            statistics_dict = {}
+        else:
+            bounds = self.compute_bounds(processes)
+            if bounds is None:
+                return {}
+            lon_min, lon_max, lat_min, lat_max, node_count = bounds
+            statistics_dict = {'nodes': f' {node_count}'}
+
+        return {
+            'lon min': f' {lon_min:.7f}',
+            'lon max': f' {lon_max:.7f}',
+            'lat min': f' {lat_min:.7f}',
+            'lat max': f' {lat_max:.7f}',
+            **statistics_dict
+        }
+
+
+def read_pbf_statistics(file_path: str, use_header_bbox: bool = True, processes: int = 1) -> dict:
+    """Fast replacement of extract_osm_statistics for the bounds of a pbf file, see PbfReader.statistics"""
+    return PbfReader(file_path).statistics(use_header_bbox, processes)
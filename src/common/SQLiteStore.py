@@ -0,0 +1,58 @@
+import os
+import sqlite3
+
+
+class SQLiteStore:
+    """Base of the stores in a SQLite database in WAL mode, which are shared by the pool workers.
+
+    Connections can not be shared between processes, so every process opens its own connection on first use and
+    only the arguments of the store are pickled. Subclasses define the tables in schema and return their
+    arguments in arguments().
+    """
+
+    # Statements which create the tables and indexes of the store
+    schema = ()
+
+    # A server shares the connection between its threads
+    check_same_thread = True
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the database, the directory is created if it does not exist.
+        """
+        self.database_path = path
+        self._connection = None
+        self._pid = None
+
+    def arguments(self) -> dict:
+        """Returns the arguments of __init__ which restore the store in another process."""
+        return {'path': self.database_path}
+
+    def __getstate__(self):
+        return self.arguments()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def connection(self) -> sqlite3.Connection:
+
+        if self._connection is None or self._pid != os.getpid():
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.database_path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.database_path, timeout=60,
+                                               check_same_thread=self.check_same_thread)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.schema:
+                self._connection.execute(statement)
+            self._connection.commit()
+            self._pid = os.getpid()
+
+        return self._connection
+
+    def close(self):
+        # The connection of the parent process is left to the parent
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
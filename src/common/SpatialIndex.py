@@ -0,0 +1,266 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from src.common.Utilities import print_to_console
+
+# Loaded indexes of this process: {path to cache file: (mtime_ns, size, SpatialIndex)}
+_loaded_indexes = {}
+
+
+class SpatialIndex:
+    """STR-packed R-tree over the bounding boxes of the preprocessed files.
+
+    The leaf level holds the bounding boxes of the cache file as floats in the order
+    [lon min, lon max, lat min, lat max]. The leaves are ordered with the sort-tile-recursive algorithm,
+    so that each group of `node_capacity` consecutive entries is spatially close, and every upper level
+    packs `node_capacity` consecutive nodes of the level below. Because of that the children of node i
+    are always the entries i * node_capacity up to (i + 1) * node_capacity - 1 and no pointers are stored.
+
+    The tree is built over the core bounding boxes of the sub files. Next to them the halos, the areas which
+    were extracted into the files, are kept, see tile_of. Files without a core are indexed by their bounds.
+    """
+
+    node_capacity = 16
+
+    def __init__(self, keys: np.ndarray, boxes: np.ndarray, levels: list, halos: np.ndarray | None = None):
+
+        self.keys = keys
+        self.boxes = boxes
+        self.halos = boxes if halos is None else halos
+        self.areas = (boxes[:, 1] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 2])
+
+        # levels[0] are the parents of the leaves, levels[-1] is the root level
+        self.levels = levels
+
+    @classmethod
+    def build(cls, keys: list, boxes: np.ndarray, halos: np.ndarray | None = None):
+        """Bulk loads the tree with the sort-tile-recursive algorithm.
+
+        Args:
+            keys (list): Keys of the cache file (paths of the preprocessed files).
+            boxes (np.ndarray): Array of shape (n, 4) with [lon min, lon max, lat min, lat max] per key.
+            halos (np.ndarray, optional): The halos in the same layout. Defaults to the boxes.
+
+        Returns:
+            SpatialIndex: The packed index.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        halos = boxes if halos is None else np.asarray(halos, dtype=np.float64).reshape(-1, 4)
+        keys = np.asarray(keys, dtype=str)
+
+        # Sort by the longitudinal center, cut into vertical slices and sort every slice by the latitude center
+        count = len(boxes)
+        leaf_count = math.ceil(count / cls.node_capacity)
+        slice_count = max(1, math.ceil(math.sqrt(leaf_count)))
+        slice_size = slice_count * cls.node_capacity
+
+        order = np.argsort((boxes[:, 0] + boxes[:, 1]) / 2, kind='stable')
+        lat_center = (boxes[:, 2] + boxes[:, 3]) / 2
+        for start in range(0, count, slice_size):
+            part = order[start:start + slice_size]
+            order[start:start + slice_size] = part[np.argsort(
+                lat_center[part], kind='stable')]
+
+        boxes = boxes[order]
+        halos = halos[order]
+        keys = keys[order]
+
+        levels = []
+        level = boxes
+        while len(level) > 1 or len(levels) == 0:
+            level = cls._pack_level(level)
+            levels.append(level)
+
+        return cls(keys, boxes, levels, halos)
+
+    @classmethod
+    def _pack_level(cls, boxes: np.ndarray) -> np.ndarray:
+
+        node_count = math.ceil(len(boxes) / cls.node_capacity)
+        padding = node_count * cls.node_capacity - len(boxes)
+
+        # Pad with boxes which never contain or enlarge anything
+        padded = np.concatenate(
+            [boxes, np.tile([np.inf, -np.inf, np.inf, -np.inf], (padding, 1))])
+        grouped = padded.reshape(node_count, cls.node_capacity, 4)
+
+        return np.stack([grouped[:, :, 0].min(axis=1), grouped[:, :, 1].max(axis=1),
+                         grouped[:, :, 2].min(axis=1), grouped[:, :, 3].max(axis=1)], axis=1)
+
+    @classmethod
+    def from_cache_file(cls, cache_file_path: str):
+        """Builds the index from a cache file of the preprocessor.
+
+        Args:
+            cache_file_path (str): Path to the cache file.
+
+        Returns:
+            SpatialIndex: The packed index.
+        """
+        with open(cache_file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        keys = list(data.keys())
+        boxes = np.array([box_of(data[key], 'core') for key in keys], dtype=np.float64).reshape(-1, 4)
+        halos = np.array([box_of(data[key], 'halo') for key in keys], dtype=np.float64).reshape(-1, 4)
+
+        return cls.build(keys, boxes, halos)
+
+    def save(self, path: str, source_mtime_ns: int, source_size: int):
+        """Stores the index with the stamp of the cache file it was built from.
+
+        Args:
+            path (str): Target path of the index file.
+            source_mtime_ns (int): Modification time of the cache file.
+            source_size (int): Size of the cache file.
+        """
+        levels = {f'level_{i}': level for i, level in enumerate(self.levels)}
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, keys=self.keys, boxes=self.boxes, halos=self.halos, source_mtime_ns=source_mtime_ns,
+                     source_size=source_size, node_capacity=self.node_capacity, **levels)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, source_mtime_ns: int, source_size: int):
+        """Loads a stored index, if it was built from the given state of the cache file.
+
+        Args:
+            path (str): Path of the index file.
+            source_mtime_ns (int): Modification time of the cache file.
+            source_size (int): Size of the cache file.
+
+        Returns:
+            SpatialIndex | None: The index or None, if it is missing or outdated.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['source_mtime_ns']) != source_mtime_ns or int(data['source_size']) != source_size \
+                    or int(data['node_capacity']) != cls.node_capacity or 'halos' not in data.files:
+                return None
+
+            level_count = len([name for name in data.files if name.startswith('level_')])
+            levels = [data[f'level_{i}'] for i in range(level_count)]
+
+            return cls(data['keys'], data['boxes'], levels, data['halos'])
+
+    def _search(self, lon_min: float, lon_max: float, lat_min: float, lat_max: float, contains: bool) -> np.ndarray:
+
+        def matches(boxes):
+            if contains:
+                return (boxes[:, 0] <= lon_min) & (lon_max <= boxes[:, 1]) & \
+                    (boxes[:, 2] <= lat_min) & (lat_max <= boxes[:, 3])
+            return (boxes[:, 0] <= lon_max) & (lon_min <= boxes[:, 1]) & \
+                (boxes[:, 2] <= lat_max) & (lat_min <= boxes[:, 3])
+
+        # Walk the tree level by level, only descending into nodes whose box matches
+        candidates = np.arange(len(self.levels[-1]))
+        for boxes in reversed([self.boxes] + self.levels):
+            candidates = candidates[candidates < len(boxes)]
+            candidates = candidates[matches(boxes[candidates])]
+            if boxes is self.boxes or len(candidates) == 0:
+                break
+            candidates = (candidates[:, None] * self.node_capacity +
+                          np.arange(self.node_capacity)).ravel()
+
+        return candidates
+
+    def smallest_covering(self, lon_min: float, lon_max: float, lat_min: float, lat_max: float) -> str | None:
+        """Returns the key of the smallest box which fully contains the given bounding box.
+
+        Returns:
+            str | None: The key or None, if no box contains the bounding box.
+        """
+        hits = self._search(lon_min, lon_max, lat_min, lat_max, contains=True)
+        if len(hits) == 0:
+            return None
+
+        return str(self.keys[hits[np.argmin(self.areas[hits])]])
+
+    def tile_of(self, lon_min: float, lon_max: float, lat_min: float, lat_max: float) -> str | None:
+        """Returns the key of the file which holds the whole bounding box: the bounding box is matched against
+        the cores and the file, whose halo contains it, is selected. The file whose core contains the center of
+        the bounding box is preferred, then the smallest one.
+
+        Returns:
+            str | None: The key or None, if no halo contains the bounding box.
+        """
+        hits = self._search(lon_min, lon_max, lat_min, lat_max, contains=False)
+        halos = self.halos[hits]
+        hits = hits[(halos[:, 0] <= lon_min) & (lon_max <= halos[:, 1]) &
+                    (halos[:, 2] <= lat_min) & (lat_max <= halos[:, 3])]
+        if len(hits) == 0:
+            return None
+
+        lon, lat = (lon_min + lon_max) / 2, (lat_min + lat_max) / 2
+        boxes = self.boxes[hits]
+        centered = (boxes[:, 0] <= lon) & (lon <= boxes[:, 1]) & (boxes[:, 2] <= lat) & (lat <= boxes[:, 3])
+
+        return str(self.keys[hits[np.lexsort((self.areas[hits], ~centered))[0]]])
+
+    def intersecting(self, lon_min: float, lon_max: float, lat_min: float, lat_max: float) -> list:
+        """Returns the keys of all boxes which intersect the given bounding box.
+
+        Returns:
+            list: The keys, ordered from the smallest to the largest box.
+        """
+        hits = self._search(lon_min, lon_max, lat_min, lat_max, contains=False)
+        hits = hits[np.argsort(self.areas[hits], kind='stable')]
+
+        return [str(key) for key in self.keys[hits]]
+
+
+def box_of(entry: dict, extent: str) -> list:
+    """Returns the core or halo of an entry of the cache file. Entries without them, e.g. of files which were
+    not splitted or of older cache files, are described by the bounds of their nodes.
+
+    Args:
+        entry (dict): The entry of the file.
+        extent (str): 'core' or 'halo'.
+
+    Returns:
+        list: [lon min, lon max, lat min, lat max]
+    """
+    box = entry.get(extent, entry)
+    return [float(box['lon min']), float(box['lon max']), float(box['lat min']), float(box['lat max'])]
+
+
+def index_path_of(cache_file_path: str) -> str:
+    """Path of the stored index next to the cache file, e.g. cache_file_<date>.index.npz"""
+    return os.path.splitext(cache_file_path)[0] + '.index.npz'
+
+
+def load_spatial_index(cache_file_path: str) -> SpatialIndex:
+    """Returns the spatial index of the cache file. The index is kept once per process and loaded from
+    (or written to) the index file next to the cache file. If the cache file changes, it is reloaded.
+
+    Args:
+        cache_file_path (str): Path to the cache file.
+
+    Returns:
+        SpatialIndex: The index of the current state of the cache file.
+    """
+    stat = os.stat(cache_file_path)
+    loaded = _loaded_indexes.get(cache_file_path)
+    if loaded is not None and loaded[0] == stat.st_mtime_ns and loaded[1] == stat.st_size:
+        return loaded[2]
+
+    index_path = index_path_of(cache_file_path)
+    spatial_index = SpatialIndex.load(index_path, stat.st_mtime_ns, stat.st_size)
+    if spatial_index is None:
+
+        print_to_console(f'Building spatial index for: {cache_file_path}')
+        spatial_index = SpatialIndex.from_cache_file(cache_file_path)
+        try:
+            spatial_index.save(index_path, stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            print_to_console(f'Spatial index could not be stored at {index_path}: {e}')
+
+    _loaded_indexes[cache_file_path] = (stat.st_mtime_ns, stat.st_size, spatial_index)
+
+    return spatial_index
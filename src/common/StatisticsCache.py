@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from src.common.SQLiteStore import SQLiteStore
+
+
+class StatisticsCache(SQLiteStore):
+    """Cache of the osmconvert statistics of osm files.
+
+    The statistics are stored in a SQLite database in WAL mode, which is shared by all pool workers, with an
+    in-memory LRU in front of it. An entry is keyed by the path, size and modification time of the file and
+    optionally by a hash of the first and last megabyte, so an unchanged file is never scanned again.
+    """
+
+    sample_size = 1024 * 1024
+
+    schema = ('CREATE TABLE IF NOT EXISTS statistics (path TEXT, size INTEGER, mtime_ns INTEGER, content_hash TEXT, '
+              'statistics TEXT NOT NULL, lon_min REAL, lon_max REAL, lat_min REAL, lat_max REAL, '
+              'PRIMARY KEY (path, size, mtime_ns, content_hash))',)
+
+    def __init__(self, path: str, memory_size: int = 1024, use_content_hash: bool = False):
+        """
+        Args:
+            path (str): Path of the database.
+            memory_size (int, optional): Number of entries kept in memory. Defaults to 1024.
+            use_content_hash (bool, optional): Adds a hash of the file content to the key. Defaults to False.
+        """
+        super().__init__(path)
+        self.path = path
+        self.memory_size = memory_size
+        self.use_content_hash = use_content_hash
+
+        self._memory = OrderedDict()
+
+    def arguments(self) -> dict:
+        return {'path': self.path, 'memory_size': self.memory_size, 'use_content_hash': self.use_content_hash}
+
+    def key(self, file_path: str) -> tuple:
+
+        stat = os.stat(file_path)
+        content_hash = ''
+        if self.use_content_hash:
+            digest = hashlib.blake2b(str(stat.st_size).encode())
+            with open(file_path, 'rb') as f:
+                digest.update(f.read(self.sample_size))
+                f.seek(max(0, stat.st_size - self.sample_size))
+                digest.update(f.read(self.sample_size))
+            content_hash = digest.hexdigest()
+
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, content_hash
+
+    def _remember(self, key: tuple, value: tuple):
+
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, file_path: str) -> tuple | None:
+
+        key = self.key(file_path)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        row = self.connection().execute(
+            'SELECT statistics, lon_min, lon_max, lat_min, lat_max FROM statistics '
+            'WHERE path = ? AND size = ? AND mtime_ns = ? AND content_hash = ?', key).fetchone()
+        if row is None:
+            return None
+
+        value = (json.loads(row[0]), None if row[1] is None else tuple(row[1:]))
+        self._remember(key, value)
+        return value
+
+    def get(self, file_path: str) -> dict | None:
+        """Returns the cached statistics of the file.
+
+        Args:
+            file_path (str): Path to the osm file.
+
+        Returns:
+            dict | None: The statistics in the format of osm_statistics_to_dict or None, if the file is unknown.
+        """
+        value = self._lookup(file_path)
+        return None if value is None else dict(value[0])
+
+    def bounding_box(self, file_path: str) -> tuple | None:
+        """Returns the cached bounding box of the file as floats.
+
+        Returns:
+            tuple | None: (lon min, lon max, lat min, lat max) or None, if the file is unknown or empty.
+        """
+        value = self._lookup(file_path)
+        return None if value is None else value[1]
+
+    def put(self, file_path: str, statistics: dict):
+        """Stores the statistics of the file.
+
+        Args:
+            file_path (str): Path to the osm file.
+            statistics (dict): The statistics in the format of osm_statistics_to_dict.
+        """
+        key = self.key(file_path)
+        bounding_box = None
+        if all(name in statistics for name in ['lon min', 'lon max', 'lat min', 'lat max']):
+            bounding_box = (float(statistics['lon min']), float(statistics['lon max']),
+                            float(statistics['lat min']), float(statistics['lat max']))
+
+        connection = self.connection()
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO statistics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               key + (json.dumps(statistics),) + (bounding_box or (None, None, None, None)))
+
+        self._remember(key, (dict(statistics), bounding_box))
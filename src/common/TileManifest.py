@@ -0,0 +1,80 @@
+import json
+import os
+
+from src.common.SQLiteStore import SQLiteStore
+
+
+class TileManifest(SQLiteStore):
+    """Manifest of the preprocessed files, stored in a SQLite database in WAL mode.
+
+    Every pool worker opens its own connection, so entries can be written concurrently without reading and
+    rewriting the whole cache file. At the end of a run the manifest is exported to the known cache file
+    layout: {path of the preprocessed file: {'lon min': ..., 'lon max': ..., 'lat min': ..., 'lat max': ...}}
+    """
+
+    schema = ('CREATE TABLE IF NOT EXISTS tiles (key TEXT PRIMARY KEY, value TEXT NOT NULL)',)
+
+    def __init__(self, path: str):
+
+        super().__init__(path)
+        self.path = path
+
+    def append(self, key: str, value: dict):
+        """Adds or replaces one entry.
+
+        Args:
+            key (str): Path of the preprocessed file.
+            value (dict): Statistics of the file.
+        """
+        self.append_many([(key, value)])
+
+    def append_many(self, items: list):
+        """Adds or replaces multiple entries within one transaction.
+
+        Args:
+            items (list): List of (key, value) pairs.
+        """
+        connection = self.connection()
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO tiles (key, value) VALUES (?, ?)',
+                                   [(key, json.dumps(value, ensure_ascii=False)) for key, value in items])
+
+    def remove(self, key: str):
+        connection = self.connection()
+        with connection:
+            connection.execute('DELETE FROM tiles WHERE key = ?', (key,))
+
+    def entries(self) -> dict:
+        """Returns all entries in the order they were added."""
+        rows = self.connection().execute('SELECT key, value FROM tiles ORDER BY rowid')
+        return {key: json.loads(value) for key, value in rows}
+
+    def __len__(self):
+        return self.connection().execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+
+    def import_json(self, cache_file_path: str):
+        """Adds all entries of an existing cache file.
+
+        Args:
+            cache_file_path (str): Path to the cache file.
+        """
+        with open(cache_file_path, "r", encoding="utf-8") as f:
+            self.append_many(list(json.load(f).items()))
+
+    def export_json(self, cache_file_path: str):
+        """Writes the manifest in the cache file layout. The file is replaced atomically, so readers never
+        see a partially written cache file.
+
+        Args:
+            cache_file_path (str): Path to the cache file.
+        """
+        tmp_path = f'{cache_file_path}.tmp'
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries(), f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, cache_file_path)
+
+    def compact(self):
+        """Merges the write-ahead log into the database and frees unused pages."""
+        connection = self.connection()
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        connection.execute('VACUUM')
@@ -14,7 +14,23 @@ def print_to_console(message:str):
     print(f'{current_datetime} (Thread: {multiprocessing.current_process().name}): {message}')
 
 
-def extract_osm_statistics(osm_convert_path: str, file_path: str) -> dict:
+def extract_osm_statistics(osm_convert_path: str, file_path: str, statistics_cache=None) -> dict:
+    """Runs osmconvert --out-statistics for the file. With a StatisticsCache the result is reused, as long as the
+    file is unchanged.
+
+    Args:
+        osm_convert_path (str): Path to the osmconvert executable.
+        file_path (str): Path to the osm file.
+        statistics_cache (StatisticsCache, optional): Cache of the statistics. Defaults to None.
+
+    Returns:
+        dict: The statistics, see osm_statistics_to_dict
+    """
+
+    if statistics_cache is not None:
+        statistics_dict = statistics_cache.get(file_path)
+        if statistics_dict is not None:
+            return statistics_dict
 
     command = [
         osm_convert_path,
@@ -32,7 +48,11 @@ def extract_osm_statistics(osm_convert_path: str, file_path: str) -> dict:
         print_to_console(f'Error: Subprocess failed: {e.stderr.decode()}')
         sys.exit(-1)
 
-    return osm_statistics_to_dict(statistics)
+    statistics_dict = osm_statistics_to_dict(statistics)
+    if statistics_cache is not None:
+        statistics_cache.put(file_path, statistics_dict)
+
+    return statistics_dict
 
 
 def osm_statistics_to_dict(oms_statistics: str) -> dict:
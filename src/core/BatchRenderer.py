@@ -0,0 +1,204 @@
+import argparse
+import csv
+import json
+import math
+import os
+import time
+from multiprocessing import Pool
+
+from src.common.Utilities import print_to_console
+from src.core.MapGenerator import Generator
+
+
+def read_jobs(path: str) -> list:
+    """Reads the jobs of a batch from a CSV file with a header or a JSONL file with one job per line.
+
+    Args:
+        path (str): Path of the .csv or .jsonl file. A job has the fields lat, lon, dis, output and optionally
+            style, the theme of the colors.
+
+    Returns:
+        list: The jobs as dicts.
+
+    Raises:
+        ValueError: If the file type is unknown or a job misses a field.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        elif path.endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            raise ValueError(f'Jobs must be a .csv or .jsonl file: {path}')
+
+    return [normalize_job(row) for row in rows]
+
+
+def normalize_job(job: dict) -> dict:
+
+    missing = [field for field in ['lat', 'lon', 'dis', 'output'] if job.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'Job {job} misses the fields {missing}')
+
+    return {'lat': float(job['lat']), 'lon': float(job['lon']), 'dis': int(float(job['dis'])),
+            'style': job.get('style') or 'default', 'output': job['output']}
+
+
+def render_group(group: tuple) -> list:
+    """Renders all jobs of the same preprocessed files. The files are decoded once by the first job, all
+    further jobs select their area from the layer cache of the process.
+
+    Args:
+        group (tuple): Paths of the preprocessed files, the jobs with their bounding box, dpi and size of the
+            images in inches.
+
+    Returns:
+        list: The result of every job with its status, error and seconds.
+    """
+    pbf_file_paths, jobs, dpi, size = group
+
+    results = []
+    for job in jobs:
+
+        start = time.perf_counter()
+        result = {**job, 'pbf_files': list(pbf_file_paths), 'status': 'rendered', 'error': None}
+        try:
+            generator = Generator(job['lat'], job['lon'], job['dis'], job['style'])
+            _, bbox_dict = generator.bounding_box()
+
+            if os.path.dirname(job['output']):
+                os.makedirs(os.path.dirname(job['output']), exist_ok=True)
+            image = generator.render_image(bbox_dict, list(pbf_file_paths), dpi, size)
+            with open(job['output'], 'wb') as f:
+                f.write(image)
+        except Exception as e:
+            print_to_console(f'Rendering of {job["output"]} failed: {e}')
+            result['status'] = 'failed'
+            result['error'] = str(e)
+
+        result['seconds'] = round(time.perf_counter() - start, 4)
+        results.append(result)
+
+    return results
+
+
+class BatchRenderer:
+    """Renders many images with a single resolution of the preprocessed files.
+
+    All jobs are resolved to their preprocessed files first and grouped by them. The groups are rendered by the
+    workers of a process pool, largest first, so each file is only decoded once per worker. A group with more
+    jobs than a fair share of the workers is split into chunks, so a single area with many frames still uses all
+    workers. The timing of every job and the throughput of the batch are written to a json report.
+    """
+
+    def __init__(self, processes: int | None = None, dpi: int = 300, size: float = 12,
+                 path_to_report: str = 'batch_report.json'):
+        """
+        Args:
+            processes (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            dpi (int, optional): Resolution of the images. Defaults to 300.
+            size (float, optional): Width and height of the images in inches. Defaults to 12.
+            path_to_report (str, optional): Path of the report. Defaults to 'batch_report.json'.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.dpi = dpi
+        self.size = size
+        self.path_to_report = path_to_report
+
+    def group_jobs(self, jobs: list) -> dict:
+        """Resolves the preprocessed files of every job.
+
+        Args:
+            jobs (list): The jobs.
+
+        Returns:
+            dict: {paths of the preprocessed files: jobs which are rendered from them}
+        """
+        groups = {}
+        for job in jobs:
+            generator = Generator(job['lat'], job['lon'], job['dis'], job['style'])
+            _, bbox_dict = generator.bounding_box()
+            groups.setdefault(tuple(generator.pbf_files_of(bbox_dict)), []).append(job)
+
+        return groups
+
+    def split_groups(self, groups: dict) -> list:
+        """Splits the groups into the work of the pool. Each chunk has at most the share of one worker of all
+        jobs, the jobs of a group are distributed evenly over its chunks.
+
+        Args:
+            groups (dict): {paths of the preprocessed files: jobs which are rendered from them}
+
+        Returns:
+            list: (paths of the preprocessed files, jobs, dpi, size) per chunk, largest chunks first.
+        """
+        share = max(1, math.ceil(sum(len(group) for group in groups.values()) / self.processes))
+
+        work = []
+        for pbf_file_paths, group in groups.items():
+            chunks = math.ceil(len(group) / share)
+            for i in range(chunks):
+                chunk = group[i * len(group) // chunks:(i + 1) * len(group) // chunks]
+                work.append((pbf_file_paths, chunk, self.dpi, self.size))
+
+        return sorted(work, key=lambda item: -len(item[1]))
+
+    def run(self, jobs: list) -> dict:
+        """Renders all jobs and writes the report.
+
+        Args:
+            jobs (list): The jobs, see read_jobs.
+
+        Returns:
+            dict: The report with the result of every job and a summary.
+        """
+        start = time.perf_counter()
+        jobs = [normalize_job(job) for job in jobs]
+
+        groups = self.group_jobs(jobs)
+        print_to_console(f'Rendering {len(jobs)} jobs of {len(groups)} files')
+
+        work = self.split_groups(groups)
+
+        processes = min(self.processes, len(work))
+        if processes <= 1:
+            results = [result for group in work for result in render_group(group)]
+        else:
+            with Pool(processes=processes) as pool:
+                results = [result for group in pool.imap_unordered(render_group, work) for result in group]
+
+        seconds = time.perf_counter() - start
+        rendered = [result for result in results if result['status'] == 'rendered']
+        report = {
+            'summary': {
+                'jobs': len(results),
+                'rendered': len(rendered),
+                'failed': len(results) - len(rendered),
+                'files': len(groups),
+                'processes': max(processes, 1),
+                'seconds': round(seconds, 4),
+                'jobs_per_second': round(len(rendered) / seconds, 4) if seconds > 0 else None,
+                'seconds_per_job': round(sum(result['seconds'] for result in results) / len(results), 4)
+                if results else None
+            },
+            'jobs': results
+        }
+
+        with open(self.path_to_report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        print_to_console(f'Batch finished: {report["summary"]}')
+
+        return report
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Renders a batch of images')
+    parser.add_argument('jobs', help='CSV or JSONL file with the fields lat, lon, dis, style and output')
+    parser.add_argument('--processes', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--dpi', type=int, default=300, help='Resolution of the images')
+    parser.add_argument('--report', default='batch_report.json', help='Path of the report')
+    arguments = parser.parse_args()
+
+    BatchRenderer(arguments.processes, arguments.dpi, path_to_report=arguments.report).run(
+        read_jobs(arguments.jobs))
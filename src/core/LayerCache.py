@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+from collections import OrderedDict
+
+import shapely
+from shapely.geometry import box
+
+from src.common.Utilities import print_to_console
+
+_layer_cache = None
+
+# Estimated bytes of the parsed layers per byte of an osm file, pbf files are compressed
+PARSED_BYTES_PER_FILE_BYTE = 12
+
+
+def estimate_size(frame) -> int:
+    """Estimates the memory of a GeoDataFrame in bytes. The geometries are counted with 16 bytes per coordinate,
+    because memory_usage only counts the pointers of the geometry column.
+
+    Args:
+        frame (GeoDataFrame | None): The frame.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    if frame is None:
+        return sys.getsizeof(None)
+
+    size = int(frame.drop(columns=frame.geometry.name).memory_usage(deep=True).sum())
+    geometries = frame.geometry.values
+    size += int(shapely.get_num_coordinates(geometries).sum()) * 16 + len(geometries) * 100
+
+    return size
+
+
+def estimate_parsed_size(path: str) -> int:
+    """Estimates the memory of all layers of an osm file after parsing it, from the size of the file."""
+    return os.path.getsize(path) * PARSED_BYTES_PER_FILE_BYTE
+
+
+class LayerCache:
+    """Process wide LRU cache of the layers (GeoDataFrames) which were parsed from the osm files.
+
+    An entry holds the whole layer of a file, or of a region of a file, which is too large for the cache, and is
+    keyed by the file, its modification time and size, the layer, the filter and the region, so a changed file
+    is parsed again. Requests select the features of their bounding box from a cached layer which covers it
+    instead of parsing the file again. Least recently used layers are evicted, as soon as the estimated size of
+    all entries exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Args:
+            max_bytes (int, optional): Memory budget of the cache in bytes. Defaults to 1 GB.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(path: str, layer: str, layer_filter=None, region: list | None = None) -> tuple:
+        """Builds the key of a layer.
+
+        Args:
+            path (str): Path of the osm file (tile).
+            layer (str): Name of the layer, e.g. roads.
+            layer_filter (optional): Filter of the layer, e.g. the custom filter of pyrosm. Defaults to None.
+            region (list, optional): [min_lon, min_lat, max_lon, max_lat], the area of the file which was
+                parsed. Defaults to None, the whole file.
+
+        Returns:
+            tuple: The key.
+        """
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, layer,
+                json.dumps(layer_filter, sort_keys=True, default=str), None if region is None else tuple(region))
+
+    def lookup(self, path: str, layer: str, layer_filter=None, bbox: list | None = None) -> tuple | None:
+        """Finds the cached layer of the whole file or of a region which contains the bounding box.
+
+        Args:
+            path (str): Path of the osm file (tile).
+            layer (str): Name of the layer, e.g. roads.
+            layer_filter (optional): Filter of the layer. Defaults to None.
+            bbox (list, optional): [min_lon, min_lat, max_lon, max_lat]. Defaults to None, only the whole file
+                is looked up.
+
+        Returns:
+            tuple | None: The key of the entry or None, if no entry covers the bounding box.
+        """
+        key = self.key(path, layer, layer_filter)
+        if key in self._entries or bbox is None:
+            return key if key in self._entries else None
+
+        min_lon, min_lat, max_lon, max_lat = bbox
+        for other in reversed(self._entries):
+            region = other[5]
+            if other[:5] == key[:5] and region is not None and region[0] <= min_lon and region[1] <= min_lat \
+                    and max_lon <= region[2] and max_lat <= region[3]:
+                return other
+
+        return None
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple):
+        """Returns the cached layer and marks it as recently used.
+
+        Raises:
+            KeyError: If the layer is not cached.
+        """
+        frame, _ = self._entries[key]
+        self._entries.move_to_end(key)
+        return frame
+
+    def put(self, key: tuple, frame):
+        """Adds the layer and evicts the least recently used layers, until the budget is kept. A layer which
+        is larger than the whole budget is not cached.
+        """
+        size = estimate_size(frame)
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+
+        if size > self.max_bytes:
+            print_to_console(f'Layer {key[3]} of {key[0]} with {size} bytes exceeds the cache size')
+            return
+
+        self._entries[key] = (frame, size)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def get_layer(self, path: str, layer: str, loader, layer_filter=None, bbox: list | None = None,
+                  region: list | None = None):
+        """Returns the layer of the file from the cache or loads and caches it.
+
+        Args:
+            path (str): Path of the osm file (tile).
+            layer (str): Name of the layer, e.g. roads.
+            loader (callable): Parses the layer of the whole file or of the region, returns a GeoDataFrame or
+                None.
+            layer_filter (optional): Filter of the layer, part of the key. Defaults to None.
+            bbox (list, optional): [min_lon, min_lat, max_lon, max_lat], only features which intersect it
+                are returned. Defaults to None.
+            region (list, optional): [min_lon, min_lat, max_lon, max_lat], the area which the loader parses,
+                it has to contain the bounding box. Defaults to None, the loader parses the whole file.
+
+        Returns:
+            GeoDataFrame | None: The features of the layer or None, if the file contains none.
+        """
+        key = self.lookup(path, layer, layer_filter, bbox if region is not None else None)
+        if key is not None:
+            self.hits += 1
+            frame = self.get(key)
+        else:
+            self.misses += 1
+            frame = loader()
+            self.put(self.key(path, layer, layer_filter, region), frame)
+
+        if frame is None or bbox is None:
+            return frame
+
+        # The spatial index of the frame is built once and kept with the cached frame
+        frame = frame.iloc[frame.sindex.query(box(*bbox), predicate='intersects')]
+        return frame if not frame.empty else None
+
+    def statistics(self) -> dict:
+        """Returns the counters of the cache.
+
+        Returns:
+            dict: hits, misses, evictions, entries and bytes.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self._entries), 'bytes': self.current_bytes}
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+
+def get_layer_cache(max_bytes: int | None = None) -> LayerCache:
+    """Returns the layer cache of the process.
+
+    Args:
+        max_bytes (int, optional): Changes the memory budget of the cache. Defaults to None.
+
+    Returns:
+        LayerCache: The cache.
+    """
+    global _layer_cache
+    if _layer_cache is None:
+        _layer_cache = LayerCache() if max_bytes is None else LayerCache(max_bytes)
+    elif max_bytes is not None:
+        _layer_cache.max_bytes = max_bytes
+
+    return _layer_cache
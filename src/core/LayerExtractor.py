@@ -0,0 +1,133 @@
+import numpy
+import pandas
+import shapely
+from pyrosm import OSM
+
+from src.common.Utilities import print_to_console
+
+# Tag key of every layer, an element belongs to a layer if it has the key
+LAYER_TAGS = {
+    'roads': 'highway',
+    'natural': 'natural',
+    'landuse': 'landuse',
+    'aeroway': 'aeroway',
+    'buildings': 'building'
+}
+
+# Filters which the layers were parsed with before, used as part of the keys in the layer cache
+LAYER_FILTERS = {
+    'roads': {'network_type': 'all'},
+    'natural': {'natural': True},
+    'landuse': {'landuse': True},
+    'aeroway': {'aeroway': True},
+    'buildings': {'building': True}
+}
+
+# Highway values which are not part of the network of type 'all' in pyrosm
+EXCLUDED_HIGHWAY = ['abandoned', 'construction', 'no', 'planned', 'platform', 'proposed', 'raceway', 'razed',
+                    'rest_area', 'services']
+
+
+def merge_layers(frames: list):
+    """Merges one layer of multiple osm files. An element which is part of several files, e.g. a way which
+    crosses the border of two tiles, is kept once. Every file only holds the nodes inside of its bounding box,
+    so the geometry of the element is the union of its parts in all files.
+
+    Args:
+        frames (list): The layer of every file, GeoDataFrames or None.
+
+    Returns:
+        GeoDataFrame | None: The merged layer in the order of the files or None, if no file contains it.
+    """
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+
+    merged = pandas.concat(frames, ignore_index=True)
+    keys = [column for column in ['osm_type', 'id'] if column in merged.columns]
+    duplicated = merged.duplicated(keys, keep=False) if keys else None
+    if duplicated is None or not duplicated.any():
+        return merged
+
+    # Only the elements on the borders are merged, the first copy keeps its position and tags. A part of a
+    # polygon can be invalid, e.g. if it was cut at the halo of a file, so the parts are repaired first
+    parts = merged[duplicated]
+    first = ~parts.duplicated(keys)
+    unions = parts.groupby(keys, sort=False)[merged.geometry.name].agg(
+        lambda geometries: shapely.union_all(shapely.make_valid(numpy.asarray(geometries.values))))
+
+    merged = merged[~duplicated | merged.index.isin(parts.index[first])].copy()
+    merged.loc[parts.index[first], merged.geometry.name] = unions.values
+    return merged
+
+
+class LayerExtractor:
+    """Extracts all layers of a style from an osm file with a single pass over its elements.
+
+    Instead of one query of pyrosm per layer, which filters all elements and builds their geometries again,
+    the elements of all layers are queried at once and split into the layers by their tags afterwards.
+    The roads are selected with the same rules as the network of type 'all' of pyrosm.
+    """
+
+    def __init__(self, pbf_file_path: str, layer_names: list, bounding_box: list | None = None):
+        """
+        Args:
+            pbf_file_path (str): Path of the osm file.
+            layer_names (list): The layers which should be extracted, see LAYER_TAGS.
+            bounding_box (list, optional): [min_lon, min_lat, max_lon, max_lat], only this area of the file is
+                decoded. Defaults to None.
+
+        Raises:
+            ValueError: If a layer is unknown.
+        """
+        unknown = [layer for layer in layer_names if layer not in LAYER_TAGS]
+        if unknown:
+            raise ValueError(f'Unknown layers: {unknown}, known layers are: {list(LAYER_TAGS)}')
+
+        self.pbf_file_path = pbf_file_path
+        self.layer_names = list(layer_names)
+        self.bounding_box = bounding_box
+
+    def run(self) -> dict:
+        """Decodes the file once and splits the elements into the layers.
+
+        Returns:
+            dict: {name of the layer: GeoDataFrame or None, if the file contains no element of the layer}
+        """
+        layers = dict.fromkeys(self.layer_names)
+        if not self.layer_names:
+            return layers
+
+        tags = [LAYER_TAGS[layer] for layer in self.layer_names]
+        print_to_console(f'Extracting {self.layer_names} from {self.pbf_file_path} with a single pass')
+
+        osm = OSM(self.pbf_file_path, bounding_box=self.bounding_box)
+        elements = osm.get_data_by_custom_criteria(custom_filter={tag: True for tag in tags},
+                                                   tags_as_columns=tags + ['area'])
+        if elements is None:
+            return layers
+
+        for layer, tag in zip(self.layer_names, tags):
+            if tag not in elements.columns:
+                continue
+
+            selected = elements[tag].notna()
+            if layer == 'roads':
+                selected &= (elements['osm_type'] == 'way') & ~elements[tag].isin(EXCLUDED_HIGHWAY)
+                if 'area' in elements.columns:
+                    selected &= elements['area'] != 'yes'
+
+            frame = elements[selected].reset_index(drop=True)
+            if frame.empty:
+                continue
+
+            if layer == 'roads':
+                # The network consists of lines, closed ways are not filled
+                geometries = numpy.asarray(frame.geometry.values)
+                polygons = frame.geom_type.isin(['Polygon', 'MultiPolygon']).values
+                frame[frame.geometry.name] = numpy.where(polygons, shapely.boundary(geometries), geometries)
+            layers[layer] = frame
+
+        return layers
@@ -0,0 +1,198 @@
+import math
+
+import matplotlib
+import numpy
+import pandas
+import shapely
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.path import Path
+
+from src.common.ColorMapping import ColorMapping
+
+# Type ids of shapely
+POINT_TYPES = [0]
+LINE_TYPES = [1, 2]
+POLYGON_TYPES = [3]
+MULTI_TYPES = [4, 5, 6, 7]
+
+
+def explode(geometries: numpy.ndarray) -> tuple:
+    """Splits the multi part geometries and geometry collections into their single parts.
+
+    Args:
+        geometries (numpy.ndarray): The geometries.
+
+    Returns:
+        tuple: The single part geometries and for every part the index of its geometry.
+    """
+    index = numpy.arange(len(geometries))
+    while numpy.isin(shapely.get_type_id(geometries), MULTI_TYPES).any():
+        geometries, part_index = shapely.get_parts(geometries, return_index=True)
+        index = index[part_index]
+
+    return geometries, index
+
+
+def polygon_paths(polygons: numpy.ndarray) -> list:
+    """Builds a matplotlib path with the exterior and all interior rings of every polygon.
+
+    Args:
+        polygons (numpy.ndarray): Single part polygons.
+
+    Returns:
+        list: One Path per polygon.
+    """
+    rings, polygon_of_ring = shapely.get_rings(polygons, return_index=True)
+    coordinates, ring_of_coordinate = shapely.get_coordinates(rings, return_index=True)
+
+    # Every ring starts with a MOVETO and ends with a CLOSEPOLY
+    codes = numpy.full(len(coordinates), Path.LINETO, dtype=Path.code_type)
+    ring_starts = numpy.flatnonzero(numpy.diff(ring_of_coordinate, prepend=-1))
+    codes[ring_starts] = Path.MOVETO
+    codes[numpy.append(ring_starts[1:], len(coordinates)) - 1] = Path.CLOSEPOLY
+
+    polygon_of_coordinate = polygon_of_ring[ring_of_coordinate]
+    splits = numpy.searchsorted(polygon_of_coordinate, numpy.arange(1, len(polygons)))
+
+    return [Path(vertices, path_codes) for vertices, path_codes
+            in zip(numpy.split(coordinates, splits), numpy.split(codes, splits))]
+
+
+class LayerRenderer:
+    """Draws a layer with a single matplotlib collection per geometry type.
+
+    The category column of the layer is mapped to RGBA colors with one vectorized lookup, instead of filtering
+    the layer and plotting it once per category. The features are sorted by the order of their categories, so
+    later categories are still drawn above earlier ones. The alpha of a category is part of its color.
+    """
+
+    def __init__(self, color_mapping: ColorMapping):
+        """
+        Args:
+            color_mapping (ColorMapping): Colors of the style.
+        """
+        self.color_mapping = color_mapping
+
+    def category_colors(self, values: pandas.Series, categories: dict) -> tuple:
+        """Maps the values of a category column to the colors of their categories.
+
+        Args:
+            values (pandas.Series): The category of every feature.
+            categories (dict): {category: (name of the color, alpha)} in drawing order.
+
+        Returns:
+            tuple: The positions of the features of a category in drawing order and their RGBA colors.
+        """
+        # Values outside of the categories get the code -1
+        codes = pandas.Index(list(categories)).get_indexer(values)
+        positions = numpy.flatnonzero(codes >= 0)
+        positions = positions[numpy.argsort(codes[positions], kind='stable')]
+
+        # Only the colors of the categories which occur are looked up
+        styles = list(categories.values())
+        palette = numpy.zeros((len(styles), 4))
+        for code in numpy.unique(codes[positions]):
+            color, alpha = styles[code]
+            palette[code] = self.color_mapping.get_rgba(color, alpha)
+
+        return positions, palette[codes[positions]]
+
+    def plot_layer(self, frame, ax, color: str | None = None, alpha: float = 1.0, column: str | None = None,
+                   categories: dict | None = None, linewidth: float | None = None) -> dict:
+        """Draws a layer either in a single color or with the colors of the categories of one column.
+
+        Args:
+            frame (GeoDataFrame | None): The layer.
+            ax (matplotlib.axes.Axes): The axes to draw on.
+            color (str, optional): Name of the color of all features. Defaults to None.
+            alpha (float, optional): Alpha of all features. Defaults to 1.0.
+            column (str, optional): The category column, used with categories. Defaults to None.
+            categories (dict, optional): {category: (name of the color, alpha)} in drawing order, features of
+                other categories are not drawn. Defaults to None.
+            linewidth (float, optional): Width of the lines, the default of matplotlib if None. Defaults to None.
+
+        Returns:
+            dict: {category: number of drawn features}
+        """
+        if frame is None or frame.empty:
+            return {}
+
+        if categories is None:
+            positions = numpy.arange(len(frame))
+            rgba = numpy.tile(self.color_mapping.get_rgba(color, alpha), (len(frame), 1))
+            drawn = {color: len(frame)}
+        else:
+            if column not in frame.columns:
+                return {}
+            positions, rgba = self.category_colors(frame[column], categories)
+            drawn = frame[column].iloc[positions].value_counts().to_dict()
+
+        if len(positions):
+            geometries = numpy.asarray(frame.geometry.values)[positions]
+            self.draw(geometries, rgba, ax, linewidth)
+            self.set_aspect(ax, geometries, frame.crs)
+
+        return drawn
+
+    @staticmethod
+    def set_aspect(ax, geometries: numpy.ndarray, crs=None):
+        """Sets the aspect of the axes as geopandas does. Long/lat coordinates are stretched by 1/cos of the
+        latitude in the middle of the geometries, so that a long/lat square appears square.
+
+        Args:
+            ax (matplotlib.axes.Axes): The axes.
+            geometries (numpy.ndarray): The drawn geometries.
+            crs (pyproj.CRS, optional): Coordinate reference system of the geometries. Defaults to None.
+        """
+        if crs is not None and crs.is_geographic:
+            _, min_y, _, max_y = shapely.total_bounds(geometries)
+            ax.set_aspect(1 / math.cos(math.radians((min_y + max_y) / 2)))
+        else:
+            ax.set_aspect('equal')
+
+    @staticmethod
+    def draw(geometries: numpy.ndarray, rgba: numpy.ndarray, ax, linewidth: float | None = None) -> list:
+        """Adds one collection for the polygons, the lines and the points.
+
+        Args:
+            geometries (numpy.ndarray): The geometries in drawing order.
+            rgba (numpy.ndarray): RGBA color of every geometry.
+            ax (matplotlib.axes.Axes): The axes to draw on.
+            linewidth (float, optional): Width of the lines. Defaults to None.
+
+        Returns:
+            list: The added collections.
+        """
+        geometries, index = explode(geometries)
+        rgba = rgba[index]
+        type_ids = shapely.get_type_id(geometries)
+
+        collections = []
+
+        polygons = numpy.isin(type_ids, POLYGON_TYPES) & ~shapely.is_empty(geometries)
+        if polygons.any():
+            # Polygons are filled without an outline, as by geopandas
+            collection = PathCollection(polygon_paths(geometries[polygons]), facecolors=rgba[polygons],
+                                        edgecolors='none')
+            ax.add_collection(collection, autolim=True)
+            collections.append(collection)
+
+        lines = numpy.isin(type_ids, LINE_TYPES) & ~shapely.is_empty(geometries)
+        if lines.any():
+            coordinates, line_of_coordinate = shapely.get_coordinates(geometries[lines], return_index=True)
+            segments = numpy.split(coordinates, numpy.flatnonzero(numpy.diff(line_of_coordinate)) + 1)
+            collection = LineCollection(segments, colors=rgba[lines],
+                                        linewidths=matplotlib.rcParams['lines.linewidth']
+                                        if linewidth is None else linewidth)
+            ax.add_collection(collection, autolim=True)
+            collections.append(collection)
+
+        points = numpy.isin(type_ids, POINT_TYPES) & ~shapely.is_empty(geometries)
+        if points.any():
+            coordinates = shapely.get_coordinates(geometries[points])
+            collections.append(ax.scatter(coordinates[:, 0], coordinates[:, 1], c=rgba[points]))
+
+        if collections:
+            ax.autoscale_view()
+
+        return collections
@@ -0,0 +1,212 @@
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from src.common.Utilities import print_to_console
+from src.core.LayerExtractor import LAYER_TAGS, LayerExtractor
+
+# The store is optional, without pyarrow the layers are parsed from the osm files
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Key of the stamp of the osm file in the metadata of the parquet files
+STAMP_KEY = b'geoframe'
+
+BBOX_FIELDS = ['xmin', 'ymin', 'xmax', 'ymax']
+
+# Names of the geometry types of GeoParquet by the type ids of shapely
+GEOMETRY_TYPES = {0: 'Point', 1: 'LineString', 2: 'LineString', 3: 'Polygon', 4: 'MultiPoint', 5: 'MultiLineString',
+                  6: 'MultiPolygon', 7: 'GeometryCollection'}
+
+
+def store_available() -> bool:
+    """Whether pyarrow is installed, which the layer store needs to write and read its files."""
+    return pq is not None
+
+
+def store_path_of(pbf_file_path: str, layer: str) -> str:
+    """Path of a layer in the store folder next to the osm file, e.g. store/<name>.roads.parquet"""
+    name = os.path.basename(pbf_file_path).removesuffix('.osm.pbf')
+    return os.path.join(os.path.dirname(pbf_file_path), 'store', f'{name}.{layer}.parquet')
+
+
+class LayerStore:
+    """Columnar copy of the layers of a preprocessed file as GeoParquet files, one per layer.
+
+    The features of a layer are sorted along a Hilbert curve, so every row group covers a small area, and
+    stored with the WKB of their geometries, the osm id and type, the tag of the layer and a bbox column, the
+    covering of GeoParquet 1.1. The statistics of the bbox column are the bounding box of every row group, so
+    a request only decodes the row groups which intersect its bounding box, from the memory mapped file. The
+    modification time and size of the osm file are stored in the metadata, so an outdated store is never read.
+    """
+
+    def __init__(self, pbf_file_path: str, row_group_size: int = 2048):
+        """
+        Args:
+            pbf_file_path (str): Path of the preprocessed osm file.
+            row_group_size (int, optional): Features per row group. Defaults to 2048.
+        """
+        self.pbf_file_path = pbf_file_path
+        self.row_group_size = row_group_size
+
+    def build(self) -> list:
+        """Extracts all layers of the file and writes them.
+
+        Returns:
+            list: Paths of the written layers.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        if not store_available():
+            raise ImportError('The layer store needs pyarrow')
+
+        stat = os.stat(self.pbf_file_path)
+        layers = LayerExtractor(self.pbf_file_path, list(LAYER_TAGS)).run()
+
+        paths = []
+        for layer, frame in layers.items():
+            path = store_path_of(self.pbf_file_path, layer)
+            self.save_layer(path, layer, frame, stat.st_mtime_ns, stat.st_size)
+            paths.append(path)
+
+        print_to_console(f'Built the layer store of {self.pbf_file_path}')
+        return paths
+
+    def save_layer(self, path: str, layer: str, frame, source_mtime_ns: int, source_size: int):
+        """Writes a layer, sorted along a Hilbert curve, with the stamp of the osm file it was extracted from.
+        Layers without features are written as empty files, so that they are not read from the osm file.
+
+        Args:
+            path (str): Target path of the layer.
+            layer (str): Name of the layer.
+            frame (GeoDataFrame | None): The layer.
+            source_mtime_ns (int): Modification time of the osm file.
+            source_size (int): Size of the osm file.
+        """
+        if frame is not None and not frame.empty:
+            frame = frame.iloc[np.argsort(frame.geometry.hilbert_distance(), kind='stable')]
+            geometries = np.asarray(frame.geometry.values)
+            ids = frame['id'].to_numpy(dtype=np.int64)
+            types = frame['osm_type'].fillna('').astype(str).tolist()
+            tags = frame[LAYER_TAGS[layer]].fillna('').astype(str).tolist()
+        else:
+            geometries, ids, types, tags = np.array([], dtype=object), np.array([], dtype=np.int64), [], []
+
+        bounds = shapely.bounds(geometries).reshape(-1, 4)
+        table = pa.table({
+            'id': pa.array(ids, type=pa.int64()),
+            'osm_type': pa.array(types, type=pa.string()),
+            LAYER_TAGS[layer]: pa.array(tags, type=pa.string()),
+            'geometry': pa.array(shapely.to_wkb(geometries).tolist(), type=pa.binary()),
+            'bbox': pa.StructArray.from_arrays([pa.array(bounds[:, i], type=pa.float64()) for i in range(4)],
+                                               names=BBOX_FIELDS),
+        })
+
+        geo = {
+            'version': '1.1.0',
+            'primary_column': 'geometry',
+            'columns': {'geometry': {
+                'encoding': 'WKB',
+                'geometry_types': sorted({GEOMETRY_TYPES[type_id] for type_id in
+                                          np.unique(shapely.get_type_id(geometries)).tolist()}),
+                'bbox': [float(bounds[:, 0].min()), float(bounds[:, 1].min()),
+                         float(bounds[:, 2].max()), float(bounds[:, 3].max())] if len(bounds) else [],
+                'covering': {'bbox': {field: ['bbox', field] for field in BBOX_FIELDS}},
+            }},
+        }
+        stamp = {'source_mtime_ns': source_mtime_ns, 'source_size': source_size}
+        table = table.replace_schema_metadata({b'geo': json.dumps(geo), STAMP_KEY: json.dumps(stamp)})
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size, write_statistics=True)
+        os.replace(tmp_path, path)
+
+    def read(self, layer_names, bbox: list) -> dict | None:
+        """Reads the features of the bounding box. Only the row groups whose statistics intersect the
+        bounding box are decoded.
+
+        Args:
+            layer_names (iterable): The layers which are read.
+            bbox (list): [min_lon, min_lat, max_lon, max_lat]
+
+        Returns:
+            dict | None: {name of the layer: GeoDataFrame with the columns id, osm_type, the tag of the layer and
+                geometry or None, if no feature intersects the bounding box}
+                or None, if pyarrow is missing or a layer is missing or outdated.
+        """
+        if not store_available():
+            return None
+
+        stat = os.stat(self.pbf_file_path)
+        layers = {}
+        for layer in layer_names:
+
+            path = store_path_of(self.pbf_file_path, layer)
+            if not os.path.exists(path):
+                return None
+
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            stamp = json.loads((parquet_file.schema_arrow.metadata or {}).get(STAMP_KEY, b'{}'))
+            if stamp.get('source_mtime_ns') != stat.st_mtime_ns or stamp.get('source_size') != stat.st_size:
+                return None
+
+            layers[layer] = self.read_layer(parquet_file, layer, bbox)
+
+        return layers
+
+    @staticmethod
+    def read_layer(parquet_file, layer: str, bbox: list):
+        """Reads the features of one layer which intersect the bounding box.
+
+        Args:
+            parquet_file (pyarrow.parquet.ParquetFile): The memory mapped file of the layer.
+            layer (str): Name of the layer.
+            bbox (list): [min_lon, min_lat, max_lon, max_lat]
+
+        Returns:
+            GeoDataFrame | None: The features or None, if no feature intersects the bounding box.
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        metadata = parquet_file.metadata
+        columns = {metadata.schema.column(i).path: i for i in range(metadata.num_columns)}
+
+        # Predicate pushdown: the bounding box of a row group are the extremes of the bbox column
+        row_groups = []
+        for i in range(metadata.num_row_groups):
+            statistics = {field: metadata.row_group(i).column(columns[f'bbox.{field}']).statistics
+                          for field in BBOX_FIELDS}
+            if any(value is None or not value.has_min_max for value in statistics.values()):
+                row_groups.append(i)
+            elif statistics['xmin'].min <= max_lon and min_lon <= statistics['xmax'].max and \
+                    statistics['ymin'].min <= max_lat and min_lat <= statistics['ymax'].max:
+                row_groups.append(i)
+        if not row_groups:
+            return None
+
+        table = parquet_file.read_row_groups(row_groups)
+        boxes = table.column('bbox').combine_chunks()
+        xmin, ymin, xmax, ymax = [boxes.field(field).to_numpy(zero_copy_only=False) for field in BBOX_FIELDS]
+        selected = (xmin <= max_lon) & (min_lon <= xmax) & (ymin <= max_lat) & (min_lat <= ymax)
+        if not selected.any():
+            return None
+
+        table = table.filter(pa.array(selected))
+        tag = LAYER_TAGS[layer]
+        return gpd.GeoDataFrame(
+            {'id': table.column('id').to_numpy(), 'osm_type': table.column('osm_type').to_pylist(),
+             tag: table.column(tag).to_pylist()},
+            geometry=shapely.from_wkb(table.column('geometry').to_numpy(zero_copy_only=False)), crs='EPSG:4326')
+
+
+def build_layer_store(pbf_file_path: str) -> list:
+    """Builds the layer store of a file in a worker of the preprocessor, see LayerStore.build."""
+    return LayerStore(pbf_file_path).build()
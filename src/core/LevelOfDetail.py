@@ -0,0 +1,78 @@
+import math
+
+import numpy
+import shapely
+
+
+def pixel_size(bbox_dict: dict, pixels: float) -> tuple:
+    """Size of one pixel of a map in long/lat degrees. The map is drawn with an aspect of 1/cos of its middle
+    latitude, so a pixel covers fewer degrees of latitude than of longitude.
+
+    Args:
+        bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+        pixels (float): Number of pixels along the longer side of the map.
+
+    Returns:
+        tuple: Width and height of a pixel in degrees.
+    """
+    cos_lat = math.cos(math.radians((bbox_dict['lat min'] + bbox_dict['lat max']) / 2))
+    longer_side = max(bbox_dict['lon max'] - bbox_dict['lon min'],
+                      (bbox_dict['lat max'] - bbox_dict['lat min']) / cos_lat)
+
+    width = longer_side / pixels
+    return width, width * cos_lat
+
+
+class LevelOfDetail:
+    """Reduces the geometries of a layer to what is visible at the resolution of the map.
+
+    Every geometry is clipped to the bounding box, if clip is set, extended by a margin of a few pixels so that
+    lines are not cut visibly at the border. It is simplified with a tolerance of a fraction of a pixel and
+    dropped, if its extent is smaller than a pixel in both directions. Points are only clipped. All steps are
+    vectorized shapely functions over the whole layer.
+    """
+
+    def __init__(self, bbox_dict: dict, pixels: float, margin: float = 2, tolerance: float = 0.5,
+                 clip: bool = True):
+        """
+        Args:
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+            pixels (float): Number of pixels along the longer side of the map.
+            margin (float, optional): Margin around the bounding box in pixels. Defaults to 2.
+            tolerance (float, optional): Tolerance of the simplification in pixels. Defaults to 0.5.
+            clip (bool, optional): Clips the geometries to the bounding box. Defaults to True.
+        """
+        self.pixel_width, self.pixel_height = pixel_size(bbox_dict, pixels)
+        self.tolerance = tolerance * min(self.pixel_width, self.pixel_height)
+
+        self.rectangle = None
+        if clip:
+            self.rectangle = (bbox_dict['lon min'] - margin * self.pixel_width,
+                              bbox_dict['lat min'] - margin * self.pixel_height,
+                              bbox_dict['lon max'] + margin * self.pixel_width,
+                              bbox_dict['lat max'] + margin * self.pixel_height)
+
+    def apply(self, frame):
+        """Clips, simplifies and filters the geometries of a layer.
+
+        Args:
+            frame (GeoDataFrame | None): The layer, in long/lat coordinates.
+
+        Returns:
+            GeoDataFrame | None: A new frame with the visible features, the layer itself is not changed.
+        """
+        if frame is None or frame.empty:
+            return frame
+
+        geometries = numpy.asarray(frame.geometry.values)
+        if self.rectangle is not None:
+            geometries = shapely.clip_by_rect(geometries, *self.rectangle)
+
+        points = shapely.get_type_id(geometries) == 0
+        geometries = numpy.where(points, geometries, shapely.simplify(geometries, self.tolerance))
+
+        min_x, min_y, max_x, max_y = shapely.bounds(geometries).T
+        visible = ~shapely.is_empty(geometries) & (
+            points | (max_x - min_x >= self.pixel_width) | (max_y - min_y >= self.pixel_height))
+
+        return frame[visible].set_geometry(geometries[visible], crs=frame.crs)
@@ -1,5 +1,5 @@
 import glob
-import json
+import io
 import math
 import os
 import platform
@@ -7,16 +7,43 @@ import pyrosm
 
 from pyrosm import OSM
 
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 from src.common.ColorMapping import ColorMapping
+from src.common.SpatialIndex import load_spatial_index
 from src.common.Utilities import print_to_console
+from src.core.LayerCache import estimate_parsed_size, get_layer_cache
+from src.core.LayerExtractor import LAYER_FILTERS, LayerExtractor, merge_layers
+from src.core.LayerRenderer import LayerRenderer
+from src.core.LayerStore import LayerStore
+from src.core.LevelOfDetail import LevelOfDetail, pixel_size
+from src.core.RenderCache import get_render_cache
+from src.core.TilePyramid import TilePyramid, level_for, pyramid_path_of
 from src.preprocessor.Preprocessor import OS
 
 
+def figure_size(ax, size: float) -> tuple:
+    """Returns the size of a figure which is filled by the axes with the aspect of the map.
+
+    Args:
+        ax (matplotlib.axes.Axes): The axes with the limits and the aspect of the map.
+        size (float): Length of the longer side in inches.
+
+    Returns:
+        tuple: Width and height in inches.
+    """
+    aspect = ax.get_aspect()
+    aspect = 1.0 if aspect == 'auto' else float(aspect)
+
+    (x_min, x_max), (y_min, y_max) = ax.get_xlim(), ax.get_ylim()
+    ratio = abs(y_max - y_min) * aspect / abs(x_max - x_min)
+
+    return (size, size * ratio) if ratio <= 1 else (size / ratio, size)
+
+
 class Generator:
 
-    def __init__(self, lat: float, lon: float, dis: int):
+    def __init__(self, lat: float, lon: float, dis: int, theme: str = 'default'):
 
         # Paths
         self.path_to_latest = os.path.join('src', 'resources', 'latest')
@@ -39,7 +66,45 @@ class Generator:
         self.distance = dis
 
         # Coloring
-        self.colorMapping = ColorMapping()
+        self.background_color = "white"
+        self.colorMapping = ColorMapping(theme)
+        self.layer_renderer = LayerRenderer(self.colorMapping)
+
+        # Landuse values in the order they are plotted
+        self.landuse_values = ["allotments", "brownfield", "basin", "cemetery", "commercial", "construction",
+                               "farmland", "forest", "farmyard", "flowerbed", "garages", "grass",
+                               "greenhouse_horticulture", "greenfield", "landfill", "salt_pond", "industrial",
+                               "orchard", "residential", "retail", "meadow", "military", "plant_nursery", "quarry",
+                               "railway", "religious", "recreation_ground", "village_green", "vineyard"]
+
+        # Parsed layers of the osm files, shared by all generators of the process
+        self.layer_cache = get_layer_cache()
+
+        # Files whose layers do not fit into the layer cache are parsed around the map only, the region is the
+        # bounding box of the map padded by this fraction of its size on every side. Polygons without a node in
+        # the region are not parsed, so the region is much larger than the map
+        self.region_padding = 1.0
+
+        # Rendered maps on disk, None renders every map again
+        self.render_cache = get_render_cache()
+
+        # Layers of the style in the order they are plotted, all of them are extracted with a single pass
+        self.style_layers = ('roads', 'natural', 'landuse', 'buildings')
+
+        # Clips and simplifies the layers to the resolution of the map before they are drawn
+        self.level_of_detail = True
+
+        # Reads the pre-generalized level of the tile pyramid which matches the resolution of the map, if the
+        # preprocessor built it, instead of the whole osm file
+        self.use_tile_pyramid = True
+        self.pyramid_zooms = (8, 10, 12)
+
+        # Reads the features of the bounding box from the layer store of the file, if the preprocessor built it
+        # and pyarrow is installed, instead of parsing the osm file, see LayerStore
+        self.use_layer_store = True
+
+        # Prints the elements of every tag known to pyrosm, one query per tag
+        self.scan_available_tags = False
 
     def bounding_box(self):
         """
@@ -70,168 +135,130 @@ class Generator:
 
         return [lon_min, lon_max, lat_min, lat_max], bbox_dict
 
-    def select_pbf_file(self, bbox_dict: dict) -> str:
+    def select_pbf_files(self, bbox_dict: dict) -> list:
+        """Selects the preprocessed files of the bounding box: the file whose halo contains it, see
+        SpatialIndex.tile_of, or, if it is larger than the halo, all files whose core intersects it. The planet
+        file is only used, if no preprocessed file intersects the bounding box.
 
-        path_to_preprocessed_cache_file = os.path.join(
-            self.path_to_latest_preprocessed, 'cache_file*.json')
+        Args:
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
 
-        found = None
-        for cache_file in [path_to_preprocessed_cache_file]:
+        Returns:
+            list: Names of the preprocessed files or the path of the planet file.
 
-            cache_files = glob.glob(cache_file)
-            if len(cache_files) == 1:
+        Raises:
+            ValueError: If there are no or multiple cache files.
+        """
+        path_to_preprocessed_cache_file = os.path.join(
+            self.path_to_latest_preprocessed, 'cache_file*.json')
 
-                with open(cache_files.pop(), "r", encoding="utf-8") as f:
+        cache_files = glob.glob(path_to_preprocessed_cache_file)
+        if len(cache_files) != 1:
+            raise ValueError(
+                f'Found {len(cache_files)} cache files in: {path_to_preprocessed_cache_file}')
+
+        # The index is loaded once per process and only rebuilt, if the cache file changes
+        spatial_index = load_spatial_index(cache_files.pop())
+        bounds = (float(bbox_dict['lon min']), float(bbox_dict['lon max']),
+                  float(bbox_dict['lat min']), float(bbox_dict['lat max']))
+
+        found = spatial_index.tile_of(*bounds)
+        if found is not None:
+            found = str(os.path.basename(found))
+            print_to_console(f'Preprocessed file was found: {found}')
+            return [found]
+
+        intersecting = [str(os.path.basename(key)) for key in spatial_index.intersecting(*bounds)]
+        if intersecting:
+            print_to_console(f'Bounding box crosses {len(intersecting)} preprocessed files: {intersecting}')
+            return intersecting
+
+        print_to_console(
+            'No preprocessed file can be used, planet file will be returned!')
+        return [self.path_to_latest_planet]
+
+    def extraction_region(self, pbf_file_path: str, bbox_list: list, clipped: bool = False) -> list | None:
+        """Selects the area of the osm file which is parsed on a miss of the layer cache. A file whose layers
+        are estimated to exceed the budget of the cache, or which only holds a part of the map, is only parsed
+        in the padded bounding box of the map, so the layers are cached and the following maps around it are no
+        misses.
+
+        Args:
+            pbf_file_path (str): Path of the osm file.
+            bbox_list (list): [min_lon, min_lat, max_lon, max_lat]
+            clipped (bool, optional): Whether the map crosses several files and only needs the part of this file
+                around it. Defaults to False.
+
+        Returns:
+            list | None: [min_lon, min_lat, max_lon, max_lat] of the region or None, if the whole file is parsed.
+        """
+        if not clipped and estimate_parsed_size(pbf_file_path) <= self.layer_cache.max_bytes:
+            return None
+
+        min_lon, min_lat, max_lon, max_lat = bbox_list
+        padding_lon = (max_lon - min_lon) * self.region_padding
+        padding_lat = (max_lat - min_lat) * self.region_padding
+        return [min_lon - padding_lon, max(min_lat - padding_lat, -90.0),
+                max_lon + padding_lon, min(max_lat + padding_lat, 90.0)]
+
+    def load_layers(self, pbf_file_path: str, bbox_list: list, layer_names: tuple | None = None,
+                    zoom: int | None = None, clipped: bool = False) -> dict:
+        """Loads the layers of the map from the layer cache. On a miss all missing layers are extracted from the
+        file, or from its region around the map, see extraction_region, with a single pass, or read from the
+        level of the tile pyramid, and cached. Every request selects the features of its bounding box from them.
+
+        Args:
+            pbf_file_path (str): Path of the osm file.
+            bbox_list (list): [min_lon, min_lat, max_lon, max_lat]
+            layer_names (tuple, optional): The layers which are plotted. Defaults to the layers of the style.
+            zoom (int, optional): Level of the tile pyramid, see pyramid_level. Defaults to None, the osm file.
+            clipped (bool, optional): Whether only the part of the file around the map is parsed, see
+                extraction_region. Defaults to False.
+
+        Returns:
+            dict: {name of the layer: GeoDataFrame or None}
+        """
+        layer_names = self.style_layers if layer_names is None else layer_names
+        region = self.extraction_region(pbf_file_path, bbox_list, clipped) if zoom is None else None
+        extracted = None
 
-                    data = json.load(f)
-                    for key in data:
+        def layer_filter(layer: str):
+            return LAYER_FILTERS[layer] if zoom is None else {'pyramid zoom': zoom}
 
-                        file_statistics = data[key]
-                        if float(file_statistics['lon min']) <= float(bbox_dict['lon min']) <= float(file_statistics['lon max']) and float(file_statistics['lon min']) <= float(bbox_dict['lon max']) <= float(file_statistics['lon max']) and float(file_statistics['lat min']) <= float(bbox_dict['lat min']) <= float(file_statistics['lat max']) and float(file_statistics['lat min']) <= float(bbox_dict['lat max']) <= float(file_statistics['lat max']):
-                            print(data[key])
-                            found = str(os.path.basename(key))
-                            break
+        def loader_of(layer: str):
 
-                    if found is not None:
-                        break
-            else:
-                raise ValueError(
-                    f'Found {len(cache_files)} cache files in: {path_to_preprocessed_cache_file}')
+            def load():
+                nonlocal extracted
+                if extracted is None and zoom is not None:
+                    extracted = TilePyramid.load_level(pbf_file_path, zoom)
+                    if extracted is None:
+                        raise FileNotFoundError(f'Level {zoom} of the tile pyramid of {pbf_file_path} is outdated')
+                elif extracted is None:
+                    missing = [name for name in layer_names if self.layer_cache.lookup(
+                        pbf_file_path, name, layer_filter(name), bbox_list if region is not None else None) is None]
+                    extracted = LayerExtractor(pbf_file_path, missing, region).run()
+                return extracted.get(layer)
 
-        if found is None:
-            print_to_console(
-                'No preprocessed file can be used, planet file will be returned!')
-            return self.path_to_latest_planet
+            return load
 
-        print_to_console(f'Preprocessed file was found: {found}')
-        return found
+        layers = {}
+        for layer in layer_names:
+            layers[layer] = self.layer_cache.get_layer(
+                pbf_file_path, layer, loader_of(layer), layer_filter(layer), bbox_list, region)
 
-    def plot_roads(self, osm: pyrosm, ax):
+        print_to_console(f'Layer cache: {self.layer_cache.statistics()}')
 
-        roads = osm.get_network(network_type="all")
+        return layers
 
-        # Plot Roads
-        if roads is not None:
-            print("Roads plotted!")
-            roads.plot(ax=ax, linewidth=0.3,
-                       color=self.colorMapping.get_color("roads"), alpha=0.7)
-        else:
-            print("Roads not plotted!")
-
-    def plot_natural(self, osm: pyrosm, ax):
-
-        natural = osm.get_data_by_custom_criteria(
-            custom_filter={"natural": True})
-
-        if natural is not None:
-            if "natural" in natural.columns:
-                natural_wood = natural[natural["natural"] == "wood"]
-                natural_water = natural[natural["natural"] == "water"]
-                grassland = natural[natural["natural"] == "grassland"]
-                natural = natural[natural["natural"] == "natural"]
-
-                if not natural_wood.empty:
-                    print("Natural wood plotted!")
-                    natural_wood.plot(ax=ax, color=self.colorMapping.get_color(
-                        "natural_wood"), alpha=0.5)
-                else:
-                    print("Natural wood not plotted!")
-                if not natural_water.empty:
-                    print("Natural water plotted!")
-                    natural_water.plot(ax=ax, color=self.colorMapping.get_color(
-                        "natural_water"), alpha=0.5)
-                else:
-                    print("Natural water not plotted!")
-                if not grassland.empty:
-                    print("Grassland plotted!")
-                    grassland.plot(ax=ax, color=self.colorMapping.get_color(
-                        "grassland"), alpha=0.5)
-                else:
-                    print("Grassland not plotted!")
-                if not natural.empty:
-                    print("Natural plotted!")
-                    natural.plot(ax=ax, color=self.colorMapping.get_color(
-                        "natural"), alpha=0.5)
-                else:
-                    print("Natural not plotted!")
-
-    def plot_landuse(self, osm: pyrosm, ax):
-
-        landuse = osm.get_data_by_custom_criteria(
-            custom_filter={"landuse": True})
-
-        if landuse is not None:
-
-            if "landuse" in landuse.columns:
-
-                for value in ["allotments", "brownfield", "basin", "cemetery", "commercial", "construction", "farmland",
-                              "forest", "farmyard", "flowerbed", "garages", "grass", "greenhouse_horticulture", "greenfield",
-                              "landfill", "salt_pond", "industrial", "orchard", "residential", "retail", "landfill", "meadow",
-                              "military", "plant_nursery", "quarry", "railway", "religious", "recreation_ground",
-                              "village_green", "vineyard"]:
-                    area = landuse[landuse["landuse"] == value]
-                    if not area.empty:
-                        print(f"{value} plotted!")
-                        area.plot(ax=ax, color=self.colorMapping.get_color(
-                            value), alpha=0.3)
-                    else:
-                        print(f"{value} not platted!")
-
-    def plot_aeroway(self, osm: pyrosm, ax):
-
-        aeroway = osm.get_data_by_custom_criteria(
-            custom_filter={"aeroway": True})
-
-        if aeroway is not None:
-            if "aeroway" in aeroway.columns:
-
-                apron = aeroway[aeroway["aeroway"] == "apron"]
-                terminal = aeroway[aeroway["aeroway"] == "terminal"]
-
-                if not apron.empty:
-                    print("Farmland plotted!")
-                    apron.plot(ax=ax, color=self.colorMapping.get_color(
-                        "apron"), alpha=0.3)
-                else:
-                    print("Apron not plotted!")
-
-                if not terminal.empty:
-                    print("Terminal plotted!")
-                    terminal.plot(ax=ax, color=self.colorMapping.get_color(
-                        "terminal"), alpha=0.5)
-
-    def plot_buildings(self, osm: pyrosm, ax):
-        buildings = osm.get_buildings()
-        if buildings is not None:
-            print("Buildings plotted!")
-            buildings.plot(ax=ax, color=self.colorMapping.get_color(
-                "buildings"), alpha=0.5)
-        else:
-            print("Buildings not plotted!")
+    def scan_tags(self, pbf_file_path: str, bbox_list: list):
+        """Prints the elements of every tag known to pyrosm inside of the bounding box. Each tag is a separate
+        query, so this is only done if scan_available_tags is set.
 
-    def main(self):
-        """Main executin method for the Generator
+        Args:
+            pbf_file_path (str): Path of the osm file.
+            bbox_list (list): [min_lon, min_lat, max_lon, max_lat]
         """
-        # [west, south, east, north]
-        bbox, bbox_dict = self.bounding_box()
-
-        print_to_console(f'Generate GeoFrame for Bounding-Box: {bbox}')
-
-        # Get correct file
-        pbf_file_path = self.select_pbf_file(bbox_dict)
-
-        # Bbox must be parsed to a list of style: minx, miny, maxx, maxy
-        bbox_list = [bbox_dict['lon min'], bbox_dict['lat min'],
-                     bbox_dict['lon max'], bbox_dict['lat max']]
-
-        print(pbf_file_path)
-        # Load pdf file and with bounding box
-        clipped_osm = OSM(os.path.join(self.path_to_latest_preprocessed, os.path.basename(pbf_file_path)),
-                          bounding_box=bbox_list)
-
-        fig, axes = plt.subplots(figsize=(12, 12))
-        background_color = "white"
-        fig.patch.set_facecolor(background_color)
+        clipped_osm = OSM(pbf_file_path, bounding_box=bbox_list)
 
         available_tags = pyrosm.pyrosm.Conf.tags.available
         print_to_console(f'Available tags: {available_tags}')
@@ -251,30 +278,272 @@ class Generator:
 
         print("--------------------")
 
-        self.plot_roads(clipped_osm, axes)
-        self.plot_natural(clipped_osm, axes)
-        self.plot_landuse(clipped_osm, axes)
-        self.plot_buildings(clipped_osm, axes)
+    def pyramid_level(self, pbf_file_path: str, bbox_dict: dict, pixels: float) -> int | None:
+        """Selects the level of the tile pyramid with the coarsest detail which is still finer than the pixels of
+        the map.
+
+        Args:
+            pbf_file_path (str): Path of the osm file.
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+            pixels (float): Number of pixels along the longer side of the map.
+
+        Returns:
+            int | None: The zoom of the level or None, if the map is read from the osm file, because it needs
+                more detail or the level was not built.
+        """
+        if not self.use_tile_pyramid:
+            return None
+
+        zoom = level_for(pixel_size(bbox_dict, pixels)[0], self.pyramid_zooms)
+        if zoom is None or not os.path.exists(pyramid_path_of(pbf_file_path, zoom)):
+            return None
+
+        return zoom
+
+    def print_drawn(self, layer: str, drawn: dict):
+
+        if drawn:
+            print_to_console(f'{layer} plotted: {drawn}')
+        else:
+            print_to_console(f'{layer} not plotted!')
+
+    def plot_roads(self, roads, ax):
+
+        self.print_drawn('Roads', self.layer_renderer.plot_layer(
+            roads, ax, color='roads', alpha=0.7, linewidth=0.3))
+
+    def plot_natural(self, natural, ax):
+
+        categories = {'wood': ('natural_wood', 0.5), 'water': ('natural_water', 0.5),
+                      'grassland': ('grassland', 0.5), 'natural': ('natural', 0.5)}
+        self.print_drawn('Natural', self.layer_renderer.plot_layer(
+            natural, ax, column='natural', categories=categories))
+
+    def plot_landuse(self, landuse, ax):
+
+        categories = {value: (value, 0.3) for value in self.landuse_values}
+        self.print_drawn('Landuse', self.layer_renderer.plot_layer(
+            landuse, ax, column='landuse', categories=categories))
+
+    def plot_aeroway(self, aeroway, ax):
+
+        categories = {'apron': ('apron', 0.3), 'terminal': ('terminal', 0.5)}
+        self.print_drawn('Aeroway', self.layer_renderer.plot_layer(
+            aeroway, ax, column='aeroway', categories=categories))
 
-        buildings = clipped_osm.get_buildings()
-        print("Buildings shape:", buildings.shape)
-        print("Buildings CRS:", buildings.crs)
-        print("Buildings bounds:", buildings.total_bounds)
+    def plot_buildings(self, buildings, ax):
+
+        self.print_drawn('Buildings', self.layer_renderer.plot_layer(
+            buildings, ax, color='buildings', alpha=0.5))
+
+    def pbf_files_of(self, bbox_dict: dict) -> list:
+        """Returns the paths of the preprocessed files which are rendered for the bounding box.
+
+        Args:
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+
+        Returns:
+            list: Paths of the files, see select_pbf_files.
+        """
+        return [os.path.join(self.path_to_latest_preprocessed, os.path.basename(pbf_file_path))
+                for pbf_file_path in self.select_pbf_files(bbox_dict)]
+
+    def load_map_layers(self, pbf_file_paths: list, bbox_dict: dict, pixels: float) -> dict:
+        """Loads the layers of the bounding box from all of its files, each from the level of the tile pyramid
+        which matches the pixels of the map, from the layer store or from the osm file. If the map crosses
+        multiple files, only their parts around the map are parsed and the layers of the files are merged.
+
+        Args:
+            pbf_file_paths (list): Paths of the osm files.
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+            pixels (float): Number of pixels along the longer side of the map.
+
+        Returns:
+            dict: {name of the layer: GeoDataFrame or None}
+        """
+        bbox_list = [bbox_dict['lon min'], bbox_dict['lat min'],
+                     bbox_dict['lon max'], bbox_dict['lat max']]
+
+        # A map which crosses several files only needs the part of every file around it
+        clipped = len(pbf_file_paths) > 1
+
+        layers_of_files = []
+        for pbf_file_path in pbf_file_paths:
+
+            zoom = self.pyramid_level(pbf_file_path, bbox_dict, pixels)
+            if zoom is None and self.use_layer_store:
+                # The store is read directly, only the row groups of the bounding box are decoded
+                layers = LayerStore(pbf_file_path).read(self.style_layers, bbox_list)
+                if layers is not None:
+                    print_to_console(f'Layers of {pbf_file_path} were read from the layer store')
+                    layers_of_files.append(layers)
+                    continue
+
+            try:
+                layers_of_files.append(self.load_layers(pbf_file_path, bbox_list, zoom=zoom, clipped=clipped))
+            except FileNotFoundError as e:
+                print_to_console(f'{e}, the osm file is read instead')
+                zoom = None
+                layers_of_files.append(self.load_layers(pbf_file_path, bbox_list, clipped=clipped))
+            if zoom is not None:
+                print_to_console(f'Layers of {pbf_file_path} were read from level {zoom} of the tile pyramid')
+
+        if len(layers_of_files) == 1:
+            return layers_of_files[0]
+
+        return {layer: merge_layers([layers[layer] for layers in layers_of_files]) for layer in self.style_layers}
+
+    def plot_map(self, ax, pbf_file_paths: list, bbox_dict: dict, pixels: float | None = None) -> dict:
+        """Plots all layers of the style inside of the bounding box and limits the axes to it.
+
+        Args:
+            ax (matplotlib.axes.Axes): The axes to draw on.
+            pbf_file_paths (list): Paths of the osm files, see pbf_files_of.
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+            pixels (float, optional): Number of pixels along the longer side of the map, sets the level of
+                detail. Defaults to the longer side of the figure of the axes.
+
+        Returns:
+            dict: {name of the layer: GeoDataFrame or None}, the layers as they were drawn
+        """
+        if self.scan_available_tags:
+            # Bbox must be parsed to a list of style: minx, miny, maxx, maxy
+            bbox_list = [bbox_dict['lon min'], bbox_dict['lat min'],
+                         bbox_dict['lon max'], bbox_dict['lat max']]
+            for pbf_file_path in pbf_file_paths:
+                self.scan_tags(pbf_file_path, bbox_list)
+
+        if pixels is None:
+            pixels = max(ax.figure.get_size_inches()) * ax.figure.dpi
+
+        layers = self.load_map_layers(pbf_file_paths, bbox_dict, pixels)
+
+        if self.level_of_detail:
+            level_of_detail = LevelOfDetail(bbox_dict, pixels)
+            layers = {layer: level_of_detail.apply(frame) for layer, frame in layers.items()}
+
+        plotters = {'roads': self.plot_roads, 'natural': self.plot_natural, 'landuse': self.plot_landuse,
+                    'aeroway': self.plot_aeroway, 'buildings': self.plot_buildings}
+        for layer in self.style_layers:
+            plotters[layer](layers[layer], ax)
 
         # Kartenlimits setzen
-        xmin = bbox_dict['lon min']
-        ymin = bbox_dict['lat min']
-        xmax = bbox_dict['lon max']
-        ymax = bbox_dict['lat max']
-
-        axes.set_xlim(xmin, xmax)
-        axes.set_ylim(ymin, ymax)
-        axes.set_facecolor(background_color)
-        axes.axis('off')
-        plt.tight_layout()
-        plt.savefig("map.png", dpi=300, bbox_inches='tight',
-                    facecolor=fig.get_facecolor())
-        plt.show()
+        ax.set_xlim(bbox_dict['lon min'], bbox_dict['lon max'])
+        ax.set_ylim(bbox_dict['lat min'], bbox_dict['lat max'])
+        ax.set_facecolor(self.background_color)
+        ax.axis('off')
+
+        return layers
+
+    def check_pbf_files(self, bbox_dict: dict, pbf_file_paths: list | None) -> list:
+        """Returns the given osm files or selects them for the bounding box.
+
+        Raises:
+            FileNotFoundError: If an osm file does not exist.
+        """
+        if pbf_file_paths is None:
+            pbf_file_paths = self.pbf_files_of(bbox_dict)
+
+        missing = [pbf_file_path for pbf_file_path in pbf_file_paths if not os.path.exists(pbf_file_path)]
+        if missing:
+            raise FileNotFoundError(f'No osm file for the bounding box: {", ".join(missing)}')
+
+        return list(pbf_file_paths)
+
+    def save_map(self, output, bbox_dict: dict, pbf_file_paths: list | None = None, dpi: int = 300,
+                 size: float = 12) -> dict:
+        """Renders the map of the bounding box as png. The figure has the shape of the map, so it is drawn once,
+        instead of twice for a tight bounding box.
+
+        Args:
+            output (str | file): Path or file object of the png.
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+            pbf_file_paths (list, optional): Paths of the osm files. Defaults to the files selected for the
+                bounding box.
+            dpi (int, optional): Resolution of the image. Defaults to 300.
+            size (float, optional): Length of the longer side of the image in inches. Defaults to 12.
+
+        Returns:
+            dict: {name of the layer: GeoDataFrame or None}
+
+        Raises:
+            FileNotFoundError: If an osm file does not exist.
+        """
+        pbf_file_paths = self.check_pbf_files(bbox_dict, pbf_file_paths)
+
+        figure = Figure(facecolor=self.background_color)
+        ax = figure.add_axes((0, 0, 1, 1))
+        layers = self.plot_map(ax, pbf_file_paths, bbox_dict, size * dpi)
+        figure.set_size_inches(*figure_size(ax, size))
+
+        figure.savefig(output, format='png', dpi=dpi, facecolor=figure.get_facecolor())
+        return layers
+
+    def render_settings(self) -> dict:
+        """Returns the settings which change the rendered image, they are part of the key of the render cache."""
+        return {
+            'style_layers': list(self.style_layers),
+            'background_color': self.background_color,
+            'colors': self.colorMapping.fingerprint,
+            'level_of_detail': self.level_of_detail,
+            'use_tile_pyramid': self.use_tile_pyramid,
+            'pyramid_zooms': list(self.pyramid_zooms),
+            'use_layer_store': self.use_layer_store,
+        }
+
+    def render_image(self, bbox_dict: dict, pbf_file_paths: list | None = None, dpi: int = 300,
+                     size: float = 12) -> bytes:
+        """Returns the png of the map from the render cache or renders and caches it.
+
+        Args:
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+            pbf_file_paths (list, optional): Paths of the osm files. Defaults to the files selected for the
+                bounding box.
+            dpi (int, optional): Resolution of the image. Defaults to 300.
+            size (float, optional): Length of the longer side of the image in inches. Defaults to 12.
+
+        Returns:
+            bytes: The png.
+
+        Raises:
+            FileNotFoundError: If an osm file does not exist.
+        """
+        pbf_file_paths = self.check_pbf_files(bbox_dict, pbf_file_paths)
+
+        key = None
+        if self.render_cache is not None:
+            key = self.render_cache.key(bbox_dict, self.colorMapping.theme, dpi, size, pbf_file_paths,
+                                        self.render_settings())
+            image = self.render_cache.get(key)
+            if image is not None:
+                print_to_console(f'Map was found in the render cache: {key}')
+                return image
+
+        output = io.BytesIO()
+        self.save_map(output, bbox_dict, pbf_file_paths, dpi, size)
+        image = output.getvalue()
+
+        if key is not None:
+            self.render_cache.put(key, image)
+        return image
+
+    def main(self):
+        """Main executin method for the Generator
+        """
+        # [west, south, east, north]
+        bbox, bbox_dict = self.bounding_box()
+
+        print_to_console(f'Generate GeoFrame for Bounding-Box: {bbox}')
+
+        # Get correct files
+        pbf_file_paths = self.pbf_files_of(bbox_dict)
+
+        # Repeated maps of unchanged files are read from the render cache
+        image = self.render_image(bbox_dict, pbf_file_paths)
+        with open("map.png", 'wb') as f:
+            f.write(image)
+
+        print_to_console(f'Map was saved: {os.path.abspath("map.png")}')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+
+from src.common.DiskLRUCache import DiskLRUCache
+
+# Render cache of this process, see get_render_cache
+_render_cache = None
+
+
+class RenderCache:
+    """Content addressed cache of rendered maps on disk.
+
+    The key of a map is the hash of its bounding box, rounded to `precision` decimal places, the theme, dpi
+    and size of the image, the settings of the generator, including a hash of the colors of the theme, and the
+    versions of the osm files it is rendered from. The version is the modification time and size of a file, so
+    a map is rendered again as soon as a preprocessed file or the theme changes, and the outdated images are
+    removed by the LRU eviction of the DiskLRUCache.
+    """
+
+    def __init__(self, path: str | None = None, max_bytes: int = 1024 * 1024 * 1024, precision: int = 6):
+        """
+        Args:
+            path (str, optional): Directory of the cache. Defaults to src/resources/render_cache.
+            max_bytes (int, optional): Maximal size of all images in bytes. Defaults to 1 GB.
+            precision (int, optional): Decimal places of the bounding box in the key. Defaults to 6.
+        """
+        # Absolute, because the generator resolves its files relative to the working directory
+        self.path = os.path.abspath(default_path() if path is None else path)
+        self.precision = precision
+        self.disk_cache = DiskLRUCache(self.path, max_bytes)
+
+    @staticmethod
+    def data_version(pbf_file_path: str) -> str:
+        """Version of an osm file, changes whenever the file is rewritten.
+
+        Args:
+            pbf_file_path (str): Path of the osm file.
+
+        Returns:
+            str: The version.
+        """
+        stat = os.stat(pbf_file_path)
+        return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+    def key(self, bbox_dict: dict, theme: str, dpi: int, size: float, pbf_file_paths: list,
+            settings: dict | None = None) -> str:
+        """Builds the key of a map.
+
+        Args:
+            bbox_dict (dict): The bounding box with lon min, lon max, lat min and lat max.
+            theme (str): Theme of the colors.
+            dpi (int): Resolution of the image.
+            size (float): Length of the longer side of the image in inches.
+            pbf_file_paths (list): Paths of the osm files the map is rendered from.
+            settings (dict, optional): Settings of the generator which change the image, see
+                Generator.render_settings. Defaults to None.
+
+        Returns:
+            str: The hash of the map.
+
+        Raises:
+            FileNotFoundError: If an osm file does not exist.
+        """
+        frame = {
+            'bbox': [round(float(bbox_dict[name]), self.precision)
+                     for name in ['lon min', 'lat min', 'lon max', 'lat max']],
+            'theme': theme,
+            'dpi': int(dpi),
+            'size': float(size),
+            'files': sorted([os.path.abspath(pbf_file_path), self.data_version(pbf_file_path)]
+                            for pbf_file_path in pbf_file_paths),
+            'settings': settings or {},
+        }
+        return hashlib.sha256(json.dumps(frame, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        return self.disk_cache.get(key)
+
+    def put(self, key: str, image: bytes):
+        self.disk_cache.put(key, image)
+
+    def statistics(self) -> dict:
+        return self.disk_cache.statistics()
+
+
+def default_path() -> str:
+    return os.path.join('src', 'resources', 'render_cache')
+
+
+def get_render_cache(path: str | None = None, max_bytes: int | None = None) -> RenderCache:
+    """Returns the render cache of the process. It is replaced, if the directory of the cache changes, e.g.
+    with the working directory.
+
+    Args:
+        path (str, optional): Directory of the cache. Defaults to src/resources/render_cache.
+        max_bytes (int, optional): Changes the size of the cache. Defaults to None.
+
+    Returns:
+        RenderCache: The cache.
+    """
+    global _render_cache
+    path = os.path.abspath(default_path() if path is None else path)
+    if _render_cache is None or _render_cache.path != path:
+        _render_cache = RenderCache(path)
+    if max_bytes is not None:
+        _render_cache.disk_cache.max_bytes = max_bytes
+
+    return _render_cache
@@ -0,0 +1,166 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from src.common.Utilities import print_to_console
+from src.core.LayerExtractor import LAYER_TAGS, LayerExtractor
+from src.core.LevelOfDetail import LevelOfDetail, pixel_size
+
+# Features of every zoom level of the pyramid: {zoom: {layer: values of its tag which are kept or None for all}}.
+# Layers which are missing on a level are not drawn on it.
+PYRAMID_LEVELS = {
+    8: {'roads': ['motorway', 'motorway_link', 'trunk', 'trunk_link', 'primary', 'primary_link'],
+        'natural': None, 'landuse': None, 'aeroway': None},
+    10: {'roads': ['motorway', 'motorway_link', 'trunk', 'trunk_link', 'primary', 'primary_link', 'secondary',
+                   'secondary_link', 'tertiary', 'tertiary_link'],
+         'natural': None, 'landuse': None, 'aeroway': None},
+    12: {'roads': None, 'natural': None, 'landuse': None, 'aeroway': None, 'buildings': None},
+}
+
+
+def pixel_width_of(zoom: int) -> float:
+    """Width of a pixel in degrees of longitude on a zoom level, with tiles of 256 pixels as in slippy maps."""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def level_for(pixel_width: float, zooms) -> int | None:
+    """Selects the coarsest zoom level whose pixels are at most as wide as the pixels of the map.
+
+    Args:
+        pixel_width (float): Width of a pixel of the map in degrees of longitude.
+        zooms (iterable): The zoom levels of the pyramid.
+
+    Returns:
+        int | None: The zoom level or None, if the map needs more detail than the finest level.
+    """
+    sufficient = [zoom for zoom in zooms if pixel_width_of(zoom) <= pixel_width]
+    return min(sufficient) if sufficient else None
+
+
+def pyramid_path_of(pbf_file_path: str, zoom: int) -> str:
+    """Path of a level of the pyramid in the pyramid folder next to the osm file, e.g. pyramid/<name>.z10.npz"""
+    name = os.path.basename(pbf_file_path).removesuffix('.osm.pbf')
+    return os.path.join(os.path.dirname(pbf_file_path), 'pyramid', f'{name}.z{zoom}.npz')
+
+
+class TilePyramid:
+    """Pre-generalized levels of the layers of a preprocessed file.
+
+    The layers are extracted from the file once. Every zoom level keeps only its layers and tag values, the
+    geometries are simplified to the pixel size of the level and features below a pixel are dropped. A level
+    is stored as npz file with the WKB of the geometries, the osm ids and types and the tag of every layer,
+    together with the modification time and size of the osm file, so an outdated level is never read.
+    """
+
+    def __init__(self, pbf_file_path: str, levels: dict | None = None):
+        """
+        Args:
+            pbf_file_path (str): Path of the preprocessed osm file.
+            levels (dict, optional): The zoom levels, see PYRAMID_LEVELS. Defaults to PYRAMID_LEVELS.
+        """
+        self.pbf_file_path = pbf_file_path
+        self.levels = PYRAMID_LEVELS if levels is None else levels
+
+    def build(self) -> list:
+        """Extracts the layers of the file and writes all levels.
+
+        Returns:
+            list: Paths of the written levels.
+        """
+        stat = os.stat(self.pbf_file_path)
+        layer_names = sorted({layer for level in self.levels.values() for layer in level})
+        layers = LayerExtractor(self.pbf_file_path, layer_names).run()
+
+        paths = []
+        for zoom, level in sorted(self.levels.items()):
+
+            generalized = {}
+            for layer, values in level.items():
+                frame = layers.get(layer)
+                if frame is not None and values is not None:
+                    frame = frame[frame[LAYER_TAGS[layer]].isin(values)]
+                if frame is None or frame.empty:
+                    continue
+
+                # Pixels of the level along the longer side of the layer, the features are not clipped
+                min_x, min_y, max_x, max_y = frame.total_bounds
+                bbox_dict = {'lon min': min_x, 'lon max': max_x, 'lat min': min_y, 'lat max': max_y}
+                pixels = max(pixel_size(bbox_dict, 1)[0] / pixel_width_of(zoom), 1)
+                generalized[layer] = LevelOfDetail(bbox_dict, pixels, clip=False).apply(frame)
+
+            path = pyramid_path_of(self.pbf_file_path, zoom)
+            self.save_level(path, generalized, stat.st_mtime_ns, stat.st_size)
+            paths.append(path)
+
+        print_to_console(f'Built {len(paths)} pyramid levels of {self.pbf_file_path}')
+        return paths
+
+    @staticmethod
+    def save_level(path: str, layers: dict, source_mtime_ns: int, source_size: int):
+        """Stores a level with the stamp of the osm file it was built from.
+
+        Args:
+            path (str): Target path of the level.
+            layers (dict): {name of the layer: GeoDataFrame}
+            source_mtime_ns (int): Modification time of the osm file.
+            source_size (int): Size of the osm file.
+        """
+        arrays = {}
+        for layer, frame in layers.items():
+            if frame is None or frame.empty:
+                continue
+
+            wkb = shapely.to_wkb(np.asarray(frame.geometry.values))
+            arrays[f'{layer}_geometry'] = np.frombuffer(b''.join(wkb), dtype=np.uint8)
+            arrays[f'{layer}_offsets'] = np.cumsum([0] + [len(value) for value in wkb], dtype=np.int64)
+            arrays[f'{layer}_id'] = frame['id'].to_numpy(dtype=np.int64)
+            arrays[f'{layer}_type'] = frame['osm_type'].fillna('').astype(str).to_numpy(dtype=str)
+            arrays[f'{layer}_tag'] = frame[LAYER_TAGS[layer]].fillna('').astype(str).to_numpy(dtype=str)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, layers=np.array(sorted({key.split('_')[0] for key in arrays}), dtype=str),
+                     source_mtime_ns=source_mtime_ns, source_size=source_size, **arrays)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load_level(pbf_file_path: str, zoom: int) -> dict | None:
+        """Loads a level, if it was built from the current state of the osm file.
+
+        Args:
+            pbf_file_path (str): Path of the osm file.
+            zoom (int): The zoom level.
+
+        Returns:
+            dict | None: {name of the layer: GeoDataFrame with the columns id, osm_type, the tag of the layer and
+                geometry}
+                or None, if the level is missing or outdated. Layers which are not part of the level are missing.
+        """
+        path = pyramid_path_of(pbf_file_path, zoom)
+        if not os.path.exists(path):
+            return None
+
+        stat = os.stat(pbf_file_path)
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['source_mtime_ns']) != stat.st_mtime_ns or int(data['source_size']) != stat.st_size:
+                return None
+
+            layers = {}
+            for layer in data['layers']:
+                buffer = data[f'{layer}_geometry'].tobytes()
+                offsets = data[f'{layer}_offsets']
+                geometries = shapely.from_wkb([buffer[start:end] for start, end in zip(offsets[:-1], offsets[1:])])
+                layers[str(layer)] = gpd.GeoDataFrame(
+                    {'id': data[f'{layer}_id'], 'osm_type': data[f'{layer}_type'].astype(object),
+                     LAYER_TAGS[str(layer)]: data[f'{layer}_tag'].astype(object)},
+                    geometry=geometries, crs='EPSG:4326')
+
+        return layers
+
+
+def build_pyramid(pbf_file_path: str) -> list:
+    """Builds the pyramid of a file in a worker of the preprocessor, see TilePyramid.build."""
+    return TilePyramid(pbf_file_path).build()
@@ -0,0 +1,152 @@
+import math
+import os
+from array import array
+
+import numpy as np
+import osmium
+
+from src.common.PbfReader import PbfReader
+from src.common.Utilities import print_to_console
+
+
+class DensityHistogram:
+    """Coarse 2D histogram of the node density of an osm file.
+
+    The histogram is used to place the split boundaries by the cumulative density instead of equal intervals,
+    so that dense areas get small sub files and nearly empty areas are not extracted at all. It is cached next
+    to the osm file as <file>.density.npz and reused as long as the size and modification time of the file
+    are unchanged.
+    """
+
+    chunk_size = 1000000
+
+    def __init__(self, counts: np.ndarray, lon_min: float, lon_max: float, lat_min: float, lat_max: float):
+
+        # counts[x, y]: number of nodes in longitude bin x and latitude bin y
+        self.counts = counts
+        self.lon_edges = np.linspace(lon_min, lon_max, counts.shape[0] + 1)
+        self.lat_edges = np.linspace(lat_min, lat_max, counts.shape[1] + 1)
+
+    @classmethod
+    def build(cls, path: str, lon_min: float, lon_max: float, lat_min: float, lat_max: float, resolution: int):
+        """Reads all node coordinates of the file and counts them per bin.
+
+        Args:
+            path (str): Path to the osm file.
+            lon_min (float): The lower value of the longitudinal range.
+            lon_max (float): The upper value of the longitudinal range.
+            lat_min (float): The lower value of the latitude range.
+            lat_max (float): The upper value of the latitude range.
+            resolution (int): Number of bins per axis.
+
+        Returns:
+            DensityHistogram: The histogram of the file.
+        """
+        print_to_console(f'Building density histogram ({resolution}x{resolution}) for {path}')
+
+        counts = np.zeros((resolution, resolution), dtype=np.int64)
+        value_range = [[lon_min, lon_max], [lat_min, lat_max]]
+        lons, lats = array('d'), array('d')
+
+        def add_chunk():
+            chunk, _, _ = np.histogram2d(np.frombuffer(lons, dtype=np.float64), np.frombuffer(lats, dtype=np.float64),
+                                         bins=resolution, range=value_range)
+            counts[:] += chunk.astype(np.int64)
+            del lons[:]
+            del lats[:]
+
+        # The node coordinates of pbf files are decoded blob by blob with NumPy
+        if path.endswith('.pbf'):
+            for blob_lons, blob_lats in PbfReader(path).iter_node_coordinates():
+                chunk, _, _ = np.histogram2d(blob_lons, blob_lats, bins=resolution, range=value_range)
+                counts[:] += chunk.astype(np.int64)
+            return cls(counts, lon_min, lon_max, lat_min, lat_max)
+
+        for node in osmium.FileProcessor(path, osmium.osm.NODE):
+            location = node.location
+            if location.valid():
+                lons.append(location.lon)
+                lats.append(location.lat)
+                if len(lons) >= cls.chunk_size:
+                    add_chunk()
+        add_chunk()
+
+        return cls(counts, lon_min, lon_max, lat_min, lat_max)
+
+    @staticmethod
+    def cache_path_of(path: str) -> str:
+        return f'{path}.density.npz'
+
+    @classmethod
+    def load_or_build(cls, path: str, lon_min: float, lon_max: float, lat_min: float, lat_max: float, resolution: int):
+        """Returns the cached histogram of the file or builds and caches it.
+
+        Returns:
+            DensityHistogram: The histogram of the file.
+        """
+        stat = os.stat(path)
+        cache_path = cls.cache_path_of(path)
+        bounds = np.array([lon_min, lon_max, lat_min, lat_max], dtype=np.float64)
+
+        if os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as data:
+                if int(data['source_size']) == stat.st_size and int(data['source_mtime_ns']) == stat.st_mtime_ns \
+                        and data['counts'].shape == (resolution, resolution) and np.allclose(data['bounds'], bounds):
+                    return cls(data['counts'], lon_min, lon_max, lat_min, lat_max)
+
+        histogram = cls.build(path, lon_min, lon_max, lat_min, lat_max, resolution)
+        tmp_path = f'{cache_path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, counts=histogram.counts, bounds=bounds, source_size=stat.st_size,
+                     source_mtime_ns=stat.st_mtime_ns)
+        os.replace(tmp_path, cache_path)
+
+        return histogram
+
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def split(self, target_count: float) -> list:
+        """Splits the histogram kd-tree like into bounding boxes with about target_count nodes. Each region is
+        cut along its longer axis at the bin where the cumulative density reaches the share of the first part.
+        Regions without any node are dropped.
+
+        Args:
+            target_count (float): The aimed number of nodes per bounding box.
+
+        Returns:
+            list: List of (min_lon, min_lat, max_lon, max_lat) tuples.
+        """
+        bounding_boxes = []
+        regions = [(0, self.counts.shape[0], 0, self.counts.shape[1])]
+
+        while regions:
+            x0, x1, y0, y1 = regions.pop()
+            region = self.counts[x0:x1, y0:y1]
+            count = int(region.sum())
+
+            if count == 0:
+                continue
+
+            parts = math.ceil(count / max(target_count, 1))
+            if parts <= 1 or (x1 - x0 == 1 and y1 - y0 == 1):
+                bounding_boxes.append((float(self.lon_edges[x0]), float(self.lat_edges[y0]),
+                                       float(self.lon_edges[x1]), float(self.lat_edges[y1])))
+                continue
+
+            # Cut the longer axis (in degrees), as long as it has more than one bin
+            lon_extent = self.lon_edges[x1] - self.lon_edges[x0]
+            lat_extent = self.lat_edges[y1] - self.lat_edges[y0]
+            split_lon = (lon_extent >= lat_extent and x1 - x0 > 1) or y1 - y0 == 1
+
+            cumulative = np.cumsum(region.sum(axis=1 if split_lon else 0))
+            share = count * (parts // 2) / parts
+            cut = int(np.searchsorted(cumulative, share)) + 1
+            cut = min(max(cut, 1), len(cumulative) - 1)
+
+            if split_lon:
+                regions.extend([(x0, x0 + cut, y0, y1), (x0 + cut, x1, y0, y1)])
+            else:
+                regions.extend([(x0, x1, y0, y0 + cut), (x0, x1, y0 + cut, y1)])
+
+        return bounding_boxes
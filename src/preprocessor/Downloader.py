@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from progress.bar import Bar
+
+from src.common.Utilities import print_to_console
+
+
+class Downloader:
+    """Downloads the osm files with parallel HTTP range requests into a preallocated file.
+
+    The finished parts are recorded in a state file next to the download (<file>.download.json), so an
+    interrupted download continues with the missing parts. After the download the file is verified against
+    the published md5 file (<url>.md5), as provided by planet.openstreetmap.org and geofabrik.
+    """
+
+    def __init__(self, connections: int = 8, part_size: int = 64 * 1024 * 1024, chunk_size: int = 1024 * 1024,
+                 timeout: int = 60, verify_md5: bool = True):
+        """
+        Args:
+            connections (int, optional): Number of parallel range requests per file. Defaults to 8.
+            part_size (int, optional): Size of one range request in bytes. Defaults to 64MB.
+            chunk_size (int, optional): Size of the buffered chunks written to the file. Defaults to 1MB.
+            timeout (int, optional): Timeout of the requests in seconds. Defaults to 60.
+            verify_md5 (bool, optional): Verifies the download against the md5 file. Defaults to True.
+        """
+        self.connections = connections
+        self.part_size = part_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.verify_md5 = verify_md5
+
+    @staticmethod
+    def state_path_of(path: str) -> str:
+        return f'{path}.download.json'
+
+    def download_many(self, downloads: list, parallel_files: int = 2) -> list:
+        """Downloads multiple files at the same time.
+
+        Args:
+            downloads (list): List of (url, path) pairs.
+            parallel_files (int, optional): Number of files which are downloaded at the same time. Defaults to 2.
+
+        Returns:
+            list: The paths of the downloaded files.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, parallel_files)) as executor:
+            futures = [executor.submit(self.download, url, path) for url, path in downloads]
+            return [future.result() for future in futures]
+
+    def download(self, url: str, path: str) -> str:
+        """Downloads one file, continues a previous download of the same file if possible.
+
+        Args:
+            url (str): The url of the file.
+            path (str): The target path.
+
+        Raises:
+            ValueError: If the downloaded file does not match the md5 file.
+
+        Returns:
+            str: The path of the downloaded file.
+        """
+        response = requests.head(url, allow_redirects=True, timeout=self.timeout)
+        response.raise_for_status()
+
+        # Use the url after redirects, so that all parts are requested from the same mirror
+        url = response.url
+        size = int(response.headers.get('content-length', 0))
+        version = response.headers.get('etag') or response.headers.get('last-modified') or ''
+        supports_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes' and size > 0
+
+        if supports_ranges:
+            self._download_parts(url, path, size, version)
+        else:
+            print_to_console(f'Server does not support range requests, downloading {url} as one stream')
+            self._download_stream(url, path)
+
+        if self.verify_md5:
+            self._verify(url, path)
+
+        state_path = self.state_path_of(path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+        print_to_console(f'Download finished: {path}')
+        return path
+
+    def _load_state(self, path: str, url: str, size: int, version: str) -> dict | None:
+
+        state_path = self.state_path_of(path)
+        if not os.path.exists(state_path) or not os.path.exists(path):
+            return None
+
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+        if state.get('url') != url or state.get('size') != size or state.get('version') != version \
+                or state.get('part_size') != self.part_size or os.path.getsize(path) != size:
+            print_to_console(f'Remote file changed, restarting download of {path}')
+            return None
+
+        return state
+
+    def _save_state(self, path: str, state: dict):
+
+        state_path = self.state_path_of(path)
+        tmp_path = f'{state_path}.tmp'
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _download_parts(self, url: str, path: str, size: int, version: str):
+
+        state = self._load_state(path, url, size, version)
+        if state is None:
+
+            # Preallocate the file, the parts are written to their offsets
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            state = {'url': url, 'size': size, 'version': version, 'part_size': self.part_size, 'done': []}
+            self._save_state(path, state)
+
+        part_count = (size + self.part_size - 1) // self.part_size
+        missing = [part for part in range(part_count) if part not in set(state['done'])]
+        if len(missing) < part_count:
+            print_to_console(f'Resuming download of {path}: {part_count - len(missing)}/{part_count} parts done')
+
+        lock = threading.Lock()
+        bar = Bar(f'Downloading {os.path.basename(path)}', max=part_count)
+        bar.index = part_count - len(missing)
+
+        def download_part(part: int):
+
+            start = part * self.part_size
+            end = min(start + self.part_size, size) - 1
+
+            with requests.get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True,
+                              timeout=self.timeout) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise ValueError(f'Server ignored the range request for part {part} of {url}')
+
+                with open(path, 'r+b') as f:
+                    f.seek(start)
+                    written = 0
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+
+            if written != end - start + 1:
+                raise ValueError(f'Part {part} of {url} is incomplete: {written} of {end - start + 1} bytes')
+
+            with lock:
+                state['done'].append(part)
+                self._save_state(path, state)
+                bar.next()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.connections)) as executor:
+            for future in [executor.submit(download_part, part) for part in missing]:
+                future.result()
+
+        bar.finish()
+
+    def _download_stream(self, url: str, path: str):
+
+        with requests.get(url, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            with open(path, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+
+    def _verify(self, url: str, path: str):
+
+        response = requests.get(f'{url}.md5', timeout=self.timeout)
+        if response.status_code == 404:
+            print_to_console(f'No md5 file published for {url}, skipping verification')
+            return
+        response.raise_for_status()
+
+        expected = response.text.split()[0].lower()
+
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                md5.update(chunk)
+
+        if md5.hexdigest() != expected:
+            os.remove(path)
+            state_path = self.state_path_of(path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            raise ValueError(f'Checksum mismatch for {path}: expected {expected}, got {md5.hexdigest()}')
+
+        print_to_console(f'Checksum verified: {path}')
@@ -0,0 +1,94 @@
+import json
+import os
+
+STATES = ['planned', 'extracting', 'extracted', 'indexed', 'moved', 'removed']
+
+
+class JobLedger:
+    """Records the state of every sub file of a preprocessing run, so that an interrupted run can be resumed.
+
+    Every sub file (tile) has its own state file in the ledger folder, which is replaced atomically with each
+    transition, so a crash leaves either the old or the new state and the workers never write the same file:
+        planned: The extraction of the tile is queued.
+        extracting: The tile is being written to the buffer folder.
+        extracted: The tile is complete in the buffer folder.
+        indexed: The statistics of the tile were read. It is in the manifest or, if split is set, its quadrants
+            are planned.
+        moved: The tile is in the preprocessed folder.
+        removed: The tile was empty or was removed after its quadrants were extracted.
+    A raw file gets the state planned, once all its tiles are planned, and moved, once it is in the done folder.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the ledger folder.
+        """
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def entry_path(self, path: str) -> str:
+        return os.path.join(self.path, f'{os.path.basename(path)}.json')
+
+    def get(self, path: str) -> dict | None:
+        """Returns the entry of the file.
+
+        Args:
+            path (str): Path of the tile or raw file.
+
+        Returns:
+            dict | None: The entry or None, if the file is unknown.
+        """
+        try:
+            with open(self.entry_path(path), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def set_state(self, path: str, state: str, **fields):
+        """Sets the state of the file, other fields of its entry are kept unless given.
+
+        Args:
+            path (str): Path of the tile or raw file.
+            state (str): The new state, see STATES.
+            **fields: Additional fields of the entry, e.g. source, bounding_box and depth of a planned tile.
+
+        Raises:
+            ValueError: If the state is unknown.
+        """
+        if state not in STATES:
+            raise ValueError(f'Unknown state: {state}')
+
+        entry = self.get(path) or {'path': path}
+        entry.update(fields, state=state)
+
+        entry_path = self.entry_path(path)
+        tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, entry_path)
+
+    def set_states(self, paths: list, state: str):
+        for path in paths:
+            self.set_state(path, state)
+
+    def entries(self) -> dict:
+        """Returns all entries.
+
+        Returns:
+            dict: {path of the file: entry}
+        """
+        entries = {}
+        for file in os.listdir(self.path):
+            if file.endswith('.json'):
+                with open(os.path.join(self.path, file), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                entries[entry['path']] = entry
+
+        return entries
+
+    def clear(self):
+        """Removes all entries, e.g. at the start of a new run."""
+        for file in os.listdir(self.path):
+            os.remove(os.path.join(self.path, file))
@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import os
+import queue
+import sys
+from collections import Counter
+from multiprocessing import Pool
+
+from src.common.Utilities import print_to_console
+
+# Preprocessor of the pool worker, it is passed once per worker by the initializer instead of with every job
+_worker_preprocessor = None
+
+
+def init_worker(preprocessor):
+    global _worker_preprocessor
+    _worker_preprocessor = preprocessor
+
+
+def execute_job(job: tuple) -> list:
+    try:
+        return _worker_preprocessor.split_file(job)
+    except SystemExit as e:
+        # Otherwise the worker would exit without a result and the scheduler would wait for it forever
+        raise RuntimeError(f'Job exited with code {e.code}') from None
+
+
+def available_memory_gb() -> float | None:
+    """Returns the available memory of the machine from /proc/meminfo.
+
+    Returns:
+        float | None: The available memory in gigabyte or None, if it is unknown (e.g. on windows).
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024 / 1024
+    except OSError:
+        pass
+
+    return None
+
+
+def worker_count(memory_per_worker_gb: float, cpu_count: int | None = None) -> int:
+    """Returns the number of workers which fit on the machine: one per core, as long as the available memory
+    suffices for all of them.
+
+    Args:
+        memory_per_worker_gb (float): Memory which one worker needs in gigabyte.
+        cpu_count (int, optional): Number of cores. Defaults to os.cpu_count().
+
+    Returns:
+        int: The number of workers, at least one.
+    """
+    count = cpu_count or os.cpu_count() or 1
+    memory_gb = available_memory_gb()
+    if memory_gb is not None and memory_per_worker_gb > 0:
+        count = min(count, int(memory_gb / memory_per_worker_gb))
+
+    return max(1, count)
+
+
+class JobScheduler:
+    """Executes the jobs of all raw files in one long-lived worker pool.
+
+    The jobs and their follow-up jobs are kept in one priority queue, largest first, and a job is only handed
+    to the pool, when a worker is idle. So there is no barrier between the raw files or the split levels and
+    the large jobs do not end up as stragglers at the end of the run. A job is a tuple (kind, path, parameter,
+    depth), see Preprocessor.split_file. Once all jobs of a raw file are finished, its move job is queued.
+    """
+
+    def __init__(self, preprocessor, processes: int):
+        """
+        Args:
+            preprocessor (Preprocessor): Executes the jobs, it is copied once into every worker.
+            processes (int): Number of workers.
+        """
+        self.preprocessor = preprocessor
+        self.processes = processes
+
+        self._heap = []
+        self._sequence = itertools.count()
+        self._results = queue.Queue()
+        self._open_jobs = Counter()  # Unfinished jobs per raw file
+        self._open_extractions = Counter()  # Unfinished extractions per source file
+
+    @staticmethod
+    def priority(job: tuple) -> int:
+        """Estimates the work of a job by the size of the file which is read."""
+        kind, path = job[0], job[1]
+        if kind == 'move' or not os.path.exists(path):
+            return 0
+        return os.path.getsize(path)
+
+    def push(self, job: tuple, raw_file: str):
+
+        if job[0] in ['grid', 'cell']:
+            self._open_extractions[job[1]] += 1
+        self._open_jobs[raw_file] += 1
+        heapq.heappush(self._heap, (-self.priority(job), next(self._sequence), job, raw_file))
+
+    def run(self, raw_files: list, on_raw_file_done=None, open_jobs: dict | None = None):
+        """Processes the raw files, starting with a statistics job for each one.
+
+        Args:
+            raw_files (list): Paths of the raw files.
+            on_raw_file_done (callable, optional): Called in the main process with the path of the raw file,
+                after its move job is finished. Defaults to None.
+            open_jobs (dict, optional): {path of the raw file: jobs}, the raw files of a resumed run continue
+                with these jobs instead of the statistics job. Defaults to None.
+        """
+        open_jobs = open_jobs or {}
+        for raw_file in raw_files:
+            if raw_file not in open_jobs:
+                self.push(('statistics', raw_file, None, 0), raw_file)
+            elif len(open_jobs[raw_file]) == 0:
+                self.push(('move', raw_file, None, 0), raw_file)
+            for job in open_jobs.get(raw_file, []):
+                self.push(job, raw_file)
+
+        running = 0
+        with Pool(processes=self.processes, initializer=init_worker, initargs=(self.preprocessor,)) as pool:
+
+            while self._heap or running > 0:
+
+                # Idle workers take the largest queued job
+                while self._heap and running < self.processes:
+                    _, _, job, raw_file = heapq.heappop(self._heap)
+                    pool.apply_async(execute_job, (job,),
+                                     callback=lambda follow_up, job=job, raw_file=raw_file: self._results.put(
+                                         (job, raw_file, follow_up)),
+                                     error_callback=lambda error, job=job, raw_file=raw_file: self._results.put(
+                                         (job, raw_file, error)))
+                    running += 1
+
+                job, raw_file, follow_up = self._results.get()
+                running -= 1
+
+                if isinstance(follow_up, BaseException):
+                    print_to_console(
+                        f'Error while executing job {job}! Error: {follow_up}')
+                    sys.exit(-1)
+
+                for follow_up_job in follow_up:
+                    self.push(follow_up_job, raw_file)
+
+                self.finish(job, raw_file, on_raw_file_done)
+
+    def finish(self, job: tuple, raw_file: str, on_raw_file_done=None):
+        """Bookkeeping of a finished job: splitted sub files are removed, once all their quadrants were created,
+        and the move job of a raw file is queued, once all its other jobs are finished."""
+
+        if job[0] in ['grid', 'cell']:
+            self._open_extractions[job[1]] -= 1
+            if self._open_extractions[job[1]] == 0:
+                del self._open_extractions[job[1]]
+                if os.path.dirname(job[1]) == self.preprocessor.path_to_buffer:
+                    self.preprocessor.remove_buffer_file(job[1])
+
+        self._open_jobs[raw_file] -= 1
+        if self._open_jobs[raw_file] > 0:
+            return
+
+        del self._open_jobs[raw_file]
+        if job[0] != 'move':
+            self.push(('move', raw_file, None, 0), raw_file)
+        elif on_raw_file_done is not None:
+            on_raw_file_done(raw_file)
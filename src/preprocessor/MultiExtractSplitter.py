@@ -0,0 +1,290 @@
+import math
+import os
+from array import array
+
+import numpy as np
+import osmium
+
+from src.common.Utilities import print_to_console
+from src.preprocessor.TileObjectIndex import TileObjectIndex
+
+
+class MultiExtractSplitter:
+    """Splits an osm file into multiple bounding boxes with a single read of the file.
+
+    Instead of running osmconvert once per bounding box, the file is read once and every object is routed to
+    the writers of all bounding boxes it belongs to, with the same rules as osmconvert -b:
+        - Nodes are written to every bounding box which contains them.
+        - Ways are written to every bounding box which contains at least one of their nodes.
+        - Relations are written to every bounding box which contains one of their members. For way members the
+          bounding box of the way is used, relation members must appear before the relation in the file.
+
+    A sub file is only created, once the first object is written to it, as <output path>.partial. The bounds
+    of its nodes and its number of objects are counted while writing, so the sub files do not have to be read
+    again for their statistics. Sub files without nodes are removed. The ids of the ways and relations of every
+    sub file are collected as well and stored as its TileObjectIndex.
+    """
+
+    bucket_count = 256
+    id_buffer_size = 1 << 20  # Way ids of a cell which are kept in memory, before they are appended to a file
+
+    def __init__(self, path_to_raw_file: str, bounding_boxes: list, output_paths: list, location_storage: str = 'flex_mem'):
+        """
+        Args:
+            path_to_raw_file (str): The path to the file which should be splitted.
+            bounding_boxes (list): List of (min_lon, min_lat, max_lon, max_lat) tuples.
+            output_paths (list): The path of the new file for each bounding box.
+            location_storage (str, optional): Index type of pyosmium used for the node locations and the bounds
+                of the ways. For files with hundreds of millions of nodes a file based index like
+                'dense_file_array,<path>' should be used, the bounds of the ways are stored in separate files
+                next to it. Defaults to 'flex_mem'.
+        """
+        self.path_to_raw_file = path_to_raw_file
+        self.bounding_boxes = [tuple(float(value) for value in box) for box in bounding_boxes]
+        self.output_paths = output_paths
+        self.location_storage = location_storage
+        self.sorting = None
+
+        if len(self.bounding_boxes) != len(self.output_paths):
+            raise ValueError(
+                f'{len(self.bounding_boxes)} bounding boxes, but {len(self.output_paths)} output paths given!')
+
+        self._build_buckets()
+
+    def _build_buckets(self):
+        """Distributes the bounding boxes to a coarse lookup grid, so that only the few bounding boxes of one
+        bucket have to be checked for each object."""
+
+        self.lon_min = min(box[0] for box in self.bounding_boxes)
+        self.lat_min = min(box[1] for box in self.bounding_boxes)
+        lon_max = max(box[2] for box in self.bounding_boxes)
+        lat_max = max(box[3] for box in self.bounding_boxes)
+
+        self.bucket_width = ((lon_max - self.lon_min) / self.bucket_count) or 1.0
+        self.bucket_height = ((lat_max - self.lat_min) / self.bucket_count) or 1.0
+
+        self.buckets = [[] for _ in range(self.bucket_count * self.bucket_count)]
+        for cell, (min_lon, min_lat, max_lon, max_lat) in enumerate(self.bounding_boxes):
+            for x in range(self._bucket_x(min_lon), self._bucket_x(max_lon) + 1):
+                for y in range(self._bucket_y(min_lat), self._bucket_y(max_lat) + 1):
+                    self.buckets[x * self.bucket_count + y].append(cell)
+
+    def _bucket_x(self, lon: float) -> int:
+        return min(max(int((lon - self.lon_min) / self.bucket_width), 0), self.bucket_count - 1)
+
+    def _bucket_y(self, lat: float) -> int:
+        return min(max(int((lat - self.lat_min) / self.bucket_height), 0), self.bucket_count - 1)
+
+    def cells_of(self, lon: float, lat: float) -> list:
+        """Returns the indices of all bounding boxes which contain the given point."""
+
+        candidates = self.buckets[self._bucket_x(lon) * self.bucket_count + self._bucket_y(lat)]
+        return [cell for cell in candidates
+                if self.bounding_boxes[cell][0] <= lon <= self.bounding_boxes[cell][2]
+                and self.bounding_boxes[cell][1] <= lat <= self.bounding_boxes[cell][3]]
+
+    def cells_intersecting(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> set:
+        """Returns the indices of all bounding boxes which intersect the given bounding box."""
+
+        cells = set()
+        for x in range(self._bucket_x(min_lon), self._bucket_x(max_lon) + 1):
+            for y in range(self._bucket_y(min_lat), self._bucket_y(max_lat) + 1):
+                for cell in self.buckets[x * self.bucket_count + y]:
+                    box = self.bounding_boxes[cell]
+                    if box[0] <= max_lon and min_lon <= box[2] and box[1] <= max_lat and min_lat <= box[3]:
+                        cells.add(cell)
+
+        return cells
+
+    def way_storage_of(self, name: str) -> str:
+        """Index type of the bounds of the ways. A file based index gets its own file next to the one of the
+        node locations, otherwise the bounds of the ways would overwrite the locations of nodes with the same id.
+
+        Args:
+            name (str): Suffix of the file of the index, e.g. way_min.
+
+        Returns:
+            str: The index type of pyosmium.
+        """
+        index_type, _, path = self.location_storage.partition(',')
+        return f'{index_type},{path}.{name}' if path else index_type
+
+    @staticmethod
+    def partial_path_of(path: str) -> str:
+        return f'{path}.partial'
+
+    def way_ids_path_of(self, cell: int) -> str:
+        return f'{self.partial_path_of(self.output_paths[cell])}.ways'
+
+    def _create_writer(self, cell: int) -> osmium.SimpleWriter:
+
+        path = self.partial_path_of(self.output_paths[cell])
+        if os.path.exists(path):
+            os.remove(path)
+
+        header = osmium.io.Header()
+        min_lon, min_lat, max_lon, max_lat = self.bounding_boxes[cell]
+        header.add_box(osmium.osm.Box(osmium.osm.Location(min_lon, min_lat),
+                                      osmium.osm.Location(max_lon, max_lat)))
+        # The objects keep the order of the raw file
+        if self.sorting:
+            header.set('sorting', self.sorting)
+
+        # The format can not be derived from the .partial suffix
+        return osmium.SimpleWriter(osmium.io.File(path, 'pbf'), header=header)
+
+    def run(self) -> list:
+        """Reads the raw file once and writes all sub files.
+
+        Returns:
+            list: For every bounding box None, if the sub file would be empty, otherwise a dict with
+                'path' (the .partial file), 'size' (in bytes) and 'statistics' (see osm_statistics_to_dict).
+        """
+        print_to_console(
+            f'Splitting {self.path_to_raw_file} into {len(self.bounding_boxes)} files with a single read')
+
+        # Bounding box of every way, used to route relations with way members
+        way_storages = [self.way_storage_of('way_min'), self.way_storage_of('way_max')]
+        way_min, way_max = [osmium.index.create_map(way_storage) for way_storage in way_storages]
+        relation_cells = {}
+
+        cell_count = len(self.bounding_boxes)
+        writers = [None] * cell_count
+        counts = {object_type: [0] * cell_count for object_type in ['nodes', 'ways', 'relations']}
+        # Bounds of the written nodes: lon min, lon max, lat min, lat max
+        bounds = [[math.inf, -math.inf, math.inf, -math.inf] for _ in range(cell_count)]
+
+        def writer_of(cell: int) -> osmium.SimpleWriter:
+            if writers[cell] is None:
+                writers[cell] = self._create_writer(cell)
+            return writers[cell]
+
+        # Ids of the written ways and relations, the way ids of a cell are appended to a file in chunks
+        way_ids = [array('q') for _ in range(cell_count)]
+        relation_ids = [array('q') for _ in range(cell_count)]
+
+        def flush_way_ids(cell: int):
+            with open(self.way_ids_path_of(cell), 'ab') as f:
+                way_ids[cell].tofile(f)
+            del way_ids[cell][:]
+
+        processor = osmium.FileProcessor(self.path_to_raw_file).with_locations(self.location_storage)
+        node_locations = processor.node_location_storage
+        self.sorting = processor.header.get('sorting')
+
+        try:
+            for osm_object in processor:
+
+                if osm_object.is_node():
+                    location = osm_object.location
+                    if location.valid():
+                        lon, lat = location.lon, location.lat
+                        for cell in self.cells_of(lon, lat):
+                            writer_of(cell).add_node(osm_object)
+                            counts['nodes'][cell] += 1
+                            cell_bounds = bounds[cell]
+                            if lon < cell_bounds[0]:
+                                cell_bounds[0] = lon
+                            if lon > cell_bounds[1]:
+                                cell_bounds[1] = lon
+                            if lat < cell_bounds[2]:
+                                cell_bounds[2] = lat
+                            if lat > cell_bounds[3]:
+                                cell_bounds[3] = lat
+
+                elif osm_object.is_way():
+                    cells = set()
+                    min_lon = min_lat = max_lon = max_lat = None
+                    for node in osm_object.nodes:
+                        location = node.location
+                        if not location.valid():
+                            continue
+                        lon, lat = location.lon, location.lat
+                        cells.update(self.cells_of(lon, lat))
+                        if min_lon is None:
+                            min_lon, min_lat, max_lon, max_lat = lon, lat, lon, lat
+                        else:
+                            min_lon, min_lat = min(min_lon, lon), min(min_lat, lat)
+                            max_lon, max_lat = max(max_lon, lon), max(max_lat, lat)
+
+                    if min_lon is not None:
+                        way_min.set(osm_object.id, osmium.osm.Location(min_lon, min_lat))
+                        way_max.set(osm_object.id, osmium.osm.Location(max_lon, max_lat))
+
+                    for cell in cells:
+                        writer_of(cell).add_way(osm_object)
+                        counts['ways'][cell] += 1
+                        way_ids[cell].append(osm_object.id)
+                        if len(way_ids[cell]) >= self.id_buffer_size:
+                            flush_way_ids(cell)
+
+                elif osm_object.is_relation():
+                    cells = set()
+                    for member in osm_object.members:
+                        try:
+                            if member.type == 'n':
+                                location = node_locations.get(member.ref)
+                                cells.update(self.cells_of(location.lon, location.lat))
+                            elif member.type == 'w':
+                                lower, upper = way_min.get(member.ref), way_max.get(member.ref)
+                                cells.update(self.cells_intersecting(lower.lon, lower.lat, upper.lon, upper.lat))
+                            elif member.type == 'r':
+                                cells.update(relation_cells.get(member.ref, ()))
+                        except KeyError:
+                            # Member is not part of the raw file
+                            continue
+
+                    if cells:
+                        relation_cells[osm_object.id] = tuple(cells)
+                    for cell in cells:
+                        writer_of(cell).add_relation(osm_object)
+                        counts['relations'][cell] += 1
+                        relation_ids[cell].append(osm_object.id)
+        finally:
+            for writer in writers:
+                if writer is not None:
+                    writer.close()
+
+            del way_min, way_max
+            for way_storage in way_storages:
+                _, _, path = way_storage.partition(',')
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+        results = []
+        for cell in range(cell_count):
+
+            if writers[cell] is None:
+                results.append(None)
+                continue
+
+            path = self.partial_path_of(self.output_paths[cell])
+            way_ids_path = self.way_ids_path_of(cell)
+            # Relations which only intersect with the bounding box of a way member, as for empty files of osmconvert
+            if counts['nodes'][cell] == 0:
+                os.remove(path)
+                if os.path.exists(way_ids_path):
+                    os.remove(way_ids_path)
+                results.append(None)
+                continue
+
+            ways = np.frombuffer(way_ids[cell], dtype=np.int64)
+            if os.path.exists(way_ids_path):
+                ways = np.concatenate([np.fromfile(way_ids_path, dtype=np.int64), ways])
+                os.remove(way_ids_path)
+            TileObjectIndex(ways, np.frombuffer(relation_ids[cell], dtype=np.int64)).save(path)
+
+            lon_min, lon_max, lat_min, lat_max = bounds[cell]
+            results.append({
+                'path': path,
+                'size': os.path.getsize(path),
+                'statistics': {
+                    'lon min': f' {lon_min:.7f}',
+                    'lon max': f' {lon_max:.7f}',
+                    'lat min': f' {lat_min:.7f}',
+                    'lat max': f' {lat_max:.7f}',
+                    **{object_type: f' {counts[object_type][cell]}' for object_type in counts}
+                }
+            })
+
+        return results
@@ -1,3 +1,4 @@
+import argparse
 import datetime
 import glob
 import json
@@ -5,18 +6,30 @@ import math
 import os
 import platform
 import shutil
+import sqlite3
 import subprocess
 import sys
 import time
 import traceback
 from enum import Enum
 from multiprocessing import Pool
-from progress.bar import Bar
 
 import requests
 
+from src.common.PbfReader import PbfReader
+from src.common.StatisticsCache import StatisticsCache
+from src.common.TileManifest import TileManifest
 from src.common.Utilities import print_to_console, extract_osm_statistics, calc_file_size_gb, delete_file, \
     get_min_max_lon_lat
+from src.core.LayerStore import build_layer_store, store_available
+from src.core.TilePyramid import build_pyramid
+from src.preprocessor.DensityHistogram import DensityHistogram
+from src.preprocessor.Downloader import Downloader
+from src.preprocessor.JobLedger import JobLedger
+from src.preprocessor.JobScheduler import JobScheduler, worker_count
+from src.preprocessor.MultiExtractSplitter import MultiExtractSplitter
+from src.preprocessor.TileObjectIndex import TileObjectIndex, replace_with_index
+from src.preprocessor.TileUpdater import TileUpdater
 
 
 class OS(Enum):
@@ -33,10 +46,16 @@ class OS(Enum):
 
 class Preprocessor:
 
-    def __init__(self):
+    def __init__(self, new_cache_file: bool = True):
+        """
+        Args:
+            new_cache_file (bool, optional): Archives the cache files of previous runs and starts an empty one. If
+                False, the current cache file is continued, e.g. to update it with a change file. Defaults to True.
+        """
 
         self.used_os = OS.from_str(platform.system())
-        self.cpu_count = 4
+        self.cpu_count = os.cpu_count() or 1
+        self.memory_per_worker_gb = 2  # Memory of a worker while splitting, limits the workers to the free memory
         self.use_multithreading = True
 
         print_to_console(
@@ -45,6 +64,11 @@ class Preprocessor:
         # Download
         self.download_planet_file = False
 
+        self.planet_url = 'https://planet.openstreetmap.org/pbf/planet-latest.osm.pbf'
+        self.download_regions = []  # Urls of region files which are downloaded additionally
+        self.download_connections = 8  # Parallel range requests per file
+        self.parallel_downloads = 2  # Files which are downloaded at the same time
+
         print_to_console(f'Download planet file: {self.download_planet_file}')
 
         self.path_to_raw = os.path.join(
@@ -61,24 +85,68 @@ class Preprocessor:
             'src', 'resources', 'osmconvert', 'osmconvert')
         self.path_to_cachefile = os.path.join(
             'src', 'preprocessor', 'resources', 'preprocessed', 'cache_file*.json')
+        self.path_to_manifest_files = os.path.join(
+            'src', 'preprocessor', 'resources', 'preprocessed', 'cache_file*.sqlite*')
         self.path_to_cachefile_archive = os.path.join(
             'src', 'preprocessor', 'resources', 'preprocessed', 'archive')
+        self.path_to_statistics_cache = os.path.join(
+            'src', 'preprocessor', 'resources', 'statistics_cache.sqlite')
+        self.path_to_ledger = os.path.join(
+            'src', 'preprocessor', 'resources', 'ledger')
 
         self.max_split_size = 1  # Defined as gigabyte
         self.split_multiplicator = 2  # Sqrt(file_size) * split_multiplicator
-        self.offset = 0.00001
+        self.max_split_depth = 8  # Maximal number of quadrant splits of a sub file
+        # Place the split boundaries by the node density instead of equal intervals
+        self.use_density_histogram = True
+        self.density_resolution = 512  # Bins per axis of the density histogram
+        self.target_split_size = 0.5  # Defined as gigabyte, aimed size of the sub files
+        self.offset = 0.00001  # Minimal overlap of neighbouring sub files in degrees
+        # Every sub file holds its core bounding box of the split grid and a halo around it. A map of up to
+        # max_render_distance (the distance of the Generator) around a point in the core lies within the halo, so
+        # it is rendered from this file alone
+        self.max_render_distance = 5000  # Defined as meters
+        self.halo = None  # Width of the halo in meters, defaults to max_render_distance
+        # Read a raw file once for all sub files instead of running osmconvert for every sub file
+        self.use_single_pass_splitter = True
+        self.location_storage = 'flex_mem'  # For very large files use 'dense_file_array,<path>'
         self.lon_min_bound = -180.0
         self.lon_max_bound = 180.0
         self.lat_min_bound = -90.0
         self.lat_max_bound = 90.0
+        # Read the bounds of pbf files with the PbfReader instead of osmconvert --out-statistics
+        self.use_pbf_reader = True
+        # Build the pre-generalized zoom levels of every preprocessed file, which the Generator reads for maps
+        # of large areas instead of the osm file, see TilePyramid
+        self.build_tile_pyramid = False
+        # Convert every preprocessed file into per layer GeoParquet files, which the Generator reads instead of
+        # parsing the osm file, needs pyarrow, see LayerStore
+        self.build_layer_store = False
 
         # Init folders
         for path in [self.path_to_preprocessed, self.path_to_buffer, self.path_to_cachefile_archive, self.path_to_done, self.path_to_raw]:
             if not os.path.exists(path):
                 os.makedirs(path)
 
-        # Move cache files
-        cache_files = glob.glob(self.path_to_cachefile)
+        # Statistics of unchanged files are reused across runs and workers
+        self.statistics_cache = StatisticsCache(self.path_to_statistics_cache)
+        # State of every sub file, so that an interrupted run can be resumed
+        self.job_ledger = JobLedger(self.path_to_ledger)
+
+        if new_cache_file:
+            self.create_cache_file()
+        else:
+            self.open_cache_file()
+
+        self.preprocessed_files_statistics = {}
+
+    def create_cache_file(self):
+        """Archives the cache files and manifests of previous runs and creates an empty cache file with its manifest.
+        """
+
+        # Move cache files and manifests of previous runs
+        cache_files = glob.glob(self.path_to_cachefile) + \
+            glob.glob(self.path_to_manifest_files)
         if len(cache_files) > 0:
 
             for cache_file in cache_files:
@@ -91,67 +159,230 @@ class Preprocessor:
         # Create cache file
         current_datetime = datetime.datetime.fromtimestamp(
             time.time()).strftime('%Y%m%d%H%M%S')
-        with open(os.path.join(self.path_to_preprocessed, f'cache_file_{current_datetime}.json'), 'w') as f:
+        self.path_to_current_cachefile = os.path.join(
+            self.path_to_preprocessed, f'cache_file_{current_datetime}.json')
+        with open(self.path_to_current_cachefile, 'w') as f:
             json.dump({}, f)
 
-        self.preprocessed_files_statistics = {}
+        # The entries are collected in the manifest and exported to the cache file after each raw file
+        self.manifest = TileManifest(os.path.join(
+            self.path_to_preprocessed, f'cache_file_{current_datetime}.sqlite'))
 
-    def download_files(self):
-        """The needed files from osm will be downloaded. Based on the gloabl set variables the planet file and the continent files will be downloaded.
+    def open_cache_file(self):
+        """Continues the current cache file. If its manifest is missing, the manifest is created from the cache file.
+
+        Raises:
+            ValueError: If there are no or multiple cache files
         """
 
-        def download_request(url, path):
-            r = requests.get(url, stream=True)
-            total_length = int(r.headers.get('content-length', 0)) // 1024 + 1
+        cache_files = glob.glob(self.path_to_cachefile)
+        if len(cache_files) != 1:
+            raise ValueError(
+                f'Found {len(cache_files)} cache files in: {self.path_to_cachefile}')
+
+        self.path_to_current_cachefile = cache_files.pop()
+        path_to_manifest = os.path.splitext(
+            self.path_to_current_cachefile)[0] + '.sqlite'
+        create_manifest = not os.path.exists(path_to_manifest)
+
+        self.manifest = TileManifest(path_to_manifest)
+        if create_manifest:
+            self.manifest.import_json(self.path_to_current_cachefile)
+
+        print_to_console(
+            f'Continuing cache file {self.path_to_current_cachefile} with {len(self.manifest)} entries')
+
+    def download_files(self):
+        """The needed files from osm will be downloaded. Based on the gloabl set variables the planet file and the region files will be downloaded.
+        Interrupted downloads are continued with the next run.
+        """
 
-            with open(path, 'wb') as f:
-                bar = Bar('Downloading', max=total_length)
-                for chunk in r.iter_content(chunk_size=1024):
-                    if chunk:
-                        f.write(chunk)
-                        f.flush()
-                        bar.next()
-                bar.finish()
+        downloads = []
 
         # Planet file
         if self.download_planet_file:
 
+            filename = os.path.join(self.path_to_raw, 'planet-latest.osm.pbf')
+            resume = os.path.exists(Downloader.state_path_of(filename))
+
             for file in os.listdir(self.path_to_raw):
-                os.remove(os.path.join(self.path_to_raw, file))
+                path = os.path.join(self.path_to_raw, file)
+                if resume and path in [filename, Downloader.state_path_of(filename)]:
+                    continue
+                os.remove(path)
 
             print_to_console("Cleaned raw folder")
 
-            url = 'https://planet.openstreetmap.org/pbf/planet-latest.osm.pbf'
-            filename = os.path.join(self.path_to_raw, 'planet-latest.osm.pbf')
             print_to_console(f'Downloading planet-latest.osm.pbf')
-            download_request(url, filename)
+            downloads.append((self.planet_url, filename))
+
+        # Region files, e.g. https://download.geofabrik.de/europe/germany-latest.osm.pbf
+        for url in self.download_regions:
+            filename = os.path.join(self.path_to_raw, url.split('/')[-1])
+            print_to_console(f'Downloading {url}')
+            downloads.append((url, filename))
+
+        if len(downloads) > 0:
+            downloader = Downloader(connections=self.download_connections)
+            try:
+                downloader.download_many(
+                    downloads, parallel_files=self.parallel_downloads)
+            except (requests.RequestException, ValueError) as e:
+                print_to_console(
+                    f'Error while downloading! Error: {traceback.format_exc()}. {e}')
+                sys.exit(-1)
 
     def append_cache_file(self, key, value):
-        """Used to append the key value pairs to the cache file.
+        """Used to append the key value pairs to the manifest. The manifest can be written by all workers at the
+        same time and is exported to the cache file with export_cache_file.
 
         Args:
             key (_type_): Key for the dict
             value (_type_): Value for the dict
 
         Raises:
-            ValueError: If there are no or multiple cache files
+            ValueError: If the entry could not be written to the manifest
         """
 
-        cache_files = glob.glob(self.path_to_cachefile)
-        if len(cache_files) > 1:
+        try:
+            self.manifest.append(key, value)
+        except sqlite3.Error as e:
             raise ValueError(
-                f'More than one file ({len(cache_files)}) in the folder {self.path_to_cachefile}. Files: {cache_files}')
+                f'Entry {key} could not be written to the manifest {self.manifest.path}: {e}')
+
+    def export_cache_file(self, compact: bool = False):
+        """Exports the current state of the manifest to the cache file.
+
+        Args:
+            compact (bool, optional): Compacts the manifest after the export. Defaults to False.
+        """
+
+        self.manifest.export_json(self.path_to_current_cachefile)
+        print_to_console(
+            f'Exported {len(self.manifest)} entries to {self.path_to_current_cachefile}')
+
+        if compact:
+            self.manifest.compact()
+
+    def file_statistics(self, path: str, use_header_bbox: bool = False, processes: int = 1) -> dict:
+        """Returns the bounds of an osm file in the format of osm_statistics_to_dict. With use_pbf_reader the
+        bounds of pbf files are read by the PbfReader, otherwise osmconvert scans the whole file.
+
+        Args:
+            path (str): Path to the osm file.
+            use_header_bbox (bool, optional): Returns the bounding box of the pbf header, if present. It covers the
+                area of the file, but not necessarily all nodes and not whether the file is empty. Defaults to False.
+            processes (int, optional): Number of processes which decode the pbf file. Defaults to 1.
+
+        Returns:
+            dict: The statistics of the file, without 'lon min' if the file contains no nodes.
+        """
+        if not self.use_pbf_reader or not path.endswith('.pbf'):
+            osmconvert_path = self.path_to_osm_convert_linux if self.used_os == OS.LINUX else self.path_to_osm_convert
+            return extract_osm_statistics(osmconvert_path, path, self.statistics_cache)
+
+        # The decoded bounds are cached like the ones of osmconvert, the header is read in no time anyway
+        statistics_dict = self.statistics_cache.get(path)
+        if statistics_dict is not None:
+            return statistics_dict
+
+        pbf_reader = PbfReader(path)
+        if use_header_bbox and pbf_reader.header_bbox is not None:
+            return pbf_reader.statistics(use_header_bbox=True)
+
+        statistics_dict = pbf_reader.statistics(use_header_bbox=False, processes=processes)
+        self.statistics_cache.put(path, statistics_dict)
+
+        return statistics_dict
+
+    def sub_file_name(self, path_to_raw_file: str, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> str:
+        """Builds the path of a sub file in the buffer folder.
 
-        cache_file = cache_files.pop()
-        with open(cache_file, "r", encoding="utf-8") as f:
+        Returns:
+            str: Path of the sub file
+        """
+
+        basename = os.path.basename(path_to_raw_file).split(
+            '/')[-1].split("_")[0].replace('.osm.pbf', '')
+
+        return os.path.join(
+            self.path_to_buffer, f'{basename}_{min_lon}_{min_lat}_{max_lon}_{max_lat}.osm.pbf')
+
+    def halo_bounding_box(self, bounding_box: tuple) -> tuple:
+        """Extends the core bounding box of a sub file by the halo. A degree of longitude is shortest at the
+        edge of the box closest to a pole, so the halo in longitude is sized for this latitude.
+
+        Args:
+            bounding_box (tuple): The core (min_lon, min_lat, max_lon, max_lat).
+
+        Returns:
+            tuple: The (min_lon, min_lat, max_lon, max_lat) of the area which is extracted into the sub file.
+        """
+        min_lon, min_lat, max_lon, max_lat = bounding_box
+        halo = self.max_render_distance if self.halo is None else self.halo
+
+        meters_per_degree_lat = 111320
+        poleward_lat = min(max(abs(min_lat), abs(max_lat)), 89)
+        meters_per_degree_lon = meters_per_degree_lat * math.cos(math.radians(poleward_lat))
+        lon_halo = max(halo / meters_per_degree_lon, self.offset)
+        lat_halo = max(halo / meters_per_degree_lat, self.offset)
+
+        return (max(min_lon - lon_halo, self.lon_min_bound), max(min_lat - lat_halo, self.lat_min_bound),
+                min(max_lon + lon_halo, self.lon_max_bound), min(max_lat + lat_halo, self.lat_max_bound))
+
+    def cache_entry(self, statistics_dict: dict, bounding_box: tuple | list | None = None) -> dict:
+        """Builds the entry of a preprocessed file in the cache file: the bounds of its nodes and, for sub files,
+        the core bounding box of the split and the halo which was extracted around it.
+
+        Args:
+            statistics_dict (dict): The statistics of the file.
+            bounding_box (tuple | list, optional): The core (min_lon, min_lat, max_lon, max_lat) of a sub file.
+                Defaults to None.
+
+        Returns:
+            dict: The entry.
+        """
+        entry = {
+            'lon min': statistics_dict['lon min'],
+            'lon max': statistics_dict['lon max'],
+            'lat min': statistics_dict['lat min'],
+            'lat max': statistics_dict['lat max']
+        }
+        if bounding_box is not None:
+            for name, box in [('core', tuple(bounding_box)), ('halo', self.halo_bounding_box(tuple(bounding_box)))]:
+                entry[name] = {'lon min': box[0], 'lon max': box[2], 'lat min': box[1], 'lat max': box[3]}
+
+        return entry
+
+    def create_sub_files(self, path_to_raw_file: str, bounding_boxes: list) -> list:
+        """Creates all sub files of the given bounding boxes with a single read of the raw file. Every sub file
+        is named after its core bounding box and contains the area of its halo.
+
+        Args:
+            path_to_raw_file (str): The path to the file which should be splitted.
+            bounding_boxes (list): List of the core (min_lon, min_lat, max_lon, max_lat) tuples.
+
+        Returns:
+            list: Pairs of the name of the file and its result, see MultiExtractSplitter.run
+        """
+
+        new_file_names = [self.sub_file_name(path_to_raw_file, *bounding_box)
+                          for bounding_box in bounding_boxes]
+
+        try:
+            results = MultiExtractSplitter(path_to_raw_file,
+                                           [self.halo_bounding_box(bounding_box) for bounding_box in bounding_boxes],
+                                           new_file_names, self.location_storage).run()
+        except Exception as e:
+            print_to_console(
+                f'Error while splitting {path_to_raw_file}! Error: {traceback.format_exc()}. {e}')
+            sys.exit(-1)
 
-            data = json.load(f)
-            data[key] = value
-            with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+        return list(zip(new_file_names, results))
 
     def create_sub_file(self, path_to_raw_file: str, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> str:
-        """Executing the osmconvert file via subprocess.
+        """Executing the osmconvert file via subprocess. The file is named after the core bounding box and
+        contains the area of its halo.
 
         Args:
             path_to_raw_file (str): The path to the file which should be splitted.
@@ -164,12 +395,11 @@ class Preprocessor:
             str: Name of the file
         """
 
-        basename = os.path.basename(path_to_raw_file).split(
-            '/')[-1].split("_")[0].replace('.osm.pbf', '')
-        new_file_name = os.path.join(
-            self.path_to_buffer, f'{basename}_{min_lon}_{min_lat}_{max_lon}_{max_lat}.osm.pbf')
+        new_file_name = self.sub_file_name(
+            path_to_raw_file, min_lon, min_lat, max_lon, max_lat)
         new_file_name_parameter = f'-o={new_file_name}'
-        bounding_box_parameter = f'-b={min_lon}, {min_lat}, {max_lon}, {max_lat}'
+        bounding_box_parameter = '-b={}, {}, {}, {}'.format(
+            *self.halo_bounding_box((min_lon, min_lat, max_lon, max_lat)))
 
         # Switch between windows and linux path of the osmconverter
         osmconvert_path = self.path_to_osm_convert_linux if self.used_os == OS.LINUX else self.path_to_osm_convert
@@ -211,9 +441,8 @@ class Preprocessor:
             :param longitudinal_min:
         """
 
-        new_lon_min = longitudinal_min + (x * longitudinal_split) - self.offset
-        new_lon_max = longitudinal_min + \
-            ((x + 1) * longitudinal_split) + self.offset
+        new_lon_min = longitudinal_min + (x * longitudinal_split)
+        new_lon_max = longitudinal_min + ((x + 1) * longitudinal_split)
 
         if new_lon_min < self.lon_min_bound:
             new_lon_min = self.lon_min_bound
@@ -235,8 +464,8 @@ class Preprocessor:
             _type_: A pair of the new lower and maximal latitude values.
         """
 
-        new_lat_min = latitude_min + (y * latitude_split) - self.offset
-        new_lat_max = latitude_min + ((y + 1) * latitude_split) + self.offset
+        new_lat_min = latitude_min + (y * latitude_split)
+        new_lat_max = latitude_min + ((y + 1) * latitude_split)
 
         if new_lat_min < self.lat_min_bound:
             new_lat_min = self.lat_min_bound
@@ -245,40 +474,187 @@ class Preprocessor:
 
         return new_lat_min, new_lat_max
 
-    def split_file(self, args):
-        """In this method the split process based on the given arguments are executed.
+    def split_file(self, job: tuple) -> list:
+        """In this method a job of the split process is executed. A job is one of the following tuples:
+            ('statistics', raw_file_path, None, 0): Reads the bounds of a raw file and plans its split.
+            ('grid', source_path, bounding_boxes, depth): Creates and commits the sub files of all bounding boxes
+                with a single read.
+            ('cell', source_path, bounding_box, depth): Creates the sub file of one bounding box with osmconvert.
+            ('check', path_to_new_file, source_path, depth): Checks a sub file of osmconvert or of a resumed run.
+            ('move', raw_file_path, None, 0): Moves a processed raw file to the done folder.
 
         Args:
-            args (_type_): A set of parameters which are used to create a sub file.
+            job (tuple): The job which should be executed.
+
+        Returns:
+            list: The follow-up jobs.
         """
-        x, y, split_size, latitude_min, latitude_split, longitude_min, longitude_split, raw_file_path = args
+        kind, path, parameter, depth = job
+
+        if kind == 'statistics':
+            follow_up = self.process_raw_file(path)
+            if follow_up:
+                self.plan_sub_files(follow_up)
+                self.job_ledger.set_state(path, 'planned')
+            return follow_up
+
+        if kind == 'move':
+            self.move_raw_file(path)
+            self.job_ledger.set_state(path, 'moved')
+            return []
+
+        if kind == 'grid':
+            self.job_ledger.set_states([self.sub_file_name(path, *bounding_box)
+                                        for bounding_box in parameter], 'extracting')
+            follow_up = []
+            for (path_to_new_file, result), bounding_box in zip(self.create_sub_files(path, parameter), parameter):
+                follow_up.extend(self.commit_sub_file(path_to_new_file, result, depth, bounding_box))
+            return follow_up
+
+        if kind == 'cell':
+            self.job_ledger.set_state(self.sub_file_name(path, *parameter), 'extracting')
+            path_to_new_file = self.create_sub_file(path, *parameter)
+            self.job_ledger.set_state(path_to_new_file, 'extracted')
+            print_to_console(f'New file: {path_to_new_file} from {path}')
+            return [('check', path_to_new_file, path, depth)]
+
+        # Oversized files are splitted again into quadrants, the file itself stays in the buffer as new source
+        return self.quadrant_jobs(path, self.process_sub_file(path, depth), depth)
+
+    def quadrant_jobs(self, path: str, quadrants: list, depth: int) -> list:
+        """Plans the split of an oversized sub file into its quadrants.
 
-        # Calculate bew min/max values for longitude and latitude of the sub files
-        new_lon_min, new_lon_max = self.calculate_min_max_longitude(
-            x, longitude_min, longitude_split)
-        new_lat_min, new_lat_max = self.calculate_min_max_latitude(
-            y, latitude_min, latitude_split)
+        Returns:
+            list: The extraction jobs of the quadrants, see split_file.
+        """
+        if self.use_single_pass_splitter:
+            jobs = [('grid', path, quadrants, depth + 1)] if quadrants else []
+        else:
+            jobs = [('cell', path, quadrant, depth + 1) for quadrant in quadrants]
 
-        print_to_console(
-            f'Range x: {x}/{split_size-1} | Range y: {y}/{split_size-1}')
+        if jobs:
+            self.plan_sub_files(jobs)
+            self.job_ledger.set_state(path, 'indexed', split=True)
+        return jobs
+
+    def commit_sub_file(self, path_to_new_file: str, result: dict | None, depth: int,
+                        bounding_box: tuple | None = None) -> list:
+        """Commits a sub file of the single pass splitter with the statistics which were counted while writing
+        it. Empty sub files were not written at all. The .partial file is renamed atomically, either into the
+        preprocessed folder with its entry in the cache file or, if it is larger than the threshold, into the
+        buffer folder as source of its quadrants.
+
+        Args:
+            path_to_new_file (str): The path of the sub file in the buffer folder.
+            result (dict | None): The result of the sub file, see MultiExtractSplitter.run
+            depth (int): How often the area of the file was splitted into quadrants.
+            bounding_box (tuple, optional): The core bounding box of the sub file. Defaults to None.
+
+        Returns:
+            list: The extraction jobs of the quadrants, if the file has to be splitted again.
+        """
+        if result is None:
+            self.job_ledger.set_state(path_to_new_file, 'removed')
+            return []
+
+        file_size_gb = result['size'] / math.pow(10, 9)
+        statistics_dict = result['statistics']
+
+        if file_size_gb > self.max_split_size and depth < self.max_split_depth:
+            print_to_console(
+                f'File is larger than {self.max_split_size} GB! Splitting into quadrants. ' + str(file_size_gb))
+            os.replace(result['path'], path_to_new_file)
+            # The quadrants get their own index
+            delete_file(False, TileObjectIndex.path_of(result['path']))
+            self.statistics_cache.put(path_to_new_file, statistics_dict)
+            self.job_ledger.set_state(path_to_new_file, 'extracted')
+            return self.quadrant_jobs(path_to_new_file, self.quadrants(statistics_dict, bounding_box), depth)
+
+        path_to_preprocessed_file = os.path.join(
+            self.path_to_preprocessed, os.path.basename(path_to_new_file))
+        replace_with_index(result['path'], path_to_preprocessed_file)
+        self.statistics_cache.put(path_to_preprocessed_file, statistics_dict)
 
-        # Create sub-file
-        path_to_new_file = self.create_sub_file(
-            raw_file_path, new_lon_min, new_lat_min, new_lon_max, new_lat_max)
+        try:
+            self.append_cache_file(path_to_preprocessed_file, self.cache_entry(statistics_dict, bounding_box))
+        except ValueError as e:
+            print_to_console(
+                f'Error while trying to write to the cache file! Error: {traceback.format_exc()}. {e}')
+            sys.exit(-1)
+        self.job_ledger.set_state(path_to_new_file, 'moved')
+
+        return []
+
+    def plan_sub_files(self, jobs: list):
+        """Records the sub files of the extraction jobs as planned in the job ledger.
+
+        Args:
+            jobs (list): The 'grid' and 'cell' jobs, see split_file.
+        """
+        for kind, source_path, parameter, depth in jobs:
+            for bounding_box in (parameter if kind == 'grid' else [parameter]):
+                self.job_ledger.set_state(self.sub_file_name(source_path, *bounding_box), 'planned',
+                                          source=source_path, bounding_box=list(bounding_box), depth=depth)
+
+    def remove_buffer_file(self, path: str):
+        """Removes a splitted sub file from the buffer folder, after all its quadrants were extracted."""
+        delete_file(False, path)
+        self.job_ledger.set_state(path, 'removed')
+
+    def quadrants(self, statistics_dict: dict, bounding_box: tuple | list | None = None) -> list:
+        """Splits the core bounding box of a sub file into 2x2 bounding boxes, so the cores of all sub files
+        stay a partition of the raw file. Without a core the bounding box of the statistics is splitted.
+
+        Args:
+            statistics_dict (dict): The statistics of the file from osmconvert
+            bounding_box (tuple | list, optional): The core (min_lon, min_lat, max_lon, max_lat) of the file.
+                Defaults to None.
+
+        Returns:
+            list: List of (min_lon, min_lat, max_lon, max_lat) tuples.
+        """
+        if bounding_box is not None:
+            lon_min, lat_min, lon_max, lat_max = bounding_box
+        else:
+            lon_min, lon_max, lat_min, lat_max = get_min_max_lon_lat(
+                statistics_dict)
+
+        bounding_boxes = []
+        for x in range(2):
+            for y in range(2):
+                new_lon_min, new_lon_max = self.calculate_min_max_longitude(
+                    x, lon_min, (lon_max - lon_min) / 2)
+                new_lat_min, new_lat_max = self.calculate_min_max_latitude(
+                    y, lat_min, (lat_max - lat_min) / 2)
+                bounding_boxes.append(
+                    (new_lon_min, new_lat_min, new_lon_max, new_lat_max))
+
+        return bounding_boxes
+
+    def process_sub_file(self, path_to_new_file: str, depth: int = 0) -> list:
+        """Checks a created sub file. Files without content are removed and all other files are added to the
+        cache file and moved to the preprocessed folder. Files larger than the threshold stay in the buffer
+        folder and their quadrants are returned, so that only the dense parts are splitted again.
+
+        Args:
+            path_to_new_file (str): The path of the sub file in the buffer folder.
+            depth (int, optional): How often the area of the file was splitted into quadrants. Defaults to 0.
+
+        Returns:
+            list: The quadrants, if the file has to be splitted again, otherwise an empty list.
+        """
         name_of_new_file = os.path.basename(path_to_new_file)
-        print_to_console(f'New file: {path_to_new_file} from {raw_file_path}')
 
         file_size_gb = calc_file_size_gb(path_to_new_file)
-        osmconvert_path = self.path_to_osm_convert_linux if self.used_os == OS.LINUX else self.path_to_osm_convert
-        new_statistics_dict = extract_osm_statistics(
-            osmconvert_path, path_to_new_file)
+        new_statistics_dict = self.file_statistics(path_to_new_file)
+        # The core bounding box was recorded, when the file was planned
+        bounding_box = (self.job_ledger.get(path_to_new_file) or {}).get('bounding_box')
 
-        # If file again larger than the threshold, move to raw folder to process later
-        if file_size_gb > self.max_split_size:
+        # If file again larger than the threshold, split it into quadrants
+        if file_size_gb > self.max_split_size and 'lon min' in new_statistics_dict and depth < self.max_split_depth:
             print_to_console(
-                f'File is larger than {self.max_split_size} GB! Moved to raw and processing later. ' + str(file_size_gb))
-            shutil.move(os.path.join(self.path_to_buffer, name_of_new_file), os.path.join(
-                self.path_to_raw, name_of_new_file))
+                f'File is larger than {self.max_split_size} GB! Splitting into quadrants. ' + str(file_size_gb))
+            return self.quadrants(new_statistics_dict, bounding_box)
 
         # Process file if it is smaller than the threshold
         else:
@@ -290,22 +666,19 @@ class Preprocessor:
             if 'lon min' not in new_statistics_dict:
                 delete_file(False, os.path.join(
                     self.path_to_buffer, name_of_new_file))
+                self.job_ledger.set_state(path_to_new_file, 'removed')
 
             # If the file contains content, than append data to cache file and move to preprocessed
             else:
-                coordinates = {
-                    'lon min': new_statistics_dict['lon min'],
-                    'lon max': new_statistics_dict['lon max'],
-                    'lat min': new_statistics_dict['lat min'],
-                    'lat max': new_statistics_dict['lat max']
-                }
                 try:
                     self.append_cache_file(os.path.join(
-                        self.path_to_preprocessed, name_of_new_file), coordinates)
+                        self.path_to_preprocessed, name_of_new_file),
+                        self.cache_entry(new_statistics_dict, bounding_box))
                 except ValueError as e:
                     print_to_console(
                         f'Error while trying to write to the cache file! Error: {traceback.format_exc()}. {e}')
                     sys.exit(-1)
+                self.job_ledger.set_state(path_to_new_file, 'indexed', split=False)
                 try:
                     shutil.move(os.path.join(self.path_to_buffer, name_of_new_file), os.path.join(
                         self.path_to_preprocessed, name_of_new_file))
@@ -313,8 +686,39 @@ class Preprocessor:
                     print_to_console(
                         f'Error while moving file! Error: {traceback.format_exc()}. {e}')
                     sys.exit(1)
+                self.job_ledger.set_state(path_to_new_file, 'moved')
+
+        return []
+
+    def balanced_bounding_boxes(self, file_size_gb: float, statistics_dict: dict, raw_file_path: str) -> list:
+        """Creates the bounding boxes of the sub files from the density histogram of the raw file. The aimed
+        number of nodes per sub file is derived from the average size per node of the raw file.
 
-    def sub_files(self, file_size_gb: float, statistics_dict: dict, raw_file_path: str):
+        Args:
+            file_size_gb (float): The size of the input file given in gigabyte.
+            statistics_dict (dict): The statistics of the given file from osmcovert
+            raw_file_path (str): The path of the raw file.
+
+        Returns:
+            list: List of (min_lon, min_lat, max_lon, max_lat) tuples.
+        """
+        lon_min, lon_max, lat_min, lat_max = get_min_max_lon_lat(
+            statistics_dict)
+
+        histogram = DensityHistogram.load_or_build(
+            raw_file_path, lon_min, lon_max, lat_min, lat_max, self.density_resolution)
+        target_count = histogram.total() * self.target_split_size / file_size_gb
+
+        bounding_boxes = [(max(min_lon, self.lon_min_bound), max(min_lat, self.lat_min_bound),
+                           min(max_lon, self.lon_max_bound), min(max_lat, self.lat_max_bound))
+                          for min_lon, min_lat, max_lon, max_lat in histogram.split(target_count)]
+
+        print_to_console(
+            f'Split into {len(bounding_boxes)} balanced bounding boxes with about {int(target_count)} nodes each')
+
+        return bounding_boxes
+
+    def sub_files(self, file_size_gb: float, statistics_dict: dict, raw_file_path: str) -> list:
         """Split a given osm file into multiple smaller ones. 
         The split algorithm is based on the file size and the threshold. Assumption: Threshold 1GB and the file is 15GB.
         In the first step get the sqrt of the 15GB, which is 3.872 and this result is rounded up to 4. This result would 
@@ -324,105 +728,347 @@ class Preprocessor:
         the half size of the threadhold -> 0.5GB. If the threashold were 2GB than everything would be fine and if the
         threshold were 4GB than the split can be reduced to less splitted files.
 
+        With use_density_histogram the equal grid is replaced by bounding boxes which are cut at the cumulative
+        node density of the file, aiming at target_split_size per sub file (see balanced_bounding_boxes).
+
         Args:
             file_size_gb (float): The size of the input file given in gigabyte.
             statistics_dict (dict): The statistics of the given file from osmcovert
             raw_file_path (str): The path of the raw file.
-        """
 
-        split_size = (int(math.sqrt(file_size_gb)) + 1) * \
-            self.split_multiplicator
-        print_to_console("Split size: " + str(split_size))
+        Returns:
+            list: The split jobs of the file, see split_file.
+        """
 
         lon_min, lon_max, lat_min, lat_max = get_min_max_lon_lat(
             statistics_dict)
 
-        longitudinal_diff = abs(lon_min - lon_max)
-        latitude_diff = abs(lat_min - lat_max)
+        if self.use_density_histogram:
+            bounding_boxes = self.balanced_bounding_boxes(
+                file_size_gb, statistics_dict, raw_file_path)
+
+        else:
+            split_size = (int(math.sqrt(file_size_gb)) + 1) * \
+                self.split_multiplicator
+            print_to_console("Split size: " + str(split_size))
+
+            longitudinal_diff = abs(lon_min - lon_max)
+            latitude_diff = abs(lat_min - lat_max)
+
+            longitudinal_split = longitudinal_diff / split_size
+            latitude_split = latitude_diff / split_size
+
+            bounding_boxes = []
+            # Create list of split variations
+            for x in range(split_size):
+
+                for y in range(split_size):
+                    new_lon_min, new_lon_max = self.calculate_min_max_longitude(
+                        x, lon_min, longitudinal_split)
+                    new_lat_min, new_lat_max = self.calculate_min_max_latitude(
+                        y, lat_min, latitude_split)
+                    bounding_boxes.append(
+                        (new_lon_min, new_lat_min, new_lon_max, new_lat_max))
+
+        # Read the raw file once for all sub files or create every sub file with osmconvert
+        if self.use_single_pass_splitter:
+            return [('grid', raw_file_path, bounding_boxes, 0)]
+        return [('cell', raw_file_path, bounding_box, 0)
+                for bounding_box in bounding_boxes]
+
+    def update(self, change_file_path: str):
+        """Applies an osm change file (.osc/.osc.gz) to the affected preprocessed files and refreshes their entries
+        in the cache file, instead of preprocessing the whole planet file again.
+
+        Args:
+            change_file_path (str): Path to the change file.
+        """
+        print_to_console(f'Applying change file: {change_file_path}')
+
+        entries = self.manifest.entries()
+        tile_updater = TileUpdater(change_file_path, entries)
 
-        longitudinal_split = longitudinal_diff / split_size
-        latitude_split = latitude_diff / split_size
+        updated_files = []
+        for path_to_file in tile_updater.affected_files():
 
-        args_list = []
-        # Create list of split variations
-        for x in range(split_size):
+            path_to_new_file = os.path.join(
+                self.path_to_buffer, os.path.basename(path_to_file))
+            try:
+                changed = tile_updater.update_file(
+                    path_to_file, path_to_new_file)
+            except Exception as e:
+                print_to_console(
+                    f'Error while updating {path_to_file}! Error: {traceback.format_exc()}. {e}')
+                sys.exit(-1)
 
-            for y in range(split_size):
-                args_list.append((x, y, split_size, lat_min, latitude_split,
-                                 lon_min, longitudinal_split, raw_file_path))
+            if not changed:
+                delete_file(False, path_to_new_file)
+                delete_file(False, TileObjectIndex.path_of(path_to_new_file))
+                continue
 
-        # Execute multi threading to create all split variations
-        with Pool(processes=(self.cpu_count if self.use_multithreading else 1)) as pool:
-            pool.map(self.split_file, args_list)
+            new_statistics_dict = self.file_statistics(path_to_new_file)
+            replace_with_index(path_to_new_file, path_to_file)
 
-    def main(self):
+            if 'lon min' not in new_statistics_dict:
+                print_to_console(f'File is empty after the update: {path_to_file}')
+                self.manifest.remove(path_to_file)
+                delete_file(False, path_to_file)
+                delete_file(False, TileObjectIndex.path_of(path_to_file))
+                continue
+
+            # The core and the halo of the file are kept, only the bounds of its nodes change
+            self.append_cache_file(path_to_file, dict(entries[path_to_file], **self.cache_entry(new_statistics_dict)))
+            print_to_console(f'Updated file: {path_to_file}')
+            updated_files.append(path_to_file)
+
+        if self.build_layer_store:
+            self.build_layer_stores(updated_files)
+        if self.build_tile_pyramid:
+            self.build_pyramids(updated_files)
+
+        self.export_cache_file(compact=True)
+        self.manifest.close()
+        self.statistics_cache.close()
+
+    def build_pyramids(self, paths: list | None = None):
+        """Builds the tile pyramid of the preprocessed files in a worker pool. Each file is decoded once for all
+        of its levels.
+
+        Args:
+            paths (list, optional): Paths of the preprocessed files. Defaults to all files of the manifest.
         """
-        The main method to execute the preprocessor
+        self.build_per_file(build_pyramid, 'tile pyramid', paths)
+
+    def build_layer_stores(self, paths: list | None = None):
+        """Builds the layer store of the preprocessed files in a worker pool, see LayerStore. The store needs
+        pyarrow, without it nothing is built and the Generator reads the osm files.
+
+        Args:
+            paths (list, optional): Paths of the preprocessed files. Defaults to all files of the manifest.
         """
-        self.download_files()
+        if not store_available():
+            print_to_console('The layer store is not built, pyarrow is not installed')
+            return
 
-        # Get all files from the raw folder
-        process_files = os.listdir(self.path_to_raw)
+        self.build_per_file(build_layer_store, 'layer store', paths)
 
-        # Iterate through all files
-        while len(process_files) > 0:
-            for process_file in process_files:
+    def build_per_file(self, build, name: str, paths: list | None = None):
+        """Runs a build step for every preprocessed file in a worker pool.
 
-                print_to_console(f'Processing Raw-File: {process_file}')
+        Args:
+            build (callable): Builds the data of one file, is called with its path.
+            name (str): Name of the data for the log.
+            paths (list, optional): Paths of the preprocessed files. Defaults to all files of the manifest.
+        """
+        paths = list(self.manifest.entries()) if paths is None else paths
+        paths = [path for path in paths if os.path.exists(path)]
 
-                path_to_process_file = os.path.join(
-                    self.path_to_raw, process_file)
-                file_size_gb = calc_file_size_gb(path_to_process_file)
-                osmconvert_path = self.path_to_osm_convert_linux if self.used_os == OS.LINUX else self.path_to_osm_convert
-                statistics_dict = extract_osm_statistics(
-                    osmconvert_path, path_to_process_file)
+        processes = min(worker_count(self.memory_per_worker_gb, self.cpu_count) if self.use_multithreading else 1,
+                        len(paths))
+        print_to_console(f'Building the {name} of {len(paths)} files with {processes} workers')
+        if processes <= 1:
+            for path in paths:
+                build(path)
+            return
 
-                # If file is lager than the defined threshold, split it into multiple ones
-                if file_size_gb > self.max_split_size:
+        with Pool(processes=processes) as pool:
+            for _ in pool.imap_unordered(build, paths):
+                pass
 
-                    print_to_console(
-                        f'File is larger than {self.max_split_size} GB!')
-                    self.sub_files(file_size_gb, statistics_dict,
-                                   path_to_process_file)
+    def process_raw_file(self, path_to_process_file: str) -> list:
+        """Reads the bounds of a raw file. Files larger than the threshold are planned for the split, all other
+        files are copied directly to the preprocessed folder.
 
-                # If file is smaller than the defined threshold copy directly to preprocessed files
-                else:
+        Args:
+            path_to_process_file (str): The path of the raw file.
 
-                    print_to_console(
-                        f'File is smaller than {self.max_split_size} GB! No split needed!')
-                    try:
-                        shutil.copy(path_to_process_file, os.path.join(
-                            self.path_to_preprocessed, process_file))
-                        coordinates = {
-                            'lon min': statistics_dict['lon min'],
-                            'lon max': statistics_dict['lon max'],
-                            'lat min': statistics_dict['lat min'],
-                            'lat max': statistics_dict['lat max']
-                        }
-                        try:
-                            self.append_cache_file(os.path.join(
-                                self.path_to_preprocessed, process_file), coordinates)
-                        except ValueError as e:
-                            print_to_console(
-                                f'Error while trying to write to the cache file! Error: {traceback.format_exc()}. {e}')
-                            sys.exit(-1)
-                    except Exception as e:
-                        print_to_console(
-                            f'Error while executing copy statement! Error: {traceback.format_exc()}. {e}')
-                        sys.exit(1)
-
-                # After processing the file, move it to the done folder
-                shutil.move(os.path.join(self.path_to_raw, process_file),
-                            os.path.join(self.path_to_done, process_file))
-
-            # Files which are splited into smaller ones, can still be larger than the threshold. This process is done in
-            # parallel execution and it is not possible to make the process of splitting recursive, so this files will be moved to
-            # the raw folder. With this files will be continued at this point, thats why here a list of files of the raw folder
-            # is created/replaced again.
-            process_files = os.listdir(self.path_to_raw)
+        Returns:
+            list: The split jobs of the file, see split_file.
+        """
+        process_file = os.path.basename(path_to_process_file)
+        print_to_console(f'Processing Raw-File: {process_file}')
+
+        file_size_gb = calc_file_size_gb(path_to_process_file)
+        # Files which are copied only need the area of the header, the split needs the bounds of all nodes
+        statistics_dict = self.file_statistics(
+            path_to_process_file, use_header_bbox=file_size_gb <= self.max_split_size)
+
+        # If file is lager than the defined threshold, split it into multiple ones
+        if file_size_gb > self.max_split_size:
+
+            print_to_console(
+                f'File is larger than {self.max_split_size} GB!')
+            return self.sub_files(file_size_gb, statistics_dict, path_to_process_file)
+
+        # If file is smaller than the defined threshold copy directly to preprocessed files
+        print_to_console(
+            f'File is smaller than {self.max_split_size} GB! No split needed!')
+        try:
+            shutil.copy(path_to_process_file, os.path.join(
+                self.path_to_preprocessed, process_file))
+            coordinates = {
+                'lon min': statistics_dict['lon min'],
+                'lon max': statistics_dict['lon max'],
+                'lat min': statistics_dict['lat min'],
+                'lat max': statistics_dict['lat max']
+            }
+            try:
+                self.append_cache_file(os.path.join(
+                    self.path_to_preprocessed, process_file), coordinates)
+            except ValueError as e:
+                print_to_console(
+                    f'Error while trying to write to the cache file! Error: {traceback.format_exc()}. {e}')
+                sys.exit(-1)
+        except Exception as e:
+            print_to_console(
+                f'Error while executing copy statement! Error: {traceback.format_exc()}. {e}')
+            sys.exit(1)
+
+        return []
+
+    def move_raw_file(self, path_to_process_file: str):
+        """Moves a processed raw file and its density histogram to the done folder.
+
+        Args:
+            path_to_process_file (str): The path of the raw file.
+        """
+        process_file = os.path.basename(path_to_process_file)
+        shutil.move(path_to_process_file,
+                    os.path.join(self.path_to_done, process_file))
+        histogram_file = DensityHistogram.cache_path_of(process_file)
+        if os.path.exists(os.path.join(self.path_to_raw, histogram_file)):
+            shutil.move(os.path.join(self.path_to_raw, histogram_file),
+                        os.path.join(self.path_to_done, histogram_file))
+
+    def resume_jobs(self) -> dict:
+        """Rebuilds the open jobs of an interrupted run from the job ledger. Partial files in the buffer folder
+        are removed and their extraction is repeated, the other sub files continue with their next step.
+        Sub files, whose planning was interrupted, are dropped, they are planned again by their parent.
+
+        Returns:
+            dict: {path of the raw file: open jobs}, raw files without entry are processed from the start.
+        """
+        entries = self.job_ledger.entries()
+
+        def is_complete(path: str) -> bool:
+            # The plan of a source is complete, once the source itself has moved on
+            entry = entries.get(path)
+            if entry is None:
+                return False
+            if 'source' not in entry:
+                return entry['state'] in ['planned', 'moved']
+            return entry['state'] in ['indexed', 'removed'] and entry.get('split', False) \
+                and is_complete(entry['source'])
+
+        def raw_file_of(entry: dict) -> str:
+            while 'source' in entries.get(entry['source'], {}):
+                entry = entries[entry['source']]
+            return entry['source']
+
+        tiles = {path: entry for path, entry in entries.items()
+                 if 'source' in entry and is_complete(entry['source'])}
+
+        # Remove partial and unknown files from the buffer folder
+        for file in os.listdir(self.path_to_buffer):
+            path = os.path.join(self.path_to_buffer, file)
+            if path not in tiles or tiles[path]['state'] in ['planned', 'extracting']:
+                delete_file(False, path)
+
+        jobs = {path: [] for path, entry in entries.items() if 'source' not in entry and entry['state'] == 'planned'}
+        extractions = {}
+        for path, entry in tiles.items():
+
+            if entry['state'] in ['planned', 'extracting']:
+                extractions.setdefault((entry['source'], entry['depth']), []).append(tuple(entry['bounding_box']))
+            elif (entry['state'] == 'extracted' or (entry['state'] == 'indexed' and not entry.get('split'))) \
+                    and os.path.exists(path):
+                jobs.setdefault(raw_file_of(entry), []).append(('check', path, entry['source'], entry['depth']))
+
+        for (source_path, depth), bounding_boxes in extractions.items():
+            if not os.path.exists(source_path):
+                print_to_console(f'Source of {len(bounding_boxes)} planned sub files is missing: {source_path}')
+                continue
+            raw_file = raw_file_of(entries[source_path]) if source_path in tiles else source_path
+            if self.use_single_pass_splitter:
+                jobs.setdefault(raw_file, []).append(('grid', source_path, bounding_boxes, depth))
+            else:
+                jobs.setdefault(raw_file, []).extend([('cell', source_path, bounding_box, depth) for bounding_box in bounding_boxes])
+
+        # Splitted sub files, whose quadrants were all extracted before the interruption
+        sources = {source_path for source_path, _ in extractions}
+        for path, entry in tiles.items():
+            if entry['state'] == 'indexed' and entry.get('split') and path not in sources and os.path.exists(path):
+                self.remove_buffer_file(path)
+
+        print_to_console(f'Resuming {sum(len(open_jobs) for open_jobs in jobs.values())} jobs of '
+                         f'{len(jobs)} raw files')
+
+        return jobs
+
+    def main(self, resume: bool = False):
+        """
+        The main method to execute the preprocessor
+
+        Args:
+            resume (bool, optional): Continues an interrupted run with the job ledger. Defaults to False.
+        """
+        self.download_files()
+
+        # Get all osm files from the raw folder, other files like the density histograms are moved along with them
+        process_files = [os.path.join(self.path_to_raw, file) for file in os.listdir(
+            self.path_to_raw) if file.endswith('.osm.pbf')]
+
+        if resume:
+            open_jobs = self.resume_jobs()
+        else:
+            self.job_ledger.clear()
+            open_jobs = {}
+
+        # All raw files share one worker pool, the sub files which are still too large are splitted again in it
+        processes = worker_count(self.memory_per_worker_gb, self.cpu_count) if self.use_multithreading else 1
+        print_to_console(f'Processing {len(process_files)} raw files with {processes} workers')
+
+        job_scheduler = JobScheduler(self, processes)
+        job_scheduler.run(process_files,
+                          on_raw_file_done=lambda raw_file: self.export_cache_file(),
+                          open_jobs=open_jobs)
+
+        if self.build_layer_store:
+            self.build_layer_stores()
+        if self.build_tile_pyramid:
+            self.build_pyramids()
+
+        self.export_cache_file(compact=True)
+        self.manifest.close()
+        self.statistics_cache.close()
 
 
 if __name__ == '__main__':
 
-    preprocessor = Preprocessor()
-    preprocessor.main()
+    parser = argparse.ArgumentParser(description='Preprocessor of the osm files')
+    parser.add_argument('--update', metavar='CHANGE_FILE',
+                        help='Applies the osm change file (.osc/.osc.gz) to the current preprocessed files')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continues an interrupted run with the current cache file')
+    parser.add_argument('--pyramid', action='store_true',
+                        help='Builds the tile pyramid of the files of the current cache file')
+    parser.add_argument('--layer-store', action='store_true',
+                        help='Builds the layer store of the files of the current cache file')
+    parser.add_argument('--max-distance', type=int, metavar='METERS',
+                        help='Largest distance of a map, which is rendered from a single sub file')
+    arguments = parser.parse_args()
+
+    if arguments.pyramid or arguments.layer_store:
+        preprocessor = Preprocessor(new_cache_file=False)
+        if arguments.layer_store:
+            preprocessor.build_layer_stores()
+        if arguments.pyramid:
+            preprocessor.build_pyramids()
+    elif arguments.update:
+        preprocessor = Preprocessor(new_cache_file=False)
+        preprocessor.update(arguments.update)
+    else:
+        preprocessor = Preprocessor(new_cache_file=not arguments.resume)
+        if arguments.max_distance is not None:
+            preprocessor.max_render_distance = arguments.max_distance
+        preprocessor.main(resume=arguments.resume)
@@ -0,0 +1,100 @@
+import os
+from array import array
+
+import numpy as np
+import osmium
+
+
+class TileObjectIndex:
+    """The ids of the ways and relations of a preprocessed file.
+
+    The update mode looks up the changed ways and relations here instead of reading every file, e.g. for a
+    pure tag change, whose nodes are not part of the change file. The single pass splitter writes the index
+    while it writes the file, for all other files it is built on the first lookup. The index is stored next to
+    the file as <file>.ids.npz, together with the size and modification time of the file, so an outdated index
+    is never read.
+    """
+
+    def __init__(self, ways, relations):
+        """
+        Args:
+            ways (array_like): Ids of the ways of the file.
+            relations (array_like): Ids of the relations of the file.
+        """
+        self.ids = {'w': np.unique(np.asarray(ways, dtype=np.int64)),
+                    'r': np.unique(np.asarray(relations, dtype=np.int64))}
+
+    @staticmethod
+    def path_of(path: str) -> str:
+        return f'{path}.ids.npz'
+
+    @classmethod
+    def build(cls, path: str) -> 'TileObjectIndex':
+        """Reads the ids of the ways and relations of an osm file."""
+
+        ids = {'w': array('q'), 'r': array('q')}
+        for osm_object in osmium.FileProcessor(osmium.io.File(path, 'pbf'), osmium.osm.WAY | osmium.osm.RELATION):
+            ids[osm_object.type_str()].append(osm_object.id)
+
+        return cls(ids['w'], ids['r'])
+
+    def save(self, path: str):
+        """Stores the index of the osm file next to it."""
+
+        stat = os.stat(path)
+        index_path = self.path_of(path)
+        tmp_path = f'{index_path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, ways=self.ids['w'], relations=self.ids['r'], source_size=stat.st_size,
+                     source_mtime_ns=stat.st_mtime_ns)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TileObjectIndex | None':
+        """Returns the stored index of the osm file or None, if there is none or the file was changed since."""
+
+        index_path = cls.path_of(path)
+        if not os.path.exists(index_path):
+            return None
+
+        stat = os.stat(path)
+        with np.load(index_path, allow_pickle=False) as data:
+            if int(data['source_size']) != stat.st_size or int(data['source_mtime_ns']) != stat.st_mtime_ns:
+                return None
+            return cls(data['ways'], data['relations'])
+
+    @classmethod
+    def load_or_build(cls, path: str) -> 'TileObjectIndex':
+        """Returns the stored index of the osm file or builds and stores it."""
+
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            index.save(path)
+        return index
+
+    def contains(self, object_type: str, ids: np.ndarray) -> np.ndarray:
+        """Checks which of the ids are part of the file.
+
+        Args:
+            object_type (str): 'w' or 'r'.
+            ids (np.ndarray): The ids which are looked up.
+
+        Returns:
+            np.ndarray: One boolean per id.
+        """
+        index_ids = self.ids[object_type]
+        if len(index_ids) == 0:
+            return np.zeros(len(ids), dtype=bool)
+
+        positions = np.minimum(np.searchsorted(index_ids, ids), len(index_ids) - 1)
+        return index_ids[positions] == ids
+
+
+def replace_with_index(path: str, target_path: str):
+    """Moves an osm file and its index atomically, the index stays valid, since the file keeps its modification
+    time."""
+
+    os.replace(path, target_path)
+    if os.path.exists(TileObjectIndex.path_of(path)):
+        os.replace(TileObjectIndex.path_of(path), TileObjectIndex.path_of(target_path))
@@ -0,0 +1,303 @@
+import os
+from array import array
+
+import numpy as np
+import osmium
+
+from src.common.SpatialIndex import SpatialIndex, box_of
+from src.common.Utilities import print_to_console
+from src.preprocessor.TileObjectIndex import TileObjectIndex
+
+OBJECT_TYPES = ['n', 'w', 'r']
+
+
+def copy_object(osm_object):
+    """Copies an object of the file processor, which is only valid during the iteration, into a mutable object.
+
+    Args:
+        osm_object (_type_): Node, way or relation of pyosmium.
+
+    Returns:
+        _type_: The mutable copy.
+    """
+    attributes = {'id': osm_object.id, 'version': osm_object.version, 'visible': osm_object.visible,
+                  'changeset': osm_object.changeset, 'timestamp': osm_object.timestamp, 'uid': osm_object.uid,
+                  'user': osm_object.user, 'tags': {tag.k: tag.v for tag in osm_object.tags}}
+
+    if osm_object.is_node():
+        location = osm_object.location
+        return osmium.osm.mutable.Node(location=(location.lon, location.lat) if location.valid() else None, **attributes)
+    if osm_object.is_way():
+        return osmium.osm.mutable.Way(nodes=[node.ref for node in osm_object.nodes], **attributes)
+    return osmium.osm.mutable.Relation(
+        members=[(member.type, member.ref, member.role) for member in osm_object.members], **attributes)
+
+
+class TileUpdater:
+    """Applies an osm change file (.osc or .osc.gz, the replication diff format) to the preprocessed files.
+
+    Only the files which contain a change are rewritten, see affected_files. Within such a file
+        - modified and deleted objects are applied, if the object is part of the file,
+        - new objects are added, if they belong to the file: nodes inside the bounding box, ways with a node
+          in the file and relations with a member in the file.
+    Changed ways and relations, e.g. pure tag changes, are looked up in the TileObjectIndex of the files, so no
+    file is read to locate them. Nodes without a location in the change file, i.e. deleted nodes, are only
+    searched in the files of the other changes of their changeset. A deleted node whose changeset has no other
+    change in the files is not found, neither is the old copy of a node which was moved into another file. A
+    full preprocessing run removes them.
+    """
+
+    def __init__(self, change_file_path: str, manifest_entries: dict):
+        """
+        Args:
+            change_file_path (str): Path to the change file.
+            manifest_entries (dict): The entries of the cache file: {path of the file: statistics}
+        """
+        self.change_file_path = change_file_path
+        self.manifest_entries = manifest_entries
+
+        self.changes = {object_type: {} for object_type in OBJECT_TYPES}
+        for osm_object in osmium.FileProcessor(change_file_path):
+            self.changes[osm_object.type_str()][osm_object.id] = copy_object(osm_object)
+
+        keys = list(manifest_entries.keys())
+        # A sub file holds the whole area of its halo, not only of its core
+        boxes = np.array([box_of(manifest_entries[key], 'halo') for key in keys], dtype=np.float64).reshape(-1, 4)
+        self.spatial_index = SpatialIndex.build(keys, boxes)
+
+    def affected_files(self) -> dict:
+        """Returns the files which contain a change.
+
+        Nodes are located by their location in the change file. Ways and relations are located by the files
+        which contain their changed members and by the files which already contain them, e.g. for pure tag
+        changes. New ways and relations which are located by neither are located by the files which contain
+        their members. Deleted nodes without a location and unchanged node members are searched in the files
+        of their changeset.
+
+        Returns:
+            dict: {path of the file: list of the (type, id) of the changes in the file}
+        """
+        files_of = {object_type: {} for object_type in OBJECT_TYPES}
+        unlocated_nodes = []
+        for node_id, node in self.changes['n'].items():
+            if node.location is None:
+                unlocated_nodes.append(node_id)
+                continue
+            lon, lat = node.location
+            files_of['n'][node_id] = set(self.spatial_index.intersecting(lon, lon, lat, lat))
+
+        # The files which contain the current copies of the changed ways and relations
+        found = self.find_in_indexes({'w': list(self.changes['w']), 'r': list(self.changes['r'])})
+        self.locate_ways_and_relations(files_of, found)
+
+        # New objects whose members are neither changed nor moved, e.g. a way between existing nodes
+        new_ways = [way for way_id, way in self.changes['w'].items() if not files_of['w'][way_id]]
+        new_relations = [relation for relation_id, relation in self.changes['r'].items()
+                         if not files_of['r'][relation_id]]
+        members = {'w': set(), 'r': set()}
+        for relation in new_relations:
+            for member_type, member_id, _ in relation.members:
+                if member_type in members:
+                    members[member_type].add(member_id)
+        member_files = self.find_in_indexes({object_type: list(ids) for object_type, ids in members.items()})
+
+        # Nodes without location are searched in the files of the other changes of their changeset
+        changeset_files = {}
+        for object_type in OBJECT_TYPES:
+            for object_id, paths in files_of[object_type].items():
+                changeset_files.setdefault(self.changes[object_type][object_id].changeset, set()).update(paths)
+
+        candidates = {node_id: set(changeset_files.get(self.changes['n'][node_id].changeset, ()))
+                      for node_id in unlocated_nodes}
+
+        def add_candidates(changeset: int, node_ids: list):
+            for node_id in node_ids:
+                if node_id not in self.changes['n']:
+                    candidates.setdefault(node_id, set()).update(changeset_files.get(changeset, ()))
+
+        for way in new_ways:
+            add_candidates(way.changeset, way.nodes)
+        for relation in new_relations:
+            add_candidates(relation.changeset,
+                           [member_id for member_type, member_id, _ in relation.members if member_type == 'n'])
+
+        member_files['n'] = self.find_nodes(candidates)
+        for node_id in unlocated_nodes:
+            files_of['n'][node_id] = member_files['n'].pop(node_id, set())
+        if new_ways or new_relations or unlocated_nodes:
+            self.locate_ways_and_relations(files_of, found, member_files)
+
+        affected = {}
+        for object_type in OBJECT_TYPES:
+            for object_id, paths in files_of[object_type].items():
+                for path in paths:
+                    affected.setdefault(path, []).append((object_type, object_id))
+
+        unlocated = {object_type: sum(1 for paths in files_of[object_type].values() if not paths)
+                     for object_type in OBJECT_TYPES}
+        print_to_console(f'{len(self.changes["n"])} nodes, {len(self.changes["w"])} ways and '
+                         f'{len(self.changes["r"])} relations changed, {len(affected)} files affected')
+        if any(unlocated.values()):
+            print_to_console(f'{unlocated["n"]} nodes, {unlocated["w"]} ways and {unlocated["r"]} relations are not '
+                             f'part of any file')
+
+        return affected
+
+    def locate_ways_and_relations(self, files_of: dict, found: dict, members: dict | None = None):
+        """Locates the changed ways and relations by the files of their members and by the files which contain
+        them.
+
+        Args:
+            files_of (dict): {type: {id: set of paths}}, the located changes, ways and relations are added.
+            found (dict): {type: {id: set of paths}}, the files which contain the changed ways and relations.
+            members (dict, optional): {type: {id: set of paths}}, the files which contain the unchanged members.
+                Defaults to None.
+        """
+        members = members or {object_type: {} for object_type in OBJECT_TYPES}
+
+        def files_of_member(member_type: str, member_id: int) -> set:
+            return files_of[member_type].get(member_id) or members[member_type].get(member_id, set())
+
+        for way_id, way in self.changes['w'].items():
+            files_of['w'][way_id] = set(found['w'].get(way_id, set())).union(
+                *(files_of_member('n', ref) for ref in way.nodes))
+
+        # Relations can be members of relations, every pass locates one more level
+        for _ in range(len(self.changes['r']) + 1):
+            located = {relation_id: set(found['r'].get(relation_id, set())).union(
+                *(files_of_member(member_type, member_id) for member_type, member_id, _ in relation.members))
+                for relation_id, relation in self.changes['r'].items()}
+            if located == {relation_id: files_of['r'].get(relation_id) for relation_id in located}:
+                break
+            files_of['r'].update(located)
+
+    def find_in_indexes(self, ids: dict) -> dict:
+        """Finds the files which contain the ways and relations with the TileObjectIndex of the files.
+
+        Args:
+            ids (dict): {'w': list of ids, 'r': list of ids}
+
+        Returns:
+            dict: {type: {id: set of paths}}
+        """
+        found = {object_type: {} for object_type in OBJECT_TYPES}
+        wanted = {object_type: np.array(ids.get(object_type, ()), dtype=np.int64) for object_type in ['w', 'r']}
+        if not any(len(object_ids) for object_ids in wanted.values()):
+            return found
+
+        for path in self.manifest_entries:
+            if not os.path.exists(path):
+                continue
+            index = TileObjectIndex.load_or_build(path)
+            for object_type, object_ids in wanted.items():
+                for object_id in object_ids[index.contains(object_type, object_ids)].tolist():
+                    found[object_type].setdefault(object_id, set()).add(path)
+
+        return found
+
+    def find_nodes(self, candidates: dict) -> dict:
+        """Finds the files which contain the nodes. Only the nodes of the candidate files are read.
+
+        Args:
+            candidates (dict): {node id: set of the paths which may contain the node}
+
+        Returns:
+            dict: {node id: set of paths}
+        """
+        wanted = {}
+        for node_id, paths in candidates.items():
+            for path in paths:
+                wanted.setdefault(path, set()).add(node_id)
+
+        found = {}
+        for path, node_ids in wanted.items():
+            if not os.path.exists(path):
+                continue
+            for node in osmium.FileProcessor(path, osmium.osm.NODE).with_filter(osmium.filter.IdFilter(node_ids)):
+                if node.id in node_ids:
+                    found.setdefault(node.id, set()).add(path)
+
+        return found
+
+    def update_file(self, path: str, path_to_new_file: str) -> bool:
+        """Writes the updated version of the file and its TileObjectIndex. Both files are sorted by type and id,
+        so the changes are merged while reading the file once.
+
+        Args:
+            path (str): The preprocessed file.
+            path_to_new_file (str): Target path of the updated file.
+
+        Returns:
+            bool: True, if the file was changed.
+        """
+        lon_min, lon_max, lat_min, lat_max = box_of(self.manifest_entries[path], 'halo')
+
+        written = {object_type: osmium.index.IdSet() for object_type in OBJECT_TYPES}
+        written_ids = {'w': array('q'), 'r': array('q')}
+        order = {object_type: sorted(self.changes[object_type]) for object_type in OBJECT_TYPES}
+        position = {object_type: 0 for object_type in OBJECT_TYPES}
+
+        def belongs_to_file(object_type: str, change) -> bool:
+            if object_type == 'n':
+                return change.location is not None and lon_min <= change.location[0] <= lon_max \
+                    and lat_min <= change.location[1] <= lat_max
+            if object_type == 'w':
+                return any(written['n'].get(ref) for ref in change.nodes)
+            return any(written[member[0]].get(member[1]) for member in change.members)
+
+        if os.path.exists(path_to_new_file):
+            os.remove(path_to_new_file)
+        # The objects are written ordered by type and id
+        header = osmium.io.Header()
+        header.set('sorting', 'Type_then_ID')
+        writer = osmium.SimpleWriter(path_to_new_file, header=header)
+        add = {'n': writer.add_node, 'w': writer.add_way, 'r': writer.add_relation}
+        changed = False
+
+        def write(object_type: str, osm_object):
+            written[object_type].set(osm_object.id)
+            if object_type in written_ids:
+                written_ids[object_type].append(osm_object.id)
+            add[object_type](osm_object)
+
+        def add_new_objects(object_type: str, until_id: int | None = None):
+            """Writes the changes of the type with a smaller id, which are not part of the file."""
+            nonlocal changed
+            ids = order[object_type]
+            while position[object_type] < len(ids) and (until_id is None or ids[position[object_type]] < until_id):
+                change = self.changes[object_type][ids[position[object_type]]]
+                position[object_type] += 1
+                if change.visible and belongs_to_file(object_type, change):
+                    write(object_type, change)
+                    changed = True
+
+        try:
+            current = 0
+            for osm_object in osmium.FileProcessor(path):
+
+                object_type = osm_object.type_str()
+                while OBJECT_TYPES[current] != object_type:
+                    add_new_objects(OBJECT_TYPES[current])
+                    current += 1
+
+                add_new_objects(object_type, osm_object.id)
+
+                change = self.changes[object_type].get(osm_object.id)
+                if change is None:
+                    write(object_type, osm_object)
+                    continue
+
+                # Object of the file was modified or deleted
+                changed = True
+                position[object_type] += 1
+                if change.visible:
+                    write(object_type, change)
+
+            for object_type in OBJECT_TYPES[current:]:
+                add_new_objects(object_type)
+        finally:
+            writer.close()
+
+        TileObjectIndex(written_ids['w'], written_ids['r']).save(path_to_new_file)
+
+        return changed
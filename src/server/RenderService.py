@@ -0,0 +1,258 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from src.common.Utilities import print_to_console
+from src.core.MapGenerator import Generator
+from src.server.TileServer import LatencyRecorder
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 429: 'Too Many Requests',
+               500: 'Internal Server Error'}
+
+
+def render_map(bbox: tuple, style: str, dpi: int, size: float) -> bytes:
+    """Renders the map of a bounding box as png or reads it from the render cache, runs in the worker processes
+    of the service.
+
+    Args:
+        bbox (tuple): (min_lon, min_lat, max_lon, max_lat)
+        style (str): Theme of the colors.
+        dpi (int): Resolution of the image.
+        size (float): Length of the longer side of the image in inches.
+
+    Returns:
+        bytes: The png.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    bbox_dict = {'lon min': min_lon, 'lon max': max_lon, 'lat min': min_lat, 'lat max': max_lat}
+
+    generator = Generator((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, 0, style)
+    return generator.render_image(bbox_dict, dpi=dpi, size=size)
+
+
+def parse_render_request(query: dict) -> tuple:
+    """Reads the bounding box, style and dpi of a request. The area is given either as
+    bbox=min_lon,min_lat,max_lon,max_lat or as lat, lon and dis (distance in meters) like for the Generator.
+
+    Args:
+        query (dict): The parsed query string.
+
+    Returns:
+        tuple: The bounding box, the style and the dpi.
+
+    Raises:
+        ValueError: If the parameters are missing or invalid.
+    """
+    def value(name: str, default=None):
+        values = query.get(name)
+        if not values:
+            if default is None:
+                raise ValueError(f'Parameter {name} is missing')
+            return default
+        return values[0]
+
+    if 'bbox' in query:
+        bbox = tuple(float(number) for number in value('bbox').split(','))
+        if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+            raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    else:
+        _, bbox_dict = Generator(float(value('lat')), float(value('lon')), int(value('dis'))).bounding_box()
+        bbox = (bbox_dict['lon min'], bbox_dict['lat min'], bbox_dict['lon max'], bbox_dict['lat max'])
+
+    dpi = int(value('dpi', '300'))
+    if not 0 < dpi <= 1200:
+        raise ValueError('dpi must be between 1 and 1200')
+
+    return bbox, value('style', 'default'), dpi
+
+
+class RenderService:
+    """Asyncio HTTP service which renders maps at /render in a bounded process pool.
+
+    Requests with the same bounding box, style and dpi which arrive while the map is rendered, wait for the
+    same render instead of starting another one. At most max_pending different maps are rendered or queued at
+    once, further requests are rejected with 429 and a Retry-After estimated from the recent render times.
+    Counters and latency percentiles are served at /statistics.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8081, workers: int = 2, max_pending: int = 8,
+                 size: float = 12, render_function=render_map, executor=None, precision: int = 6):
+        """
+        Args:
+            host (str, optional): Host of the service. Defaults to '127.0.0.1'.
+            port (int, optional): Port of the service, 0 selects a free port. Defaults to 8081.
+            workers (int, optional): Number of worker processes. Defaults to 2.
+            max_pending (int, optional): Maximal number of maps which are rendered or queued. Defaults to 8.
+            size (float, optional): Length of the longer side of the images in inches. Defaults to 12.
+            render_function (callable, optional): Renders (bbox, style, dpi, size) to png bytes in a worker,
+                must be picklable for a process pool. Defaults to render_map.
+            executor (concurrent.futures.Executor, optional): Executor of the renders. Defaults to a process
+                pool with the given number of workers.
+            precision (int, optional): Decimal places of the bounding box in the key of a request.
+                Defaults to 6.
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending
+        self.size = size
+        self.render_function = render_function
+        self.executor = executor
+        self.precision = precision
+
+        self.latencies = LatencyRecorder()
+        self.render_seconds = LatencyRecorder(size=100)
+        self.counters = {'requests': 0, 'renders': 0, 'coalesced': 0, 'rejected': 0, 'failed': 0}
+
+        self._in_flight = {}
+        self._server = None
+
+    def key(self, bbox: tuple, style: str, dpi: int) -> tuple:
+        return tuple(round(value, self.precision) for value in bbox), style, dpi
+
+    def retry_after(self) -> int:
+        """Estimates the seconds until a pending render is finished."""
+
+        average = self.render_seconds.mean() or 1.0
+        return max(1, math.ceil(average * len(self._in_flight) / max(self.workers, 1)))
+
+    async def render(self, bbox: tuple, style: str, dpi: int) -> tuple:
+        """Renders the map or joins the render of an identical request.
+
+        Returns:
+            tuple: The png or None, if the request was rejected, and how it was served: rendered, coalesced or
+                rejected.
+        """
+        key = self.key(bbox, style, dpi)
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(future), 'coalesced'
+
+        if len(self._in_flight) >= self.max_pending:
+            self.counters['rejected'] += 1
+            return None, 'rejected'
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        future = loop.run_in_executor(self.executor, self.render_function, key[0], style, dpi, self.size)
+        self._in_flight[key] = future
+        self.counters['renders'] += 1
+
+        def finished(_):
+            self._in_flight.pop(key, None)
+            self.render_seconds.record(time.perf_counter() - start)
+
+        future.add_done_callback(finished)
+        return await asyncio.shield(future), 'rendered'
+
+    def statistics(self) -> dict:
+        return {'latency': self.latencies.percentiles(), 'render': self.render_seconds.percentiles(),
+                'pending': len(self._in_flight), **self.counters}
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes,
+                      headers: dict | None = None):
+
+        lines = [f'HTTP/1.1 {status} {STATUS_TEXT[status]}', f'Content-Type: {content_type}',
+                 f'Content-Length: {len(body)}', 'Connection: close']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        start = time.perf_counter()
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            # The headers are not used
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                await self.respond(writer, 400, 'text/plain', b'Only GET requests are supported')
+                return
+
+            url = urlsplit(request_line[1])
+            if url.path == '/statistics':
+                await self.respond(writer, 200, 'application/json', json.dumps(self.statistics()).encode('utf-8'))
+                return
+            if url.path != '/render':
+                await self.respond(writer, 404, 'text/plain', b'Maps are rendered at /render')
+                return
+
+            self.counters['requests'] += 1
+            try:
+                bbox, style, dpi = parse_render_request(parse_qs(url.query))
+            except ValueError as e:
+                await self.respond(writer, 400, 'text/plain', str(e).encode('utf-8'))
+                return
+
+            try:
+                image, served = await self.render(bbox, style, dpi)
+            except Exception as e:
+                self.counters['failed'] += 1
+                print_to_console(f'Rendering of {bbox} failed: {e}')
+                await self.respond(writer, 500, 'text/plain', str(e).encode('utf-8'))
+                return
+
+            if image is None:
+                await self.respond(writer, 429, 'text/plain', b'Too many pending renders',
+                                   {'Retry-After': str(self.retry_after())})
+            else:
+                await self.respond(writer, 200, 'image/png', image, {'X-Render': served})
+                self.latencies.record(time.perf_counter() - start)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        """Starts the pool and the server, returns as soon as the service accepts connections."""
+
+        if self.executor is None:
+            # Workers are started lazily from the thread of the event loop, forking the threads of the service
+            # would leave their locks held in the workers
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('forkserver'))
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print_to_console(f'Rendering maps at http://{self.host}:{self.port}/render')
+
+    async def stop(self):
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def serve_forever(self):
+
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            print_to_console(f'Render service statistics: {self.statistics()}')
+            await self.stop()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Asyncio service which renders maps')
+    parser.add_argument('--host', default='127.0.0.1', help='Host of the service')
+    parser.add_argument('--port', type=int, default=8081, help='Port of the service')
+    parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+    parser.add_argument('--max-pending', type=int, default=8, help='Maximal number of pending renders')
+    arguments = parser.parse_args()
+
+    try:
+        asyncio.run(RenderService(arguments.host, arguments.port, arguments.workers,
+                                  arguments.max_pending).serve_forever())
+    except KeyboardInterrupt:
+        pass
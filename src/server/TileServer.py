@@ -0,0 +1,365 @@
+import argparse
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy
+from matplotlib.figure import Figure
+
+from src.common.DiskLRUCache import DiskLRUCache
+from src.common.Utilities import print_to_console
+from src.core.MapGenerator import Generator
+from src.core.RenderCache import RenderCache
+
+
+def tile_bounds(z: int, x: int, y: int) -> dict:
+    """Converts the coordinates of a slippy map tile to its bounding box.
+
+    Args:
+        z (int): Zoom level.
+        x (int): Column of the tile, from west to east.
+        y (int): Row of the tile, from north to south.
+
+    Returns:
+        dict: The bounding box with lon min, lon max, lat min and lat max.
+    """
+    tiles = 2 ** z
+
+    def latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    return {
+        'lon min': x / tiles * 360.0 - 180.0,
+        'lon max': (x + 1) / tiles * 360.0 - 180.0,
+        'lat min': latitude(y + 1),
+        'lat max': latitude(y),
+    }
+
+
+class LatencyRecorder:
+    """Latencies of the last requests and their percentiles."""
+
+    def __init__(self, size: int = 10000):
+        """
+        Args:
+            size (int, optional): Number of requests which are kept. Defaults to 10000.
+        """
+        self.latencies = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def mean(self) -> float | None:
+        """Returns the mean of the kept latencies in seconds or None, if there are none."""
+        with self.lock:
+            return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+    def percentiles(self) -> dict:
+        """Returns the number of kept requests and their latency percentiles in milliseconds.
+
+        Returns:
+            dict: count, p50, p90, p99 and max.
+        """
+        with self.lock:
+            latencies = numpy.array(self.latencies) * 1000
+        if len(latencies) == 0:
+            return {'count': 0}
+
+        p50, p90, p99 = numpy.percentile(latencies, [50, 90, 99])
+        return {'count': len(latencies), 'p50': round(float(p50), 3), 'p90': round(float(p90), 3),
+                'p99': round(float(p99), 3), 'max': round(float(latencies.max()), 3)}
+
+
+class TileRenderer:
+    """Renders slippy map tiles with the layers and colors of the Generator.
+
+    The tile is drawn in long/lat coordinates, the axes fill the whole image. Within a tile the difference to
+    the web mercator projection of other tile servers is small, except on low zoom levels.
+    """
+
+    def __init__(self, theme: str = 'default', tile_size: int = 256, dpi: int = 100):
+        """
+        Args:
+            theme (str, optional): Theme of the colors. Defaults to 'default'.
+            tile_size (int, optional): Width and height of a tile in pixels. Defaults to 256.
+            dpi (int, optional): Resolution, sets the width of the lines in pixels. Defaults to 100.
+        """
+        self.tile_size = tile_size
+        self.dpi = dpi
+        self.generator = Generator(0.0, 0.0, 0, theme)
+
+    def version(self, z: int, x: int, y: int) -> str:
+        """Version of the data of a tile, changes whenever one of its files is rewritten or another file is
+        selected for it, e.g. after an update of the preprocessed files.
+
+        Returns:
+            str: The hash of the paths of the files of the tile and their versions.
+        """
+        versions = sorted([pbf_file_path, RenderCache.data_version(pbf_file_path)
+                           if os.path.exists(pbf_file_path) else 'missing']
+                          for pbf_file_path in self.generator.pbf_files_of(tile_bounds(z, x, y)))
+        return hashlib.sha256(json.dumps(versions).encode('utf-8')).hexdigest()[:16]
+
+    def render(self, z: int, x: int, y: int) -> bytes | None:
+        """Renders a tile as png.
+
+        Returns:
+            bytes | None: The png or None, if there is no file with data of the tile.
+        """
+        bbox_dict = tile_bounds(z, x, y)
+        pbf_file_paths = self.generator.pbf_files_of(bbox_dict)
+        missing = [pbf_file_path for pbf_file_path in pbf_file_paths if not os.path.exists(pbf_file_path)]
+        if missing:
+            print_to_console(f'No file for tile {z}/{x}/{y}: {missing}')
+            return None
+
+        figure = Figure(figsize=(self.tile_size / self.dpi, self.tile_size / self.dpi), dpi=self.dpi,
+                        facecolor=self.generator.background_color)
+        ax = figure.add_axes((0, 0, 1, 1))
+        self.generator.plot_map(ax, pbf_file_paths, bbox_dict)
+        # The tile is filled, instead of keeping the aspect of the layers
+        ax.set_aspect('auto')
+
+        output = io.BytesIO()
+        figure.savefig(output, format='png', facecolor=figure.get_facecolor())
+        return output.getvalue()
+
+
+# Renderer of each worker process per theme, so the layer cache of a worker is kept between its tiles
+_worker_renderers = {}
+
+
+def render_tile(theme: str, z: int, x: int, y: int) -> bytes | None:
+    """Renders a tile in a worker process of the tile server.
+
+    Returns:
+        bytes | None: The png or None, if there is no file with data of the tile.
+    """
+    if theme not in _worker_renderers:
+        _worker_renderers[theme] = TileRenderer(theme)
+    return _worker_renderers[theme].render(z, x, y)
+
+
+class TileServer:
+    """Local HTTP server of slippy map tiles (/z/x/y.png) with a two level tile cache.
+
+    Tiles are looked up in an in-memory LRU, then in the DiskLRUCache and are rendered otherwise. The key of a
+    tile contains the version of its data, so tiles of outdated files are rendered again, also after a restart
+    of the server, and the outdated ones are evicted. Tiles are rendered in a bounded process pool, because the
+    layer cache and pyrosm are not shared between threads, and requests of a tile which is being rendered wait
+    for the same render. The latencies of all tile requests and the counters of the caches are served at
+    /statistics.
+    """
+
+    tile_pattern = re.compile(r'^/(\d+)/(\d+)/(\d+)\.png$')
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, theme: str = 'default', max_zoom: int = 19,
+                 memory_tiles: int = 1024, path_to_tile_cache: str | None = None,
+                 max_disk_bytes: int = 512 * 1024 * 1024, workers: int = 2, renderer=None):
+        """
+        Args:
+            host (str, optional): Host of the server. Defaults to '127.0.0.1'.
+            port (int, optional): Port of the server, 0 selects a free port. Defaults to 8080.
+            theme (str, optional): Theme of the colors. Defaults to 'default'.
+            max_zoom (int, optional): Highest zoom level which is served. Defaults to 19.
+            memory_tiles (int, optional): Number of tiles in the in-memory LRU. Defaults to 1024.
+            path_to_tile_cache (str, optional): Directory of the disk cache. Defaults to
+                src/resources/tile_cache/<theme>.
+            max_disk_bytes (int, optional): Size of the disk cache in bytes. Defaults to 512 MB.
+            workers (int, optional): Number of worker processes which render tiles. Defaults to 2.
+            renderer (optional): Object with render(z, x, y) returning png bytes or None and version(z, x, y)
+                returning the version of the data of the tile, it renders one tile at a time in a thread of the
+                server. Defaults to a TileRenderer of the theme in each worker process.
+        """
+        self.max_zoom = max_zoom
+        self.memory_tiles = memory_tiles
+
+        if renderer is None:
+            # The renderer of the server only computes the versions of the tiles
+            self.renderer = TileRenderer(theme)
+            self.render_function = partial(render_tile, theme)
+            # Forking the threads of the server would leave their locks held in the workers
+            self.executor = ProcessPoolExecutor(max_workers=workers,
+                                                mp_context=multiprocessing.get_context('forkserver'))
+        else:
+            self.renderer = renderer
+            self.render_function = renderer.render
+            self.executor = ThreadPoolExecutor(max_workers=1)
+
+        if path_to_tile_cache is None:
+            path_to_tile_cache = os.path.join('src', 'resources', 'tile_cache', theme)
+        self.disk_cache = DiskLRUCache(path_to_tile_cache, max_disk_bytes)
+
+        self.latencies = LatencyRecorder()
+        self.counters = {'memory': 0, 'disk': 0, 'render': 0, 'missing': 0}
+
+        self._memory = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._in_flight = {}
+
+        self.http_server = ThreadingHTTPServer((host, port), TileRequestHandler)
+        self.http_server.tile_server = self
+
+    @property
+    def address(self) -> str:
+        host, port = self.http_server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def valid(self, z: int, x: int, y: int) -> bool:
+        return z <= self.max_zoom and x < 2 ** z and y < 2 ** z
+
+    def _remember(self, key: str, tile: bytes):
+
+        self._memory[key] = tile
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_tiles:
+            self._memory.popitem(last=False)
+
+    def get_tile(self, z: int, x: int, y: int) -> tuple:
+        """Returns a tile from the caches or renders and caches it.
+
+        Returns:
+            tuple: The png or None, if there is no data, and where it came from: memory, disk or render.
+        """
+        key = f'{z}/{x}/{y}@{self.renderer.version(z, x, y)}'
+
+        with self._cache_lock:
+            tile = self._memory.get(key)
+            if tile is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory'] += 1
+                return tile, 'memory'
+
+            tile = self.disk_cache.get(key)
+            if tile is not None:
+                self._remember(key, tile)
+                self.counters['disk'] += 1
+                return tile, 'disk'
+
+            # Another request is rendering the tile already
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self.executor.submit(self.render_function, z, x, y)
+                self._in_flight[key] = future
+                rendering = True
+            else:
+                rendering = False
+
+        try:
+            tile = future.result()
+        finally:
+            if rendering:
+                with self._cache_lock:
+                    self._in_flight.pop(key, None)
+
+        if not rendering:
+            return tile, 'render'
+
+        with self._cache_lock:
+            if tile is None:
+                self.counters['missing'] += 1
+                return None, 'render'
+            self._remember(key, tile)
+            self.disk_cache.put(key, tile)
+            self.counters['render'] += 1
+
+        return tile, 'render'
+
+    def statistics(self) -> dict:
+        """Returns the latency percentiles of the tile requests and the counters of the caches.
+
+        Returns:
+            dict: latency, tiles (where the tiles came from), memory and disk.
+        """
+        with self._cache_lock:
+            return {'latency': self.latencies.percentiles(), 'tiles': dict(self.counters),
+                    'memory': {'entries': len(self._memory), 'bytes': sum(map(len, self._memory.values()))},
+                    'disk': self.disk_cache.statistics()}
+
+    def serve_forever(self):
+
+        print_to_console(f'Serving tiles at {self.address}/{{z}}/{{x}}/{{y}}.png')
+        try:
+            self.http_server.serve_forever()
+        except KeyboardInterrupt:
+            self.http_server.server_close()
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            print_to_console(f'Tile server statistics: {self.statistics()}')
+
+    def shutdown(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+
+    def send_body(self, status: int, content_type: str, body: bytes, headers: dict | None = None):
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+
+        tile_server = self.server.tile_server
+
+        if self.path == '/statistics':
+            self.send_body(200, 'application/json', json.dumps(tile_server.statistics()).encode('utf-8'))
+            return
+
+        match = tile_server.tile_pattern.match(self.path)
+        if match is None:
+            self.send_body(404, 'text/plain', b'Unknown path, tiles are served at /z/x/y.png')
+            return
+
+        start = time.perf_counter()
+        z, x, y = map(int, match.groups())
+        if not tile_server.valid(z, x, y):
+            self.send_body(404, 'text/plain', b'Tile is out of range')
+            return
+
+        try:
+            tile, source = tile_server.get_tile(z, x, y)
+        except Exception as e:
+            print_to_console(f'Rendering of tile {z}/{x}/{y} failed: {e}')
+            self.send_body(500, 'text/plain', str(e).encode('utf-8'))
+            return
+
+        if tile is None:
+            self.send_body(404, 'text/plain', b'No data for the tile')
+        else:
+            self.send_body(200, 'image/png', tile, {'X-Tile-Cache': source})
+        tile_server.latencies.record(time.perf_counter() - start)
+
+    def log_message(self, format, *args):
+        # Every request is recorded in the latencies instead
+        pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Local server of slippy map tiles')
+    parser.add_argument('--host', default='127.0.0.1', help='Host of the server')
+    parser.add_argument('--port', type=int, default=8080, help='Port of the server')
+    parser.add_argument('--theme', default='default', help='Theme of the colors, see src/resources/themes')
+    parser.add_argument('--workers', type=int, default=2, help='Number of worker processes which render tiles')
+    arguments = parser.parse_args()
+
+    TileServer(arguments.host, arguments.port, arguments.theme, workers=arguments.workers).serve_forever()
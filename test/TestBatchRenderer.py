@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import osmium
+
+from src.core.BatchRenderer import BatchRenderer, read_jobs
+
+
+class TestBatchRenderer(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.working_directory = os.getcwd()
+
+        # The generator resolves the preprocessed files relative to the working directory
+        path_to_preprocessed = os.path.join(self.directory.name, 'src', 'resources', 'latest', 'preprocessed')
+        os.makedirs(path_to_preprocessed)
+        shutil.copytree(os.path.join('src', 'resources', 'themes'),
+                        os.path.join(self.directory.name, 'src', 'resources', 'themes'))
+
+        writer = osmium.SimpleWriter(os.path.join(path_to_preprocessed, 'test.osm.pbf'))
+        for node_id, location in enumerate([(8.0, 53.0), (8.01, 53.01), (8.02, 53.0), (8.03, 53.03)], start=1):
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=location))
+        writer.add_way(osmium.osm.mutable.Way(id=1, nodes=[1, 2, 3, 1], tags={'landuse': 'meadow'}))
+        writer.add_way(osmium.osm.mutable.Way(id=2, nodes=[1, 4], tags={'highway': 'residential'}))
+        writer.close()
+
+        with open(os.path.join(path_to_preprocessed, 'cache_file_1.json'), 'w') as f:
+            json.dump({'resources/preprocessed/test.osm.pbf': {'lon min': ' 7.9', 'lon max': ' 8.1',
+                                                               'lat min': ' 52.9', 'lat max': ' 53.1'}}, f)
+
+        self.jobs = os.path.join(self.directory.name, 'jobs.csv')
+        with open(self.jobs, 'w') as f:
+            f.write('lat,lon,dis,style,output\n'
+                    '53.01,8.01,500,,images/a.png\n'
+                    '53.02,8.02,500,black_and_white,images/b.png\n'
+                    '60.0,20.0,500,,images/c.png\n')
+
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.working_directory)
+        self.directory.cleanup()
+
+    def test_jobs_are_grouped_by_file(self):
+
+        jobs = read_jobs(self.jobs)
+        self.assertEqual({'lat': 53.01, 'lon': 8.01, 'dis': 500, 'style': 'default', 'output': 'images/a.png'},
+                         jobs[0])
+
+        report = BatchRenderer(processes=2, dpi=20, path_to_report='report.json').run(jobs)
+
+        summary = report['summary']
+        self.assertEqual((3, 2, 1, 2), (summary['jobs'], summary['rendered'], summary['failed'], summary['files']))
+        self.assertTrue(os.path.exists(os.path.join('images', 'a.png')))
+        self.assertTrue(os.path.exists(os.path.join('images', 'b.png')))
+
+        # The area without preprocessed file falls back to the planet file, which does not exist
+        failed = [job for job in report['jobs'] if job['status'] == 'failed']
+        self.assertEqual(['images/c.png'], [job['output'] for job in failed])
+        with open('report.json') as f:
+            self.assertEqual(report, json.load(f))
+
+    def test_large_groups_are_split_over_the_workers(self):
+
+        batch_renderer = BatchRenderer(processes=4)
+        groups = {('a.osm.pbf',): [{'output': f'{i}.png'} for i in range(10)], ('b.osm.pbf',): [{'output': 'b.png'}]}
+
+        work = batch_renderer.split_groups(groups)
+        self.assertEqual([('a.osm.pbf',)] * 4 + [('b.osm.pbf',)], [pbf_file_paths for pbf_file_paths, *_ in work])
+        self.assertEqual([3, 3, 2, 2, 1], [len(jobs) for _, jobs, _, _ in work])
+        self.assertEqual(sorted(job['output'] for group in groups.values() for job in group),
+                         sorted(job['output'] for _, jobs, _, _ in work for job in jobs))
+
+        # A single worker renders each group at once
+        self.assertEqual([10, 1], [len(jobs) for _, jobs, _, _ in BatchRenderer(processes=1).split_groups(groups)])
+
+
+if __name__ == '__main__':
+    unittest.main()
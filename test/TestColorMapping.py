@@ -0,0 +1,89 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from src.common.ColorMapping import ColorMapping
+
+
+class TestColorMapping(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path_to_themes = ColorMapping.path_to_themes
+        ColorMapping.path_to_themes = self.directory.name
+
+        with open(os.path.join(self.directory.name, 'test_dark_roads.json'), 'w') as f:
+            json.dump({'extends': 'default', 'colors': {'roads': '#202020'}}, f)
+
+    def tearDown(self):
+        ColorMapping.path_to_themes = self.path_to_themes
+        self.directory.cleanup()
+
+    def test_lookups(self):
+
+        color_mapping = ColorMapping()
+
+        # '-' and '_' are ignored, the first definition of a key is used
+        self.assertEqual('#9DCA8A', color_mapping.get_color('natural-wood'))
+        self.assertEqual('#cdebb0', color_mapping.get_color('village_green'))
+        self.assertEqual((0.0, 0.0, 0.0, 0.5), ColorMapping(fallback='#000000').get_rgba('unknown', 0.5))
+        with self.assertRaises(KeyError):
+            color_mapping.get_color('unknown')
+
+        colors = ColorMapping(fallback='#ffffff').map_series(pandas.Series(['retail', 'unknown', 'retail', None]))
+        numpy.testing.assert_allclose([color_mapping.get_rgba('retail'), (1.0, 1.0, 1.0, 1.0),
+                                       color_mapping.get_rgba('retail'), (1.0, 1.0, 1.0, 1.0)], colors)
+
+    def test_missing_key_is_reported_once(self):
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            color_mapping = ColorMapping('test_dark_roads', fallback='#000000')
+            for value in ['unknown_key', 'unknown-key', 'unknown_key', 'other_unknown_key']:
+                color_mapping.get_rgba(value)
+            ColorMapping('test_dark_roads', fallback='#ffffff').get_color('unknown_key')
+
+        # Once per key and theme, '-' and '_' are ignored
+        self.assertEqual(2, output.getvalue().count('fallback'))
+
+    def test_themes(self):
+
+        dark_roads = ColorMapping('test_dark_roads')
+        self.assertEqual('#202020', dark_roads.get_color('roads'))
+        self.assertEqual(ColorMapping().get_color('retail'), dark_roads.get_color('retail'))
+
+        ColorMapping.path_to_themes = self.path_to_themes
+        black_and_white = ColorMapping('black_and_white')
+        self.assertEqual('#000000', black_and_white.get_color('roads'))
+        self.assertEqual('#ffffff', black_and_white.get_color('retail'))
+
+        with self.assertRaises(FileNotFoundError):
+            ColorMapping('unknown_theme')
+
+    def test_changed_theme_is_compiled_again(self):
+
+        dark_roads = ColorMapping('test_dark_roads')
+        self.assertEqual(dark_roads.fingerprint, ColorMapping('test_dark_roads').fingerprint)
+        self.assertNotEqual(dark_roads.fingerprint, ColorMapping('test_dark_roads', fallback='#000000').fingerprint)
+
+        # The theme is rewritten with another color and a fallback
+        path = os.path.join(self.directory.name, 'test_dark_roads.json')
+        with open(path, 'w') as f:
+            json.dump({'extends': 'default', 'fallback': '#ffffff', 'colors': {'roads': '#101010'}}, f)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        changed = ColorMapping('test_dark_roads')
+        self.assertEqual(('#101010', '#ffffff'), (changed.get_color('roads'), changed.get_color('unknown')))
+        self.assertNotEqual(dark_roads.fingerprint, changed.fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
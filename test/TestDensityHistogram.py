@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+
+from src.preprocessor.DensityHistogram import DensityHistogram
+
+
+class TestDensityHistogram(unittest.TestCase):
+
+    def test_split_skewed_density(self):
+
+        # Nearly empty area with a dense city in the lower left corner
+        counts = np.zeros((64, 64), dtype=np.int64)
+        counts[:, :] = 1
+        counts[0:4, 0:4] = 50000
+        counts[40:64, 40:64] = 0
+
+        histogram = DensityHistogram(counts, 0.0, 64.0, 0.0, 64.0)
+        target_count = histogram.total() / 16
+        bounding_boxes = histogram.split(target_count)
+
+        # Every node is covered exactly once
+        covered = np.zeros_like(counts)
+        for min_lon, min_lat, max_lon, max_lat in bounding_boxes:
+            covered[int(min_lon):int(max_lon), int(min_lat):int(max_lat)] += 1
+        self.assertTrue(np.all(covered[counts > 0] == 1))
+
+        # Bounding boxes are small in the city and large outside, no bounding box is empty
+        sums = [counts[int(b[0]):int(b[2]), int(b[1]):int(b[3])].sum() for b in bounding_boxes]
+        areas = [(b[2] - b[0]) * (b[3] - b[1]) for b in bounding_boxes]
+        self.assertLessEqual(max(sums), 2 * target_count)
+        self.assertTrue(all(value > 0 for value in sums))
+        self.assertLessEqual(min(areas), 16)
+        self.assertGreaterEqual(max(areas), 256)
+
+
+if __name__ == '__main__':
+    unittest.main()
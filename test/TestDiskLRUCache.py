@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from src.common.DiskLRUCache import DiskLRUCache
+
+
+class TestDiskLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_size_based_eviction(self):
+
+        disk_cache = DiskLRUCache(self.path, max_bytes=25)
+        disk_cache.put('a', b'a' * 10)
+        disk_cache.put('b', b'b' * 10)
+        self.assertEqual(b'a' * 10, disk_cache.get('a'))
+
+        # b is the least recently used value
+        disk_cache.put('c', b'c' * 10)
+        self.assertNotIn('b', disk_cache)
+        self.assertFalse(os.path.exists(disk_cache.file_of('b')))
+        self.assertIsNone(disk_cache.get('b'))
+
+        # Values larger than the cache are not stored
+        disk_cache.put('d', b'd' * 30)
+        self.assertNotIn('d', disk_cache)
+
+        # The index is shared with other instances of the same directory
+        self.assertEqual(b'c' * 10, DiskLRUCache(self.path, max_bytes=25).get('c'))
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 2, 'bytes': 20},
+                         disk_cache.statistics())
+
+        disk_cache.clear()
+        self.assertEqual(0, len(disk_cache))
+        self.assertTrue(all(name.startswith('index.sqlite') for name in os.listdir(self.path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
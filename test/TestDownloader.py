@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.preprocessor.Downloader import Downloader
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the osm download server with range requests and md5 files."""
+
+    files = {}
+    requested_ranges = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_file_headers(self, content: bytes):
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', '"v1"')
+
+    def do_HEAD(self):
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_file_headers(self.files[self.path])
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+
+        content = self.files[self.path]
+        if 'Range' in self.headers:
+            start, end = self.headers['Range'].replace('bytes=', '').split('-')
+            start, end = int(start), int(end)
+            RangeRequestHandler.requested_ranges.append((start, end))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(content)}')
+            content = content[start:end + 1]
+        else:
+            self.send_response(200)
+
+        self.send_file_headers(content)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestDownloader(unittest.TestCase):
+
+    content = os.urandom(1024 * 1024 + 123)
+
+    @classmethod
+    def setUpClass(cls):
+        RangeRequestHandler.files = {
+            '/planet-latest.osm.pbf': cls.content,
+            '/planet-latest.osm.pbf.md5': f'{hashlib.md5(cls.content).hexdigest()}  planet-latest.osm.pbf'.encode(),
+            '/region-latest.osm.pbf': cls.content[:5000],
+            '/broken-latest.osm.pbf': cls.content,
+            '/broken-latest.osm.pbf.md5': b'00000000000000000000000000000000  broken-latest.osm.pbf'
+        }
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        RangeRequestHandler.requested_ranges = []
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parallel_download(self):
+
+        downloader = Downloader(connections=4, part_size=100 * 1024)
+        path = os.path.join(self.directory.name, 'planet-latest.osm.pbf')
+        region_path = os.path.join(self.directory.name, 'region-latest.osm.pbf')
+
+        downloader.download_many([(f'{self.url}/planet-latest.osm.pbf', path),
+                                  (f'{self.url}/region-latest.osm.pbf', region_path)])
+
+        with open(path, 'rb') as f:
+            self.assertEqual(self.content, f.read())
+        with open(region_path, 'rb') as f:
+            self.assertEqual(self.content[:5000], f.read())
+        self.assertFalse(os.path.exists(Downloader.state_path_of(path)))
+        self.assertEqual(11 + 1, len(RangeRequestHandler.requested_ranges))
+
+    def test_resume(self):
+
+        downloader = Downloader(connections=2, part_size=100 * 1024)
+        path = os.path.join(self.directory.name, 'planet-latest.osm.pbf')
+
+        # Interrupted download: the first 8 parts are written and recorded
+        with open(path, 'wb') as f:
+            f.write(self.content[:8 * 100 * 1024])
+            f.truncate(len(self.content))
+        with open(Downloader.state_path_of(path), 'w', encoding='utf-8') as f:
+            json.dump({'url': f'{self.url}/planet-latest.osm.pbf', 'size': len(self.content), 'version': '"v1"',
+                       'part_size': 100 * 1024, 'done': list(range(8))}, f)
+
+        downloader.download(f'{self.url}/planet-latest.osm.pbf', path)
+
+        with open(path, 'rb') as f:
+            self.assertEqual(self.content, f.read())
+        self.assertEqual([8 * 100 * 1024, 9 * 100 * 1024, 10 * 100 * 1024],
+                         sorted(start for start, _ in RangeRequestHandler.requested_ranges))
+
+    def test_checksum_mismatch(self):
+
+        downloader = Downloader(connections=2, part_size=256 * 1024)
+        path = os.path.join(self.directory.name, 'broken-latest.osm.pbf')
+
+        with self.assertRaises(ValueError):
+            downloader.download(f'{self.url}/broken-latest.osm.pbf', path)
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from src.preprocessor.JobLedger import JobLedger
+
+
+class TestJobLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.job_ledger = JobLedger(os.path.join(self.directory.name, 'ledger'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_state_transitions(self):
+
+        tile = os.path.join('buffer', 'test_8.0_53.0_8.5_53.5.osm.pbf')
+        self.assertIsNone(self.job_ledger.get(tile))
+
+        self.job_ledger.set_state(tile, 'planned', source='raw/test.osm.pbf',
+                                  bounding_box=[8.0, 53.0, 8.5, 53.5], depth=0)
+        self.job_ledger.set_states([tile], 'extracting')
+        self.job_ledger.set_state(tile, 'extracted')
+
+        # The fields of the planned state are kept
+        self.assertEqual({'path': tile, 'state': 'extracted', 'source': 'raw/test.osm.pbf',
+                          'bounding_box': [8.0, 53.0, 8.5, 53.5], 'depth': 0}, self.job_ledger.get(tile))
+        self.assertEqual([tile], list(self.job_ledger.entries()))
+        self.assertEqual(['test_8.0_53.0_8.5_53.5.osm.pbf.json'], os.listdir(self.job_ledger.path))
+
+        with self.assertRaises(ValueError):
+            self.job_ledger.set_state(tile, 'done')
+
+        self.job_ledger.clear()
+        self.assertEqual({}, self.job_ledger.entries())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from src.preprocessor.JobScheduler import JobScheduler, worker_count
+
+
+class RecordingPreprocessor:
+    """Stand-in for the Preprocessor, which records the executed jobs in a log file."""
+
+    def __init__(self, directory: str):
+        self.path_to_buffer = os.path.join(directory, 'buffer')
+        self.log = os.path.join(directory, 'log')
+
+    def split_file(self, job: tuple) -> list:
+
+        with open(self.log, 'a') as f:
+            f.write(f'{job[0]} {os.path.basename(job[1])}\n')
+
+        if job[0] == 'statistics' and os.path.getsize(job[1]) > 100:
+            return [('check', job[1], job[1], 0), ('check', job[1], job[1], 0)]
+        return []
+
+
+class TestJobScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_largest_job_first_and_move_at_the_end(self):
+
+        raw_files = []
+        for name, size in [('small', 10), ('large', 1000), ('medium', 500)]:
+            path = os.path.join(self.directory.name, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * size)
+            raw_files.append(path)
+
+        preprocessor = RecordingPreprocessor(self.directory.name)
+        done = []
+        JobScheduler(preprocessor, processes=1).run(raw_files, on_raw_file_done=done.append)
+
+        with open(preprocessor.log) as f:
+            log = f.read().splitlines()
+
+        self.assertEqual(['statistics large', 'check large', 'check large', 'statistics medium', 'check medium',
+                          'check medium', 'statistics small', 'move large', 'move medium', 'move small'], log)
+        self.assertEqual(sorted(raw_files), sorted(done))
+
+    def test_worker_count(self):
+
+        self.assertEqual(3, worker_count(0, cpu_count=3))
+        self.assertEqual(1, worker_count(10 ** 9, cpu_count=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
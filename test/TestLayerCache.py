@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+from src.core.LayerCache import LayerCache, estimate_size
+
+
+class TestLayerCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.tile = os.path.join(self.directory.name, 'tile.osm.pbf')
+        with open(self.tile, 'wb') as f:
+            f.write(b'tile')
+
+        self.frame = gpd.GeoDataFrame({'highway': ['primary', 'residential', 'path']},
+                                      geometry=[Point(8.1, 53.1), Point(8.5, 53.5), Point(8.9, 53.9)],
+                                      crs='EPSG:4326')
+        self.loads = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def loader(self):
+        self.loads += 1
+        return self.frame
+
+    def test_hits_and_bbox_selection(self):
+
+        layer_cache = LayerCache()
+
+        roads = layer_cache.get_layer(self.tile, 'roads', self.loader, {'network_type': 'all'}, [8.0, 53.0, 8.6, 53.6])
+        self.assertEqual(['primary', 'residential'], list(roads['highway']))
+
+        roads = layer_cache.get_layer(self.tile, 'roads', self.loader, {'network_type': 'all'}, [8.8, 53.8, 9.0, 54.0])
+        self.assertEqual(['path'], list(roads['highway']))
+        self.assertIsNone(layer_cache.get_layer(self.tile, 'roads', self.loader, {'network_type': 'all'},
+                                                [10.0, 50.0, 11.0, 51.0]))
+
+        self.assertEqual(1, self.loads)
+        self.assertEqual({'hits': 2, 'misses': 1, 'evictions': 0, 'entries': 1,
+                          'bytes': estimate_size(self.frame)}, layer_cache.statistics())
+
+        # Another filter is another layer, a changed file is parsed again
+        layer_cache.get_layer(self.tile, 'roads', self.loader, {'network_type': 'driving'})
+        with open(self.tile, 'ab') as f:
+            f.write(b'changed')
+        layer_cache.get_layer(self.tile, 'roads', self.loader, {'network_type': 'all'})
+        self.assertEqual(3, self.loads)
+
+    def test_regions(self):
+
+        layer_cache = LayerCache()
+
+        # The region is parsed once and serves all bounding boxes inside of it
+        roads = layer_cache.get_layer(self.tile, 'roads', self.loader, bbox=[8.0, 53.0, 8.2, 53.2],
+                                      region=[7.9, 52.9, 8.6, 53.6])
+        self.assertEqual(['primary'], list(roads['highway']))
+        roads = layer_cache.get_layer(self.tile, 'roads', self.loader, bbox=[8.4, 53.4, 8.6, 53.6],
+                                      region=[8.3, 53.3, 8.7, 53.7])
+        self.assertEqual(['residential'], list(roads['highway']))
+        self.assertEqual(1, self.loads)
+        self.assertEqual(LayerCache.key(self.tile, 'roads', region=[7.9, 52.9, 8.6, 53.6]),
+                         layer_cache.lookup(self.tile, 'roads', bbox=[8.1, 53.1, 8.5, 53.5]))
+
+        # A bounding box outside of the cached regions is a miss, another filter as well
+        layer_cache.get_layer(self.tile, 'roads', self.loader, bbox=[8.5, 53.5, 8.7, 53.7], region=[8.4, 53.4, 8.8, 53.8])
+        layer_cache.get_layer(self.tile, 'roads', self.loader, {'network_type': 'driving'}, [8.0, 53.0, 8.2, 53.2],
+                              [7.9, 52.9, 8.6, 53.6])
+        self.assertEqual(3, self.loads)
+        self.assertEqual(3, len(layer_cache))
+        self.assertIsNone(layer_cache.lookup(self.tile, 'roads'))
+
+        # The whole file serves every bounding box
+        layer_cache.get_layer(self.tile, 'roads', self.loader)
+        self.assertEqual(LayerCache.key(self.tile, 'roads'),
+                         layer_cache.lookup(self.tile, 'roads', bbox=[8.5, 53.5, 9.0, 54.0]))
+
+    def test_eviction(self):
+
+        layer_cache = LayerCache(max_bytes=int(estimate_size(self.frame) * 2.5))
+
+        for layer in ['roads', 'natural', 'landuse']:
+            layer_cache.get_layer(self.tile, layer, self.loader)
+        self.assertEqual(1, layer_cache.evictions)
+        self.assertNotIn(LayerCache.key(self.tile, 'roads'), layer_cache)
+
+        # The least recently used layer is evicted
+        layer_cache.get_layer(self.tile, 'natural', self.loader)
+        layer_cache.get_layer(self.tile, 'buildings', self.loader)
+        self.assertIn(LayerCache.key(self.tile, 'natural'), layer_cache)
+        self.assertNotIn(LayerCache.key(self.tile, 'landuse'), layer_cache)
+        self.assertLessEqual(layer_cache.current_bytes, layer_cache.max_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import geopandas as gpd
+import osmium
+from shapely.geometry import LineString, Point
+
+from src.core.LayerCache import LayerCache, estimate_parsed_size
+from src.core.LayerExtractor import LayerExtractor, merge_layers
+from src.core.MapGenerator import Generator
+
+
+class TestLayerExtractor(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.osm_file = os.path.join(self.directory.name, 'test.osm.pbf')
+
+        writer = osmium.SimpleWriter(self.osm_file)
+        locations = [(8.10, 53.10), (8.11, 53.10), (8.11, 53.11), (8.10, 53.11), (8.12, 53.12), (8.13, 53.13)]
+        for node_id, location in enumerate(locations, start=1):
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=location))
+        writer.add_node(osmium.osm.mutable.Node(id=7, location=(8.14, 53.14), tags={'natural': 'tree'}))
+        writer.add_way(osmium.osm.mutable.Way(id=1, nodes=[1, 2, 3, 4, 1], tags={'landuse': 'meadow'}))
+        writer.add_way(osmium.osm.mutable.Way(id=2, nodes=[4, 5, 6], tags={'highway': 'residential'}))
+        writer.add_way(osmium.osm.mutable.Way(id=3, nodes=[5, 6], tags={'highway': 'proposed'}))
+        writer.add_way(osmium.osm.mutable.Way(id=4, nodes=[1, 2, 3, 1], tags={'building': 'yes'}))
+        writer.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_layers_of_single_pass(self):
+
+        layers = LayerExtractor(self.osm_file, ['roads', 'natural', 'landuse', 'aeroway', 'buildings']).run()
+
+        # Proposed highways are not part of the network
+        self.assertEqual(['residential'], list(layers['roads']['highway']))
+        self.assertEqual(['LineString'], list(layers['roads'].geom_type))
+        self.assertEqual(['tree'], list(layers['natural']['natural']))
+        self.assertEqual(['Polygon'], list(layers['landuse'].geom_type))
+        self.assertEqual(['yes'], list(layers['buildings']['building']))
+        self.assertIsNone(layers['aeroway'])
+
+        self.assertEqual({'landuse': None}, LayerExtractor(self.osm_file, ['landuse'], [9.0, 50.0, 9.1, 50.1]).run())
+        with self.assertRaises(ValueError):
+            LayerExtractor(self.osm_file, ['railways'])
+
+    def test_large_file_is_parsed_around_the_map(self):
+
+        generator = Generator(53.1, 8.1, 0)
+        generator.layer_cache = LayerCache()
+        bbox_list = [8.095, 53.095, 8.115, 53.115]
+        self.assertIsNone(generator.extraction_region(self.osm_file, bbox_list))
+
+        # The layers of the file exceed the budget, only the padded bounding box of the map is parsed and cached
+        generator.layer_cache.max_bytes = estimate_parsed_size(self.osm_file) - 1
+        region = generator.extraction_region(self.osm_file, bbox_list)
+        for value, expected in zip(region, [8.075, 53.075, 8.135, 53.135]):
+            self.assertAlmostEqual(expected, value)
+
+        layers = generator.load_layers(self.osm_file, bbox_list, ('roads', 'landuse', 'natural'))
+        self.assertEqual(['meadow'], list(layers['landuse']['landuse']))
+        self.assertEqual(['residential'], list(layers['roads']['highway']))
+        self.assertIsNone(layers['natural'])
+        self.assertIn(LayerCache.key(self.osm_file, 'landuse', {'landuse': True}, region), generator.layer_cache)
+
+        # A map inside of the region is served by the cache, the tree outside of it is parsed with a new region
+        generator.load_layers(self.osm_file, [8.1, 53.1, 8.11, 53.11], ('roads', 'landuse', 'natural'))
+        self.assertEqual({'hits': 3, 'misses': 3}, {name: value for name, value in
+                                                    generator.layer_cache.statistics().items()
+                                                    if name in ['hits', 'misses']})
+        layers = generator.load_layers(self.osm_file, [8.135, 53.135, 8.145, 53.145], ('natural',))
+        self.assertEqual(['tree'], list(layers['natural']['natural']))
+
+    def test_map_across_files_is_clipped(self):
+
+        generator = Generator(53.1, 8.1, 0)
+        generator.layer_cache = LayerCache()
+        other_file = os.path.join(self.directory.name, 'other.osm.pbf')
+        shutil.copyfile(self.osm_file, other_file)
+
+        # Both files fit into the cache, but only their parts around the map are parsed
+        bbox_dict = {'lon min': 8.095, 'lon max': 8.115, 'lat min': 53.095, 'lat max': 53.115}
+        layers = generator.load_map_layers([self.osm_file, other_file], bbox_dict, 100)
+        self.assertEqual(['meadow'], list(layers['landuse']['landuse']))
+        self.assertIsNone(layers['natural'])
+
+        region = generator.extraction_region(self.osm_file, [8.095, 53.095, 8.115, 53.115], clipped=True)
+        for pbf_file_path in [self.osm_file, other_file]:
+            self.assertIn(LayerCache.key(pbf_file_path, 'landuse', {'landuse': True}, region), generator.layer_cache)
+            self.assertIsNone(generator.layer_cache.lookup(pbf_file_path, 'landuse', {'landuse': True}))
+
+    def test_merge_layers(self):
+
+        # The way 2 crosses the border of both files, every file holds its part
+        west = gpd.GeoDataFrame({'id': [1, 2], 'osm_type': ['way', 'way'], 'highway': ['primary', 'residential']},
+                                geometry=[LineString([(8.1, 53.1), (8.2, 53.1)]),
+                                          LineString([(8.4, 53.2), (8.5, 53.2)])], crs='EPSG:4326')
+        east = gpd.GeoDataFrame({'id': [2, 2, 3], 'osm_type': ['way', 'node', 'way'],
+                                 'highway': ['residential', 'crossing', 'service']},
+                                geometry=[LineString([(8.5, 53.2), (8.6, 53.2)]), Point(8.7, 53.3),
+                                          LineString([(8.7, 53.3), (8.8, 53.3)])], crs='EPSG:4326')
+
+        merged = merge_layers([west, None, east])
+        self.assertEqual([('way', 1), ('way', 2), ('node', 2), ('way', 3)],
+                         list(zip(merged['osm_type'], merged['id'])))
+        self.assertAlmostEqual(0.2, merged.geometry.iloc[1].length)
+        self.assertTrue(merged.geometry.iloc[1].covers(Point(8.45, 53.2)))
+        self.assertTrue(merged.geometry.iloc[1].covers(Point(8.55, 53.2)))
+        self.assertEqual(['primary', 'residential', 'crossing', 'service'], list(merged['highway']))
+
+        self.assertIs(west, merge_layers([None, west]))
+        self.assertIsNone(merge_layers([None, None]))
+
+
+if __name__ == '__main__':
+    unittest.main()
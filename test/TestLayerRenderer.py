@@ -0,0 +1,55 @@
+import unittest
+import warnings
+
+import geopandas as gpd
+import matplotlib
+import numpy
+from shapely.geometry import LineString, MultiPolygon, Point, box
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from src.common.ColorMapping import ColorMapping
+from src.core.LayerRenderer import LayerRenderer
+
+
+class TestLayerRenderer(unittest.TestCase):
+
+    def setUp(self):
+
+        self.layer_renderer = LayerRenderer(ColorMapping())
+        self.figure, self.ax = plt.subplots()
+
+    def tearDown(self):
+        plt.close(self.figure)
+
+    def test_single_collection_per_geometry_type(self):
+
+        landuse = gpd.GeoDataFrame(
+            {'landuse': ['meadow', 'retail', 'unknown', 'meadow', 'retail']},
+            geometry=[box(0, 0, 1, 1), MultiPolygon([box(2, 2, 3, 3), box(4, 4, 5, 5)]), box(6, 6, 7, 7),
+                      LineString([(0, 0), (1, 1)]), Point(3, 3)])
+
+        # Values outside of the categories are skipped without a warning of pandas
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            drawn = self.layer_renderer.plot_layer(landuse, self.ax, column='landuse',
+                                                   categories={'retail': ('retail', 0.3), 'meadow': ('meadow', 0.5)})
+
+        self.assertEqual({'meadow': 2, 'retail': 2}, drawn)
+        polygons, lines, points = self.ax.collections
+        self.assertEqual(3, len(polygons.get_paths()))
+
+        # Retail is drawn first, both of its polygons have its color and alpha
+        retail = matplotlib.colors.to_rgba(ColorMapping().get_color('retail'), 0.3)
+        meadow = matplotlib.colors.to_rgba(ColorMapping().get_color('meadow'), 0.5)
+        numpy.testing.assert_allclose([retail, retail, meadow], polygons.get_facecolor())
+        numpy.testing.assert_allclose([meadow], lines.get_edgecolor())
+        numpy.testing.assert_allclose([retail], points.get_facecolor())
+
+        self.assertEqual({}, self.layer_renderer.plot_layer(None, self.ax, color='roads'))
+        self.assertEqual({}, self.layer_renderer.plot_layer(landuse, self.ax, column='natural', categories={}))
+
+
+if __name__ == '__main__':
+    unittest.main()
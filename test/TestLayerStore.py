@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import geopandas as gpd
+from shapely.geometry import LineString, Point, Polygon
+
+from src.core.LayerStore import LayerStore, store_available, store_path_of
+
+
+@unittest.skipUnless(store_available(), 'The layer store needs pyarrow')
+class TestLayerStore(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.osm_file = os.path.join(self.directory.name, 'test.osm.pbf')
+        with open(self.osm_file, 'wb') as f:
+            f.write(b'osm')
+
+        # A residential road and a building in the west, a primary road and a tree in the east
+        self.layers = {
+            'roads': gpd.GeoDataFrame(
+                {'id': [1, 3], 'osm_type': ['way', 'way'], 'highway': ['residential', 'primary']},
+                geometry=[LineString([(8.10, 53.10), (8.11, 53.10), (8.11, 53.11)]),
+                          LineString([(8.50, 53.10), (8.51, 53.11)])], crs='EPSG:4326'),
+            'natural': gpd.GeoDataFrame({'id': [7], 'osm_type': ['node'], 'natural': ['tree']},
+                                        geometry=[Point(8.52, 53.12)], crs='EPSG:4326'),
+            'buildings': gpd.GeoDataFrame(
+                {'id': [2], 'osm_type': ['way'], 'building': ['yes']},
+                geometry=[Polygon([(8.10, 53.10), (8.11, 53.10), (8.11, 53.11), (8.10, 53.11)])], crs='EPSG:4326'),
+            'landuse': None,
+            'aeroway': None,
+        }
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def save(self, store: LayerStore):
+
+        stat = os.stat(self.osm_file)
+        for layer, frame in self.layers.items():
+            store.save_layer(store_path_of(self.osm_file, layer), layer, frame, stat.st_mtime_ns, stat.st_size)
+
+    def test_save_and_read_bounding_box(self):
+
+        # One feature per row group, so the row groups outside of the bounding box are skipped
+        self.save(LayerStore(self.osm_file, row_group_size=1))
+
+        layers = LayerStore(self.osm_file).read(['roads', 'natural', 'buildings'], [8.4, 53.0, 8.6, 53.2])
+        self.assertEqual(['primary'], list(layers['roads']['highway']))
+        self.assertEqual([('way', 3)], list(zip(layers['roads']['osm_type'], layers['roads']['id'])))
+        self.assertEqual(['tree'], list(layers['natural']['natural']))
+        self.assertIsNone(layers['buildings'])
+
+        layers = LayerStore(self.osm_file).read(['roads', 'landuse'], [8.0, 53.0, 9.0, 54.0])
+        self.assertEqual(['primary', 'residential'], sorted(layers['roads']['highway']))
+        self.assertEqual(sorted(self.layers['roads'].geometry.to_wkt()), sorted(layers['roads'].geometry.to_wkt()))
+        self.assertIsNone(layers['landuse'])
+
+        # The files are GeoParquet, geopandas recognizes the bbox column as covering and drops it
+        roads = gpd.read_parquet(store_path_of(self.osm_file, 'roads'))
+        self.assertEqual(['id', 'osm_type', 'highway', 'geometry'], list(roads.columns))
+        self.assertEqual(2, len(roads))
+
+    def test_missing_or_outdated_store(self):
+
+        store = LayerStore(self.osm_file)
+        self.assertIsNone(store.read(['roads'], [8.0, 53.0, 9.0, 54.0]))
+
+        self.save(store)
+        self.assertIsNotNone(store.read(['roads'], [8.0, 53.0, 9.0, 54.0]))
+
+        os.remove(store_path_of(self.osm_file, 'natural'))
+        self.assertIsNone(store.read(['roads', 'natural'], [8.0, 53.0, 9.0, 54.0]))
+
+        # Rewritten osm file -> the store is outdated
+        stat = os.stat(self.osm_file)
+        os.utime(self.osm_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(store.read(['roads'], [8.0, 53.0, 9.0, 54.0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
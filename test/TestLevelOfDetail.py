@@ -0,0 +1,63 @@
+import math
+import unittest
+
+import geopandas as gpd
+import shapely
+from shapely.geometry import LineString, Point, Polygon, box
+
+from src.core.LevelOfDetail import LevelOfDetail, pixel_size
+
+
+class TestLevelOfDetail(unittest.TestCase):
+
+    def setUp(self):
+        self.bbox_dict = {'lon min': 8.0, 'lon max': 8.1, 'lat min': 53.0, 'lat max': 53.07}
+
+    def test_pixel_size(self):
+
+        width, height = pixel_size(self.bbox_dict, 100)
+
+        # The latitude side is the longer one in the drawn map
+        cos_lat = math.cos(math.radians(53.035))
+        self.assertAlmostEqual(0.07 / cos_lat / 100, width)
+        self.assertAlmostEqual(0.0007, height)
+
+    def test_clip_simplify_and_drop(self):
+
+        # Circle with many vertices, which crosses the west border of the bounding box
+        circle = Point(8.0, 53.03).buffer(0.02, quad_segs=256)
+        layer = gpd.GeoDataFrame(
+            {'name': ['circle', 'tiny', 'road', 'short', 'point', 'outside']},
+            geometry=[circle, box(8.05, 53.03, 8.05001, 53.03001),
+                      LineString([(7.9, 53.01), (8.2, 53.01)]), LineString([(8.05, 53.02), (8.05001, 53.02)]),
+                      Point(8.05, 53.05), box(9.0, 54.0, 9.1, 54.1)],
+            crs='EPSG:4326')
+
+        level_of_detail = LevelOfDetail(self.bbox_dict, 100)
+        result = level_of_detail.apply(layer)
+
+        self.assertEqual(['circle', 'road', 'point'], list(result['name']))
+        self.assertEqual(layer.crs, result.crs)
+
+        # Clipped to the bounding box with its margin and simplified to the pixel size
+        min_x, _, max_x, _ = shapely.bounds(result.geometry.iloc[0])
+        self.assertAlmostEqual(8.0 - 2 * level_of_detail.pixel_width, min_x)
+        self.assertLess(shapely.get_num_coordinates(result.geometry.iloc[0]),
+                        shapely.get_num_coordinates(circle) / 4)
+        self.assertAlmostEqual(8.1 + 2 * level_of_detail.pixel_width, shapely.bounds(result.geometry.iloc[1])[2])
+
+        # The layer itself is not changed
+        self.assertEqual(6, len(layer))
+        self.assertTrue(layer.geometry.iloc[0].equals(circle))
+
+    def test_empty_layers(self):
+
+        level_of_detail = LevelOfDetail(self.bbox_dict, 100)
+        self.assertIsNone(level_of_detail.apply(None))
+
+        empty = gpd.GeoDataFrame(geometry=[Polygon()], crs='EPSG:4326').iloc[:0]
+        self.assertTrue(level_of_detail.apply(empty).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+import osmium
+
+from src.preprocessor.MultiExtractSplitter import MultiExtractSplitter
+from src.preprocessor.TileObjectIndex import TileObjectIndex
+
+
+class TestMultiExtractSplitter(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.osm_file = os.path.join(self.directory.name, 'test.osm.pbf')
+
+        writer = osmium.SimpleWriter(self.osm_file)
+        writer.add_node(osmium.osm.mutable.Node(id=1, location=(8.1, 53.1)))
+        writer.add_node(osmium.osm.mutable.Node(id=2, location=(8.4, 53.3)))
+        writer.add_node(osmium.osm.mutable.Node(id=3, location=(8.7, 53.2)))
+        writer.add_way(osmium.osm.mutable.Way(id=1, nodes=[1, 2, 3], tags={'highway': 'path'}))
+        writer.add_relation(osmium.osm.mutable.Relation(id=1, members=[('n', 3, '')], tags={'type': 'site'}))
+        writer.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_statistics_while_writing(self):
+
+        bounding_boxes = [(8.0, 53.0, 8.5, 53.5), (8.5, 53.0, 9.0, 53.5), (10.0, 50.0, 11.0, 51.0)]
+        output_paths = [os.path.join(self.directory.name, f'sub_{cell}.osm.pbf') for cell in range(3)]
+
+        results = MultiExtractSplitter(self.osm_file, bounding_boxes, output_paths).run()
+
+        self.assertEqual({'lon min': ' 8.1000000', 'lon max': ' 8.4000000', 'lat min': ' 53.1000000',
+                          'lat max': ' 53.3000000', 'nodes': ' 2', 'ways': ' 1', 'relations': ' 0'},
+                         results[0]['statistics'])
+        self.assertEqual({'lon min': ' 8.7000000', 'lon max': ' 8.7000000', 'lat min': ' 53.2000000',
+                          'lat max': ' 53.2000000', 'nodes': ' 1', 'ways': ' 1', 'relations': ' 1'},
+                         results[1]['statistics'])
+
+        # The files are written as .partial and the empty file is not written at all
+        for result in results[:2]:
+            self.assertTrue(result['path'].endswith('.partial'))
+            self.assertEqual(os.path.getsize(result['path']), result['size'])
+            statistics = result['statistics']
+            self.assertEqual(int(statistics['nodes']) + int(statistics['ways']) + int(statistics['relations']),
+                             sum(1 for _ in osmium.FileProcessor(osmium.io.File(result['path'], 'pbf'))))
+        self.assertIsNone(results[2])
+        self.assertEqual(['sub_0.osm.pbf.partial', 'sub_0.osm.pbf.partial.ids.npz', 'sub_1.osm.pbf.partial',
+                          'sub_1.osm.pbf.partial.ids.npz', 'test.osm.pbf'], sorted(os.listdir(self.directory.name)))
+
+    def test_object_index_while_writing(self):
+
+        bounding_boxes = [(8.0, 53.0, 8.5, 53.5), (8.5, 53.0, 9.0, 53.5)]
+        output_paths = [os.path.join(self.directory.name, f'sub_{cell}.osm.pbf') for cell in range(2)]
+
+        # The way ids are appended to a file after every way
+        splitter = MultiExtractSplitter(self.osm_file, bounding_boxes, output_paths)
+        splitter.id_buffer_size = 1
+        results = splitter.run()
+
+        indexes = [TileObjectIndex.load(result['path']) for result in results]
+        self.assertEqual([([1], []), ([1], [1])],
+                         [(index.ids['w'].tolist(), index.ids['r'].tolist()) for index in indexes])
+        self.assertEqual([], [name for name in os.listdir(self.directory.name) if name.endswith('.ways')])
+
+    def test_routing_of_relations(self):
+
+        osm_file = os.path.join(self.directory.name, 'relations.osm.pbf')
+        writer = osmium.SimpleWriter(osm_file)
+        writer.add_node(osmium.osm.mutable.Node(id=1, location=(8.1, 53.1)))
+        writer.add_node(osmium.osm.mutable.Node(id=2, location=(8.2, 53.2)))
+        writer.add_node(osmium.osm.mutable.Node(id=3, location=(8.7, 53.2)))
+        # The way has the id of the node 3 and only lies in the west
+        writer.add_way(osmium.osm.mutable.Way(id=3, nodes=[1, 2], tags={'highway': 'path'}))
+        writer.add_relation(osmium.osm.mutable.Relation(id=1, members=[('n', 3, '')], tags={'type': 'site'}))
+        writer.add_relation(osmium.osm.mutable.Relation(id=2, members=[('w', 3, '')], tags={'type': 'route'}))
+        writer.add_relation(osmium.osm.mutable.Relation(id=3, members=[('r', 1, ''), ('n', 9, '')],
+                                                        tags={'type': 'collection'}))
+        writer.close()
+
+        bounding_boxes = [(8.0, 53.0, 8.5, 53.5), (8.5, 53.0, 9.0, 53.5)]
+        for location_storage in ['flex_mem', f'dense_file_array,{os.path.join(self.directory.name, "nodes.idx")}']:
+            with self.subTest(location_storage=location_storage):
+
+                output_paths = [os.path.join(self.directory.name, f'relations_{cell}.osm.pbf') for cell in range(2)]
+                results = MultiExtractSplitter(osm_file, bounding_boxes, output_paths, location_storage).run()
+
+                # The node member routes to the east, the way member to the west, the relation member and the
+                # missing node to the cell of the relation
+                relations = [sorted(relation.id for relation in osmium.FileProcessor(
+                    osmium.io.File(result['path'], 'pbf'), osmium.osm.RELATION)) for result in results]
+                self.assertEqual([[2], [1, 3]], relations)
+
+                # The bounds of the ways are removed with the split
+                self.assertEqual([], [name for name in os.listdir(self.directory.name) if 'way_' in name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import platform
+import random
+import shutil
+import stat
+import struct
+import subprocess
+import tempfile
+import time
+import unittest
+import zlib
+
+import numpy as np
+import osmium
+
+from src.common.PbfReader import PbfReader, decode_packed_sint64, read_pbf_statistics
+from src.common.Utilities import extract_osm_statistics
+
+
+def encode_sint64(values: list) -> bytes:
+
+    data = bytearray()
+    for value in values:
+        value = ((value << 1) ^ (value >> 63)) & 0xffffffffffffffff
+        while value >= 0x80:
+            data.append((value & 0x7f) | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
+
+
+class TestPbfReader(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.osm_file = os.path.join(cls.directory.name, 'test.osm.pbf')
+
+        random.seed(1)
+        writer = osmium.SimpleWriter(cls.osm_file)
+        cls.lons, cls.lats = [], []
+        for node_id in range(1, 200001):
+            lon, lat = round(random.uniform(8.0, 9.0), 7), round(random.uniform(53.0, 54.0), 7)
+            cls.lons.append(lon)
+            cls.lats.append(lat)
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=(lon, lat)))
+        for way_id in range(1, 20001):
+            writer.add_way(osmium.osm.mutable.Way(id=way_id, nodes=[way_id, way_id + 1], tags={'highway': 'path'}))
+        writer.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_decode_packed_sint64(self):
+
+        values = [0, 1, -1, 63, -64, 300, -300, 2 ** 31, -2 ** 31, 2 ** 62, -2 ** 62]
+        self.assertEqual(values, decode_packed_sint64(encode_sint64(values)).tolist())
+
+    def test_bounds_of_dense_nodes(self):
+
+        statistics_dict = read_pbf_statistics(self.osm_file)
+        self.assertEqual(f' {min(self.lons):.7f}', statistics_dict['lon min'])
+        self.assertEqual(f' {max(self.lons):.7f}', statistics_dict['lon max'])
+        self.assertEqual(f' {min(self.lats):.7f}', statistics_dict['lat min'])
+        self.assertEqual(f' {max(self.lats):.7f}', statistics_dict['lat max'])
+        self.assertEqual(' 200000', statistics_dict['nodes'])
+
+        # Parallel decoding gives the same result
+        self.assertEqual(statistics_dict, read_pbf_statistics(self.osm_file, processes=2))
+
+        lons = np.concatenate([lons for lons, _ in PbfReader(self.osm_file).iter_node_coordinates()])
+        self.assertEqual(200000, len(lons))
+
+    def test_header_bbox(self):
+
+        path = os.path.join(self.directory.name, 'header.osm.pbf')
+        header = osmium.io.Header()
+        header.add_box(osmium.osm.Box(osmium.osm.Location(8.0, 53.0), osmium.osm.Location(9.5, 54.5)))
+        writer = osmium.SimpleWriter(path, 4096 * 1024, header)
+        writer.add_node(osmium.osm.mutable.Node(id=1, location=(8.5, 53.5)))
+        writer.close()
+
+        self.assertEqual({'lon min': ' 8.0000000', 'lon max': ' 9.5000000',
+                          'lat min': ' 53.0000000', 'lat max': ' 54.5000000'}, read_pbf_statistics(path))
+        self.assertEqual(' 8.5000000', read_pbf_statistics(path, use_header_bbox=False)['lon max'])
+
+    def test_sorted_file_is_read_until_the_first_way(self):
+
+        def write(path: str, header: osmium.io.Header):
+            writer = osmium.SimpleWriter(path, 4096 * 1024, header)
+            for node_id in range(1, 10001):
+                writer.add_node(osmium.osm.mutable.Node(id=node_id, location=(8.5, 53.5)))
+            for way_id in range(1, 10001):
+                writer.add_way(osmium.osm.mutable.Way(id=way_id, nodes=[way_id, way_id + 1]))
+            writer.close()
+
+            # A data blob after the ways which can not be decoded
+            blob = b'\x1a\x04' + b'\xff' * 4
+            blob_header = b'\x0a\x07OSMData' + b'\x18' + bytes([len(blob)])
+            with open(path, 'ab') as f:
+                f.write(struct.pack('>I', len(blob_header)) + blob_header + blob)
+
+        sorted_header = osmium.io.Header()
+        sorted_header.set('sorting', 'Type_then_ID')
+        sorted_path = os.path.join(self.directory.name, 'sorted.osm.pbf')
+        write(sorted_path, sorted_header)
+        self.assertEqual(['Sort.Type_then_ID'], PbfReader(sorted_path).optional_features)
+
+        # The blobs after the first one with ways are not read, if the file declares to be sorted
+        self.assertEqual(' 8.5000000', read_pbf_statistics(sorted_path, use_header_bbox=False)['lon max'])
+        self.assertEqual(' 10000', read_pbf_statistics(sorted_path, use_header_bbox=False, processes=2)['nodes'])
+        self.assertEqual(10000, sum(len(lons) for lons, _ in PbfReader(sorted_path).iter_node_coordinates()))
+
+        unsorted_path = os.path.join(self.directory.name, 'unsorted.osm.pbf')
+        write(unsorted_path, osmium.io.Header())
+        self.assertEqual([], PbfReader(unsorted_path).optional_features)
+        with self.assertRaises(zlib.error):
+            read_pbf_statistics(unsorted_path, use_header_bbox=False)
+
+    def test_empty_file(self):
+
+        path = os.path.join(self.directory.name, 'empty.osm.pbf')
+        osmium.SimpleWriter(path).close()
+        self.assertEqual({}, read_pbf_statistics(path))
+
+    def test_benchmark_against_osmconvert(self):
+
+        if platform.system() != 'Linux':
+            self.skipTest('The benchmark uses the linux build of osmconvert')
+
+        osmconvert_path = os.path.join(self.directory.name, 'osmconvert')
+        shutil.copy(os.path.join('src', 'resources', 'osmconvert', 'osmconvert'), osmconvert_path)
+        os.chmod(osmconvert_path, os.stat(osmconvert_path).st_mode | stat.S_IEXEC)
+        try:
+            subprocess.run([osmconvert_path, '-h'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            self.skipTest('osmconvert can not be executed')
+
+        durations, results = {}, {}
+        for name, read_statistics in [
+                ('osmconvert', lambda: extract_osm_statistics(osmconvert_path, self.osm_file)),
+                ('PbfReader', lambda: read_pbf_statistics(self.osm_file))]:
+            start = time.perf_counter()
+            for _ in range(5):
+                results[name] = read_statistics()
+            durations[name] = (time.perf_counter() - start) / 5
+
+        for key in ['lon min', 'lon max', 'lat min', 'lat max']:
+            self.assertEqual(float(results['osmconvert'][key]), float(results['PbfReader'][key]))
+
+        # The decoding of the coordinates with NumPy is at least as fast as osmconvert on a single core
+        self.assertLess(durations['PbfReader'], durations['osmconvert'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import random
+import tempfile
+import unittest
+
+import osmium
+
+from src.preprocessor.JobScheduler import JobScheduler
+from src.preprocessor.MultiExtractSplitter import MultiExtractSplitter
+from src.preprocessor.Preprocessor import Preprocessor
+from src.preprocessor.TileObjectIndex import TileObjectIndex
+
+
+class TestPreprocessorJobs(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.working_directory = os.getcwd()
+        os.chdir(self.directory.name)
+
+        self.preprocessor = Preprocessor()
+        self.preprocessor.use_density_histogram = False
+        self.preprocessor.halo = 0
+        self.preprocessor.max_split_depth = 1
+
+        # Many nodes in the south west and a few nodes in the east
+        self.raw_file = os.path.join(self.preprocessor.path_to_raw, 'test.osm.pbf')
+        generator = random.Random(1)
+        writer = osmium.SimpleWriter(self.raw_file)
+        for node_id in range(1, 3001):
+            location = (generator.uniform(8.01, 8.24), generator.uniform(53.01, 53.24))
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=location))
+        for i in range(10):
+            writer.add_node(osmium.osm.mutable.Node(id=3001 + i, location=(8.6 + i * 0.03, 53.1 + i * 0.03)))
+        writer.add_way(osmium.osm.mutable.Way(id=1, nodes=[1, 2, 3], tags={'highway': 'residential'}))
+        writer.close()
+
+        # Only the sub file of the south west is larger than the threshold of 1 KB
+        self.preprocessor.max_split_size = 10 ** -6
+
+        self.west = (8.0, 53.0, 8.5, 53.5)
+        self.east = (8.5, 53.0, 9.0, 53.5)
+
+    def tearDown(self):
+        self.preprocessor.manifest.close()
+        self.preprocessor.statistics_cache.close()
+        os.chdir(self.working_directory)
+        self.directory.cleanup()
+
+    def preprocessed_path_of(self, bounding_box: tuple) -> str:
+        path = self.preprocessor.sub_file_name(self.raw_file, *bounding_box)
+        return os.path.join(self.preprocessor.path_to_preprocessed, os.path.basename(path))
+
+    def test_oversized_sub_file_is_split_into_quadrants(self):
+
+        preprocessor = self.preprocessor
+        west_path = preprocessor.sub_file_name(self.raw_file, *self.west)
+        quadrants = preprocessor.quadrants({}, self.west)
+
+        # The oversized sub file stays in the buffer as source of its quadrants, the other one is committed
+        jobs = preprocessor.split_file(('grid', self.raw_file, [self.west, self.east], 0))
+        self.assertEqual([('grid', west_path, quadrants, 1)], jobs)
+        self.assertTrue(os.path.exists(west_path))
+        self.assertEqual(('indexed', True), (preprocessor.job_ledger.get(west_path)['state'],
+                                             preprocessor.job_ledger.get(west_path)['split']))
+        self.assertEqual([self.preprocessed_path_of(self.east)], list(preprocessor.manifest.entries()))
+
+        for quadrant in quadrants:
+            entry = preprocessor.job_ledger.get(preprocessor.sub_file_name(west_path, *quadrant))
+            self.assertEqual(('planned', west_path, list(quadrant), 1),
+                             (entry['state'], entry['source'], entry['bounding_box'], entry['depth']))
+
+        # The south west quadrant is still oversized, but the depth limit is reached, so it is committed
+        self.assertEqual([], preprocessor.split_file(jobs[0]))
+        south_west = self.preprocessed_path_of(quadrants[0])
+        self.assertGreater(os.path.getsize(south_west), preprocessor.max_split_size * 10 ** 9)
+        entries = preprocessor.manifest.entries()
+        self.assertEqual(sorted([self.preprocessed_path_of(self.east), south_west]), sorted(entries))
+        self.assertEqual({'lon min': 8.0, 'lon max': 8.25, 'lat min': 53.0, 'lat max': 53.25},
+                         entries[south_west]['core'])
+
+        # The quadrants without nodes are not written
+        states = [preprocessor.job_ledger.get(preprocessor.sub_file_name(west_path, *quadrant))['state']
+                  for quadrant in quadrants]
+        self.assertEqual(['moved', 'removed', 'removed', 'removed'], states)
+
+        # Once all quadrants are extracted, the scheduler removes the intermediate file from the buffer
+        job_scheduler = JobScheduler(preprocessor, processes=1)
+        job_scheduler.push(jobs[0], self.raw_file)
+        job_scheduler.finish(jobs[0], self.raw_file)
+        self.assertFalse(os.path.exists(west_path))
+        self.assertEqual('removed', preprocessor.job_ledger.get(west_path)['state'])
+        self.assertEqual([], os.listdir(preprocessor.path_to_buffer))
+
+    def test_depth_limit(self):
+
+        # Without quadrant splits the oversized sub file is committed at once
+        self.preprocessor.max_split_depth = 0
+        self.assertEqual([], self.preprocessor.split_file(('grid', self.raw_file, [self.west, self.east], 0)))
+        self.assertEqual(sorted([self.preprocessed_path_of(self.west), self.preprocessed_path_of(self.east)]),
+                         sorted(self.preprocessor.manifest.entries()))
+        self.assertEqual([], os.listdir(self.preprocessor.path_to_buffer))
+
+        # The index of the ways and relations is moved along with the file
+        self.assertEqual([1], TileObjectIndex.load(self.preprocessed_path_of(self.west)).ids['w'].tolist())
+
+    def resume(self, **settings) -> dict:
+        # A new run continues the cache file and the ledger of the interrupted one
+        self.preprocessor.manifest.close()
+        self.preprocessor.statistics_cache.close()
+        self.preprocessor = Preprocessor(new_cache_file=False)
+        for name, value in settings.items():
+            setattr(self.preprocessor, name, value)
+        return self.preprocessor.resume_jobs()
+
+    def test_resume_interrupted_quadrant_split(self):
+
+        preprocessor = self.preprocessor
+        preprocessor.plan_sub_files([('grid', self.raw_file, [self.west, self.east], 0)])
+        preprocessor.job_ledger.set_state(self.raw_file, 'planned')
+        jobs = preprocessor.split_file(('grid', self.raw_file, [self.west, self.east], 0))
+        west_path = jobs[0][1]
+
+        # Interrupted while the quadrants were written, one of them partially
+        quadrant_paths = [preprocessor.sub_file_name(west_path, *quadrant) for quadrant in jobs[0][2]]
+        preprocessor.job_ledger.set_states(quadrant_paths, 'extracting')
+        for path in [MultiExtractSplitter.partial_path_of(quadrant_paths[0]), quadrant_paths[1],
+                     os.path.join(preprocessor.path_to_buffer, 'unknown.osm.pbf')]:
+            with open(path, 'wb') as f:
+                f.write(b'partial')
+
+        # The quadrants of the sub file in the buffer are extracted again, they belong to the raw file
+        open_jobs = self.resume()
+        self.assertEqual([self.raw_file], list(open_jobs))
+        (kind, source_path, bounding_boxes, depth), = open_jobs[self.raw_file]
+        self.assertEqual(('grid', west_path, sorted(jobs[0][2]), 1), (kind, source_path, sorted(bounding_boxes), depth))
+        self.assertEqual([os.path.basename(west_path)], os.listdir(self.preprocessor.path_to_buffer))
+
+        # Interrupted after the quadrants were extracted, but before the sub file was removed
+        self.assertEqual([], self.preprocessor.split_file(open_jobs[self.raw_file][0]))
+        self.assertEqual({self.raw_file: []}, self.resume())
+        self.assertEqual('removed', self.preprocessor.job_ledger.get(west_path)['state'])
+        self.assertEqual([], os.listdir(self.preprocessor.path_to_buffer))
+
+    def test_resume_interrupted_cells(self):
+
+        preprocessor = self.preprocessor
+        preprocessor.use_single_pass_splitter = False
+        preprocessor.plan_sub_files([('cell', self.raw_file, self.west, 0), ('cell', self.raw_file, self.east, 0)])
+        preprocessor.job_ledger.set_state(self.raw_file, 'planned')
+        west_path = preprocessor.sub_file_name(self.raw_file, *self.west)
+        east_path = preprocessor.sub_file_name(self.raw_file, *self.east)
+
+        # The west cell was extracted, the east cell was written partially
+        with open(self.raw_file, 'rb') as raw, open(west_path, 'wb') as f:
+            f.write(raw.read())
+        preprocessor.job_ledger.set_state(west_path, 'extracted')
+        preprocessor.job_ledger.set_state(east_path, 'extracting')
+        with open(east_path, 'wb') as f:
+            f.write(b'partial')
+
+        # The planning of another raw file was interrupted, it is processed from the start
+        other_raw_file = os.path.join(preprocessor.path_to_raw, 'other.osm.pbf')
+        preprocessor.plan_sub_files([('cell', other_raw_file, self.west, 0)])
+        other_path = preprocessor.sub_file_name(other_raw_file, *self.west)
+        with open(other_path, 'wb') as f:
+            f.write(b'partial')
+
+        open_jobs = self.resume(use_single_pass_splitter=False)
+        self.assertEqual({self.raw_file: [('check', west_path, self.raw_file, 0),
+                                          ('cell', self.raw_file, self.east, 0)]}, open_jobs)
+        self.assertEqual([os.path.basename(west_path)], os.listdir(self.preprocessor.path_to_buffer))
+
+
+if __name__ == '__main__':
+    unittest.main()
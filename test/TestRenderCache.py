@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import osmium
+
+from src.core.MapGenerator import Generator
+from src.core.RenderCache import RenderCache
+
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.working_directory = os.getcwd()
+
+        path_to_preprocessed = os.path.join(self.directory.name, 'src', 'resources', 'latest', 'preprocessed')
+        os.makedirs(path_to_preprocessed)
+        shutil.copytree(os.path.join('src', 'resources', 'themes'),
+                        os.path.join(self.directory.name, 'src', 'resources', 'themes'))
+
+        self.pbf_file_path = os.path.join(path_to_preprocessed, 'test.osm.pbf')
+        writer = osmium.SimpleWriter(self.pbf_file_path)
+        for node_id, location in enumerate([(8.0, 53.0), (8.01, 53.01), (8.02, 53.0), (8.03, 53.03)], start=1):
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=location))
+        writer.add_way(osmium.osm.mutable.Way(id=1, nodes=[1, 2, 3, 1], tags={'landuse': 'meadow'}))
+        writer.add_way(osmium.osm.mutable.Way(id=2, nodes=[1, 4], tags={'highway': 'residential'}))
+        writer.close()
+
+        with open(os.path.join(path_to_preprocessed, 'cache_file_1.json'), 'w') as f:
+            json.dump({'resources/preprocessed/test.osm.pbf': {'lon min': ' 7.9', 'lon max': ' 8.1',
+                                                               'lat min': ' 52.9', 'lat max': ' 53.1'}}, f)
+
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.working_directory)
+        self.directory.cleanup()
+
+    def test_key(self):
+
+        render_cache = RenderCache('cache', precision=3)
+        bbox_dict = {'lon min': 8.0, 'lon max': 8.02, 'lat min': 53.0, 'lat max': 53.02}
+        key = render_cache.key(bbox_dict, 'default', 100, 4, [self.pbf_file_path])
+
+        # Differences below the precision share the image
+        moved = {**bbox_dict, 'lon min': 8.0001}
+        self.assertEqual(key, render_cache.key(moved, 'default', 100, 4, [self.pbf_file_path]))
+
+        self.assertNotEqual(key, render_cache.key(bbox_dict, 'black_and_white', 100, 4, [self.pbf_file_path]))
+        self.assertNotEqual(key, render_cache.key(bbox_dict, 'default', 200, 4, [self.pbf_file_path]))
+        self.assertNotEqual(key, render_cache.key(bbox_dict, 'default', 100, 6, [self.pbf_file_path]))
+        self.assertNotEqual(key, render_cache.key(bbox_dict, 'default', 100, 4, [self.pbf_file_path],
+                                                  {'level_of_detail': False}))
+
+    def test_repeated_maps_are_not_rendered(self):
+
+        generator = Generator(53.01, 8.01, 500)
+        _, bbox_dict = generator.bounding_box()
+        self.assertEqual(os.path.abspath(os.path.join('src', 'resources', 'render_cache')),
+                         generator.render_cache.path)
+
+        image = generator.render_image(bbox_dict, dpi=20, size=4)
+        self.assertTrue(image.startswith(b'\x89PNG'))
+
+        def plot_map(*args):
+            raise AssertionError('The map was rendered again')
+
+        generator.plot_map = plot_map
+        self.assertEqual(image, generator.render_image(bbox_dict, dpi=20, size=4))
+        self.assertEqual(1, generator.render_cache.statistics()['hits'])
+
+        # A changed file invalidates the map
+        stat = os.stat(self.pbf_file_path)
+        os.utime(self.pbf_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        with self.assertRaises(AssertionError):
+            generator.render_image(bbox_dict, dpi=20, size=4)
+
+    def test_changed_settings_are_rendered_again(self):
+
+        generator = Generator(53.01, 8.01, 500)
+        _, bbox_dict = generator.bounding_box()
+        generator.render_image(bbox_dict, dpi=20, size=4)
+
+        def plot_map(*args):
+            raise AssertionError('The map was rendered again')
+
+        generator.plot_map = plot_map
+        for name, value in [('style_layers', ('roads',)), ('level_of_detail', False), ('use_tile_pyramid', False),
+                            ('pyramid_zooms', (10, 12)), ('use_layer_store', False)]:
+            previous = getattr(generator, name)
+            setattr(generator, name, value)
+            with self.assertRaises(AssertionError, msg=name):
+                generator.render_image(bbox_dict, dpi=20, size=4)
+            setattr(generator, name, previous)
+
+    def test_changed_theme_is_rendered_again(self):
+
+        path = os.path.join('src', 'resources', 'themes', 'test_roads.json')
+        with open(path, 'w') as f:
+            json.dump({'extends': 'default', 'colors': {'roads': '#202020'}}, f)
+
+        generator = Generator(53.01, 8.01, 500, 'test_roads')
+        _, bbox_dict = generator.bounding_box()
+        image = generator.render_image(bbox_dict, dpi=20, size=4)
+
+        # The theme keeps its name, but its colors change
+        with open(path, 'w') as f:
+            json.dump({'extends': 'default', 'colors': {'roads': '#ff0000'}}, f)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        generator = Generator(53.01, 8.01, 500, 'test_roads')
+        self.assertNotEqual(image, generator.render_image(bbox_dict, dpi=20, size=4))
+        self.assertEqual(0, generator.render_cache.statistics()['hits'])
+
+
+if __name__ == '__main__':
+    unittest.main()
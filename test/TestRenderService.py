@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.server.RenderService import RenderService, parse_render_request
+
+
+def slow_render(bbox: tuple, style: str, dpi: int, size: float) -> bytes:
+    time.sleep(0.3)
+    return f'{bbox} {style} {dpi}'.encode('utf-8')
+
+
+class TestRenderService(unittest.TestCase):
+
+    async def request(self, port: int, path: str) -> tuple:
+
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+
+        head, body = response.split(b'\r\n\r\n', 1)
+        lines = head.decode('latin-1').split('\r\n')
+        headers = dict(line.split(': ', 1) for line in lines[1:])
+        return int(lines[0].split()[1]), headers, body
+
+    def test_parse_render_request(self):
+
+        self.assertEqual(((8.0, 53.0, 8.1, 53.1), 'black_and_white', 150),
+                         parse_render_request({'bbox': ['8.0,53.0,8.1,53.1'], 'style': ['black_and_white'],
+                                               'dpi': ['150']}))
+        bbox, style, dpi = parse_render_request({'lat': ['53.0'], 'lon': ['8.0'], 'dis': ['500']})
+        self.assertAlmostEqual(53.0, (bbox[1] + bbox[3]) / 2)
+        self.assertEqual(('default', 300), (style, dpi))
+        for query in [{'bbox': ['8.1,53.0,8.0,53.1']}, {'lat': ['53.0']}, {'bbox': ['8,53,9,54'], 'dpi': ['0']}]:
+            with self.assertRaises(ValueError):
+                parse_render_request(query)
+
+    def test_coalescing_and_backpressure(self):
+
+        async def scenario():
+
+            service = RenderService(port=0, workers=1, max_pending=1, render_function=slow_render,
+                                    executor=ThreadPoolExecutor(max_workers=1))
+            await service.start()
+            try:
+                same = '/render?bbox=8.0,53.0,8.1,53.1&dpi=100'
+                other = '/render?bbox=9.0,53.0,9.1,53.1&dpi=100'
+
+                first = asyncio.create_task(self.request(service.port, same))
+                await asyncio.sleep(0.05)
+                responses = await asyncio.gather(first, self.request(service.port, same),
+                                                 self.request(service.port, other))
+
+                (status_first, headers_first, body_first), (status_same, headers_same, body_same), rejected = responses
+                self.assertEqual((200, 'rendered'), (status_first, headers_first['X-Render']))
+                self.assertEqual((200, 'coalesced'), (status_same, headers_same['X-Render']))
+                self.assertEqual(body_first, body_same)
+                self.assertEqual(b"(8.0, 53.0, 8.1, 53.1) default 100", body_first)
+                self.assertEqual(429, rejected[0])
+                self.assertGreaterEqual(int(rejected[1]['Retry-After']), 1)
+
+                # Once the render is finished, the other map is accepted
+                self.assertEqual(200, (await self.request(service.port, other))[0])
+
+                status, _, body = await self.request(service.port, '/statistics')
+                statistics = json.loads(body)
+                self.assertEqual((200, 2, 1, 1, 0), (status, statistics['renders'], statistics['coalesced'],
+                                                     statistics['rejected'], statistics['pending']))
+                self.assertEqual(400, (await self.request(service.port, '/render?bbox=1,2'))[0])
+            finally:
+                await service.stop()
+
+        asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
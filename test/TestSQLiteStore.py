@@ -0,0 +1,46 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from src.common.SQLiteStore import SQLiteStore
+
+
+class ValueStore(SQLiteStore):
+
+    schema = ('CREATE TABLE IF NOT EXISTS store_values (value INTEGER)',)
+
+
+class TestSQLiteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'stores', 'values.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_connection_per_process(self):
+
+        store = ValueStore(self.path)
+        connection = store.connection()
+        with connection:
+            connection.execute('INSERT INTO store_values VALUES (1)')
+        self.assertIs(connection, store.connection())
+        self.assertEqual('wal', connection.execute('PRAGMA journal_mode').fetchone()[0])
+
+        # Only the arguments are pickled, the copy opens its own connection to the same database
+        copy = pickle.loads(pickle.dumps(store))
+        self.assertIsNone(copy._connection)
+        self.assertEqual([(1,)], copy.connection().execute('SELECT value FROM store_values').fetchall())
+        copy.close()
+
+        # In a forked worker the connection of the parent is not used
+        store._pid = -1
+        self.assertIsNot(connection, store.connection())
+        store.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import os
+import random
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from src.common.SpatialIndex import SpatialIndex, load_spatial_index, index_path_of
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    tile_count = 50000
+
+    def create_tiles(self, count: int) -> dict:
+
+        random.seed(42)
+        tiles = {}
+        for i in range(count):
+            lon_min = random.uniform(-180.0, 170.0)
+            lat_min = random.uniform(-90.0, 80.0)
+            tiles[f'resources/preprocessed/tile_{i}.osm.pbf'] = {
+                'lon min': f' {lon_min:.7f}',
+                'lon max': f' {lon_min + random.uniform(0.01, 10.0):.7f}',
+                'lat min': f' {lat_min:.7f}',
+                'lat max': f' {lat_min + random.uniform(0.01, 10.0):.7f}'
+            }
+
+        return tiles
+
+    @staticmethod
+    def brute_force(tiles: dict, bbox: list):
+
+        found = None
+        found_area = None
+        for key, value in tiles.items():
+            lon_min, lon_max = float(value['lon min']), float(value['lon max'])
+            lat_min, lat_max = float(value['lat min']), float(value['lat max'])
+            if lon_min <= bbox[0] and bbox[1] <= lon_max and lat_min <= bbox[2] and bbox[3] <= lat_max:
+                area = (lon_max - lon_min) * (lat_max - lat_min)
+                if found is None or area < found_area:
+                    found, found_area = key, area
+
+        return found
+
+    def test_smallest_covering(self):
+
+        tiles = self.create_tiles(5000)
+        keys = list(tiles.keys())
+        boxes = np.array([[float(tiles[k]['lon min']), float(tiles[k]['lon max']),
+                           float(tiles[k]['lat min']), float(tiles[k]['lat max'])] for k in keys])
+        spatial_index = SpatialIndex.build(keys, boxes)
+
+        for _ in range(200):
+            lon, lat = random.uniform(-175.0, 175.0), random.uniform(-85.0, 85.0)
+            bbox = [lon - 0.01, lon + 0.01, lat - 0.01, lat + 0.01]
+            self.assertEqual(self.brute_force(tiles, bbox), spatial_index.smallest_covering(*bbox))
+
+            covering = spatial_index.smallest_covering(*bbox)
+            if covering is not None:
+                self.assertIn(covering, spatial_index.intersecting(*bbox))
+
+    def test_persistence_and_reload(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            cache_file = os.path.join(directory, 'cache_file_20250101000000.json')
+            tiles = self.create_tiles(self.tile_count)
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(tiles, f)
+
+            spatial_index = load_spatial_index(cache_file)
+            self.assertTrue(os.path.exists(index_path_of(cache_file)))
+            self.assertIs(spatial_index, load_spatial_index(cache_file))
+
+            # A lookup on a planet sized cache file takes less than a millisecond
+            start_time = time.perf_counter()
+            for _ in range(1000):
+                spatial_index.smallest_covering(8.64, 8.66, 53.12, 53.13)
+            self.assertLess((time.perf_counter() - start_time) / 1000, 0.001)
+
+            # Changed cache file -> index is rebuilt
+            tiles['resources/preprocessed/new.osm.pbf'] = {
+                'lon min': '8.6', 'lon max': '8.7', 'lat min': '53.1', 'lat max': '53.2'}
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(tiles, f)
+
+            reloaded = load_spatial_index(cache_file)
+            self.assertIsNot(spatial_index, reloaded)
+            self.assertEqual('resources/preprocessed/new.osm.pbf',
+                             reloaded.smallest_covering(8.64, 8.66, 53.12, 53.13))
+
+    def test_tile_of_core_and_halo(self):
+
+        # 2x2 sub files with a halo of 0.1 degree around their cores and a file without core
+        tiles = {}
+        for lon_min in [8.0, 8.5]:
+            for lat_min in [53.0, 53.5]:
+                core = {'lon min': lon_min, 'lon max': lon_min + 0.5, 'lat min': lat_min, 'lat max': lat_min + 0.5}
+                halo = {'lon min': lon_min - 0.1, 'lon max': lon_min + 0.6,
+                        'lat min': lat_min - 0.1, 'lat max': lat_min + 0.6}
+                tiles[f'tile_{lon_min}_{lat_min}.osm.pbf'] = dict(halo, core=core, halo=halo)
+        tiles['island.osm.pbf'] = {'lon min': 10.0, 'lon max': 10.2, 'lat min': 54.0, 'lat max': 54.2}
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            cache_file = os.path.join(directory, 'cache_file_20250101000000.json')
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(tiles, f)
+
+            for spatial_index in [load_spatial_index(cache_file), SpatialIndex.load(
+                    index_path_of(cache_file), os.stat(cache_file).st_mtime_ns, os.stat(cache_file).st_size)]:
+
+                # Crosses the core border at 8.5, the core of the western tile contains the center
+                self.assertEqual('tile_8.0_53.0.osm.pbf', spatial_index.tile_of(8.42, 8.55, 53.2, 53.3))
+                self.assertEqual('tile_8.5_53.0.osm.pbf', spatial_index.tile_of(8.45, 8.58, 53.2, 53.3))
+                # Crosses the corner of all four cores
+                self.assertEqual('tile_8.5_53.5.osm.pbf', spatial_index.tile_of(8.45, 8.56, 53.45, 53.56))
+                # Larger than the halo, the files are stitched
+                self.assertIsNone(spatial_index.tile_of(8.3, 8.7, 53.2, 53.3))
+                self.assertEqual(['tile_8.0_53.0.osm.pbf', 'tile_8.5_53.0.osm.pbf'],
+                                 sorted(spatial_index.intersecting(8.3, 8.7, 53.2, 53.3)))
+                # Without core the bounds of the file are used
+                self.assertEqual('island.osm.pbf', spatial_index.tile_of(10.05, 10.1, 54.05, 54.1))
+                self.assertIsNone(spatial_index.tile_of(10.1, 10.3, 54.05, 54.1))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from src.common.StatisticsCache import StatisticsCache
+from src.common.Utilities import extract_osm_statistics
+
+
+class TestStatisticsCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        # Stand-in for osmconvert, which counts its executions
+        self.counter = os.path.join(self.directory.name, 'counter')
+        self.osm_convert_path = os.path.join(self.directory.name, 'osmconvert')
+        with open(self.osm_convert_path, 'w') as f:
+            f.write(f'#!/bin/sh\necho x >> {self.counter}\n'
+                    f'printf "lon min: 8.0000000\\nlon max: 9.0000000\\nlat min: 53.0000000\\nlat max: 54.0000000\\n"\n')
+        os.chmod(self.osm_convert_path, os.stat(self.osm_convert_path).st_mode | stat.S_IEXEC)
+
+        self.osm_file = os.path.join(self.directory.name, 'test.osm.pbf')
+        with open(self.osm_file, 'wb') as f:
+            f.write(b'test')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def executions(self) -> int:
+        if not os.path.exists(self.counter):
+            return 0
+        with open(self.counter) as f:
+            return len(f.readlines())
+
+    def test_unchanged_file_is_scanned_once(self):
+
+        path = os.path.join(self.directory.name, 'statistics_cache.sqlite')
+        statistics_cache = StatisticsCache(path)
+
+        first = extract_osm_statistics(self.osm_convert_path, self.osm_file, statistics_cache)
+        second = extract_osm_statistics(self.osm_convert_path, self.osm_file, statistics_cache)
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.executions())
+        self.assertEqual((8.0, 9.0, 53.0, 54.0), statistics_cache.bounding_box(self.osm_file))
+
+        # Shared through the database with other processes and runs
+        self.assertEqual(first, StatisticsCache(path).get(self.osm_file))
+
+        # Changed file is scanned again
+        with open(self.osm_file, 'ab') as f:
+            f.write(b'changed')
+        extract_osm_statistics(self.osm_convert_path, self.osm_file, statistics_cache)
+        self.assertEqual(2, self.executions())
+        statistics_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
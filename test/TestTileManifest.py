@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+import unittest
+from multiprocessing import Pool
+
+from src.common.TileManifest import TileManifest
+
+
+def append_entries(args):
+    manifest, worker, count = args
+    for i in range(count):
+        manifest.append(f'resources/preprocessed/tile_{worker}_{i}.osm.pbf',
+                        {'lon min': str(i), 'lon max': str(i + 1), 'lat min': str(worker), 'lat max': str(worker + 1)})
+
+
+class TestTileManifest(unittest.TestCase):
+
+    def test_concurrent_writes_and_export(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            manifest = TileManifest(os.path.join(directory, 'cache_file_20250101000000.sqlite'))
+            manifest.append('resources/preprocessed/first.osm.pbf',
+                            {'lon min': '0', 'lon max': '1', 'lat min': '0', 'lat max': '1'})
+
+            with Pool(processes=4) as pool:
+                pool.map(append_entries, [(manifest, worker, 250) for worker in range(8)])
+
+            self.assertEqual(8 * 250 + 1, len(manifest))
+
+            cache_file = os.path.join(directory, 'cache_file_20250101000000.json')
+            manifest.export_json(cache_file)
+            manifest.compact()
+
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            self.assertEqual(8 * 250 + 1, len(data))
+            self.assertEqual('resources/preprocessed/first.osm.pbf', next(iter(data)))
+            self.assertEqual({'lon min': '3', 'lon max': '4', 'lat min': '7', 'lat max': '8'},
+                             data['resources/preprocessed/tile_7_3.osm.pbf'])
+            manifest.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import osmium
+
+from src.preprocessor.TileObjectIndex import TileObjectIndex, replace_with_index
+
+
+class TestTileObjectIndex(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.osm_file = os.path.join(self.directory.name, 'test.osm.pbf')
+
+        writer = osmium.SimpleWriter(self.osm_file)
+        writer.add_node(osmium.osm.mutable.Node(id=1, location=(8.1, 53.1)))
+        writer.add_node(osmium.osm.mutable.Node(id=2, location=(8.2, 53.2)))
+        for way_id in [7, 3, 5]:
+            writer.add_way(osmium.osm.mutable.Way(id=way_id, nodes=[1, 2], tags={'highway': 'path'}))
+        writer.add_relation(osmium.osm.mutable.Relation(id=3, members=[('w', 3, '')], tags={'type': 'route'}))
+        writer.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_contains(self):
+
+        index = TileObjectIndex.build(self.osm_file)
+        self.assertEqual([True, False, True, True, False], index.contains('w', np.array([3, 4, 5, 7, 8])).tolist())
+        self.assertEqual([False, True], index.contains('r', np.array([1, 3])).tolist())
+        self.assertEqual([False], TileObjectIndex([], []).contains('w', np.array([3])).tolist())
+
+    def test_outdated_index_is_not_loaded(self):
+
+        self.assertIsNone(TileObjectIndex.load(self.osm_file))
+        TileObjectIndex.load_or_build(self.osm_file)
+        self.assertEqual([3, 5, 7], TileObjectIndex.load(self.osm_file).ids['w'].tolist())
+
+        # The index stays valid, when the file is moved along with it
+        target_path = os.path.join(self.directory.name, 'moved.osm.pbf')
+        replace_with_index(self.osm_file, target_path)
+        self.assertEqual([3], TileObjectIndex.load(target_path).ids['r'].tolist())
+
+        os.utime(target_path, ns=(0, 0))
+        self.assertIsNone(TileObjectIndex.load(target_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
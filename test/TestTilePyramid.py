@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import osmium
+
+from src.core.MapGenerator import Generator
+from src.core.TilePyramid import TilePyramid, level_for, pixel_width_of, pyramid_path_of
+
+
+class TestTilePyramid(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.pbf_file_path = os.path.join(self.directory.name, 'test.osm.pbf')
+
+        writer = osmium.SimpleWriter(self.pbf_file_path)
+        locations = [(8.0, 53.0), (8.01, 53.01), (8.02, 53.0), (8.03, 53.03), (8.04, 53.0), (8.04, 53.03),
+                     (8.0001, 53.0), (8.0001, 53.0001), (8.0, 53.0001)]
+        for node_id, location in enumerate(locations, start=1):
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=location))
+        writer.add_way(osmium.osm.mutable.Way(id=1, nodes=[1, 2, 3, 1], tags={'landuse': 'meadow'}))
+        writer.add_way(osmium.osm.mutable.Way(id=2, nodes=[1, 4], tags={'highway': 'residential'}))
+        writer.add_way(osmium.osm.mutable.Way(id=3, nodes=[5, 6], tags={'highway': 'primary'}))
+        writer.add_way(osmium.osm.mutable.Way(id=4, nodes=[1, 7, 8, 9, 1], tags={'building': 'yes'}))
+        writer.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_level_for(self):
+
+        self.assertEqual(12, level_for(pixel_width_of(12), [8, 10, 12]))
+        self.assertEqual(10, level_for(pixel_width_of(9), [8, 10, 12]))
+        self.assertIsNone(level_for(pixel_width_of(13), [8, 10, 12]))
+
+    def test_levels(self):
+
+        levels = {8: {'roads': ['primary'], 'landuse': None}, 16: {'roads': None, 'buildings': None}}
+        paths = TilePyramid(self.pbf_file_path, levels).build()
+        self.assertEqual([pyramid_path_of(self.pbf_file_path, 8), pyramid_path_of(self.pbf_file_path, 16)], paths)
+        self.assertEqual(os.path.join(self.directory.name, 'pyramid', 'test.z8.npz'), paths[0])
+
+        # Only the primary road and the landuse are kept on the low level
+        low = TilePyramid.load_level(self.pbf_file_path, 8)
+        self.assertEqual({'roads', 'landuse'}, set(low))
+        self.assertEqual([3], list(low['roads']['id']))
+        self.assertEqual(['primary'], list(low['roads']['highway']))
+        self.assertEqual('EPSG:4326', low['landuse'].crs.to_string())
+
+        # The building of about 7 meters is larger than a pixel on zoom 16
+        high = TilePyramid.load_level(self.pbf_file_path, 16)
+        self.assertEqual([2, 3], sorted(high['roads']['id']))
+        self.assertEqual(['yes'], list(high['buildings']['building']))
+        self.assertIsNone(TilePyramid.load_level(self.pbf_file_path, 12))
+
+        # A changed file makes the levels outdated
+        stat = os.stat(self.pbf_file_path)
+        os.utime(self.pbf_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(TilePyramid.load_level(self.pbf_file_path, 8))
+
+    def test_generator_reads_the_matching_level(self):
+
+        TilePyramid(self.pbf_file_path, {12: {'roads': None}}).build()
+        generator = Generator(53.015, 8.02, 0)
+        bbox_dict = {'lon min': 7.5, 'lon max': 8.5, 'lat min': 52.8, 'lat max': 53.2}
+
+        self.assertEqual(12, generator.pyramid_level(self.pbf_file_path, bbox_dict, 1000))
+        # Too much detail for the pyramid
+        self.assertIsNone(generator.pyramid_level(self.pbf_file_path, bbox_dict, 100000))
+
+        layers = generator.load_layers(self.pbf_file_path, [7.5, 52.8, 8.5, 53.2], ('roads', 'landuse'), zoom=12)
+        self.assertEqual([2, 3], sorted(layers['roads']['id']))
+        self.assertIsNone(layers['landuse'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from src.server.TileServer import TileServer, tile_bounds
+
+
+class CountingRenderer:
+    """Renders every tile as its coordinates and counts the renderings."""
+
+    def __init__(self):
+        self.renderings = 0
+        self.data_version = 'v1'
+
+    def version(self, z: int, x: int, y: int) -> str:
+        return self.data_version
+
+    def render(self, z: int, x: int, y: int) -> bytes | None:
+        self.renderings += 1
+        return None if x == 0 else f'{z}/{x}/{y}@{self.data_version}'.encode('utf-8')
+
+
+class TestTileServer(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.renderer = CountingRenderer()
+        self.tile_server = TileServer(port=0, memory_tiles=1, renderer=self.renderer,
+                                      path_to_tile_cache=os.path.join(self.directory.name, 'tiles'))
+        threading.Thread(target=self.tile_server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.tile_server.shutdown()
+        self.directory.cleanup()
+
+    def request(self, path: str):
+        with urllib.request.urlopen(f'{self.tile_server.address}{path}') as response:
+            return response.read(), response.headers.get('X-Tile-Cache')
+
+    def test_tile_bounds(self):
+
+        self.assertEqual({'lon min': -180.0, 'lon max': 180.0, 'lat min': -85.0511287798066,
+                          'lat max': 85.0511287798066}, tile_bounds(0, 0, 0))
+        bounds = tile_bounds(12, 2144, 1323)
+        self.assertAlmostEqual(8.4375, bounds['lon min'])
+        self.assertAlmostEqual(53.5403074, bounds['lat min'], places=6)
+
+    def test_two_level_cache(self):
+
+        self.assertEqual((b'12/2144/1323@v1', 'render'), self.request('/12/2144/1323.png'))
+        self.assertEqual((b'12/2144/1323@v1', 'memory'), self.request('/12/2144/1323.png'))
+
+        # The first tile is evicted from the memory, but is still on the disk
+        self.request('/12/2145/1323.png')
+        self.assertEqual((b'12/2144/1323@v1', 'disk'), self.request('/12/2144/1323.png'))
+        self.assertEqual(2, self.renderer.renderings)
+
+        for path in ['/12/0/1323.png', '/1/2/0.png', '/tiles']:
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                self.request(path)
+            self.assertEqual(404, context.exception.code)
+
+        statistics = json.loads(self.request('/statistics')[0])
+        self.assertEqual({'memory': 1, 'disk': 1, 'render': 2, 'missing': 1}, statistics['tiles'])
+        self.assertEqual(5, statistics['latency']['count'])
+        self.assertLessEqual(statistics['latency']['p50'], statistics['latency']['p99'])
+
+    def test_updated_data_is_rendered_again(self):
+
+        self.assertEqual((b'12/2144/1323@v1', 'render'), self.request('/12/2144/1323.png'))
+
+        # A restarted server serves the tile from the disk, as long as the data is unchanged
+        self.tile_server.shutdown()
+        self.tile_server = TileServer(port=0, memory_tiles=1, renderer=self.renderer,
+                                      path_to_tile_cache=os.path.join(self.directory.name, 'tiles'))
+        threading.Thread(target=self.tile_server.serve_forever, daemon=True).start()
+        self.assertEqual((b'12/2144/1323@v1', 'disk'), self.request('/12/2144/1323.png'))
+
+        # Neither the memory nor the disk serve the tile of the outdated data
+        self.renderer.data_version = 'v2'
+        self.assertEqual((b'12/2144/1323@v2', 'render'), self.request('/12/2144/1323.png'))
+        self.assertEqual((b'12/2144/1323@v2', 'memory'), self.request('/12/2144/1323.png'))
+        self.assertEqual(2, self.renderer.renderings)
+
+    def test_requests_of_a_tile_wait_for_the_same_render(self):
+
+        release = threading.Event()
+        render = self.renderer.render
+        self.renderer.render = lambda z, x, y: release.wait(5) and render(z, x, y)
+        self.tile_server.render_function = self.renderer.render
+
+        threads = [threading.Thread(target=self.request, args=('/12/2144/1323.png',)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while not self.tile_server._in_flight:
+            release.wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, self.renderer.renderings)
+        self.assertEqual(3, json.loads(self.request('/statistics')[0])['latency']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import glob
+import json
+import os
+import tempfile
+import unittest
+
+import osmium
+
+from src.preprocessor.Preprocessor import Preprocessor
+from src.preprocessor.TileObjectIndex import TileObjectIndex
+from src.preprocessor.TileUpdater import TileUpdater
+
+CHANGE_FILE = """<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6" generator="test">
+<modify>
+<way id="11" version="2" timestamp="2025-01-01T00:00:00Z" uid="1" user="a" changeset="5">
+<nd ref="3"/><nd ref="4"/><tag k="highway" v="trunk"/></way>
+<way id="12" version="2" timestamp="2025-01-01T00:00:00Z" uid="1" user="a" changeset="5">
+<nd ref="2"/><nd ref="3"/><tag k="highway" v="primary"/></way>
+<relation id="20" version="2" timestamp="2025-01-01T00:00:00Z" uid="1" user="a" changeset="5">
+<member type="way" ref="11" role=""/><tag k="type" v="route"/><tag k="name" v="B 1"/></relation>
+</modify>
+<create>
+<way id="13" version="1" timestamp="2025-01-01T00:00:00Z" uid="1" user="a" changeset="5">
+<nd ref="4"/><nd ref="5"/><tag k="highway" v="service"/></way>
+</create>
+<delete>
+<node id="6" version="2" timestamp="2025-01-01T00:00:00Z" uid="1" user="a" changeset="5"/>
+</delete>
+</osmChange>
+"""
+
+
+class TestTileUpdater(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.working_directory = os.getcwd()
+        os.chdir(self.directory.name)
+
+        # Two tiles, the way 12 crosses their border, the change file holds none of the nodes of the changed ways
+        self.path_to_preprocessed = os.path.join('src', 'preprocessor', 'resources', 'preprocessed')
+        os.makedirs(self.path_to_preprocessed)
+        self.west = os.path.join(self.path_to_preprocessed, 'west.osm.pbf')
+        self.east = os.path.join(self.path_to_preprocessed, 'east.osm.pbf')
+
+        writer = osmium.SimpleWriter(self.west)
+        for node_id, location in [(1, (8.1, 53.1)), (2, (8.2, 53.2)), (6, (8.15, 53.15))]:
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=location))
+        writer.add_way(osmium.osm.mutable.Way(id=10, nodes=[1, 2], tags={'highway': 'residential'}))
+        writer.add_way(osmium.osm.mutable.Way(id=12, nodes=[2, 3], tags={'highway': 'secondary'}))
+        writer.close()
+
+        writer = osmium.SimpleWriter(self.east)
+        for node_id, location in [(3, (8.6, 53.2)), (4, (8.7, 53.3)), (5, (8.8, 53.4))]:
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=location))
+        writer.add_way(osmium.osm.mutable.Way(id=11, nodes=[3, 4], tags={'highway': 'primary'}))
+        writer.add_way(osmium.osm.mutable.Way(id=12, nodes=[2, 3], tags={'highway': 'secondary'}))
+        writer.add_relation(osmium.osm.mutable.Relation(id=20, members=[('w', 11, '')], tags={'type': 'route'}))
+        writer.close()
+
+        self.change_file = 'change.osc'
+        with open(self.change_file, 'w') as f:
+            f.write(CHANGE_FILE)
+
+    def tearDown(self):
+        os.chdir(self.working_directory)
+        self.directory.cleanup()
+
+    @staticmethod
+    def objects_of(path: str) -> dict:
+        return {(osm_object.type_str(), osm_object.id): {tag.k: tag.v for tag in osm_object.tags}
+                for osm_object in osmium.FileProcessor(path)}
+
+    def affected_files(self) -> dict:
+        entries = {
+            self.west: {'lon min': '8.0', 'lon max': '8.5', 'lat min': '53.0', 'lat max': '53.5'},
+            self.east: {'lon min': '8.5', 'lon max': '9.0', 'lat min': '53.0', 'lat max': '53.5'},
+        }
+        return {path: sorted(changes, key=lambda change: ('nwr'.index(change[0]), change[1]))
+                for path, changes in TileUpdater(self.change_file, entries).affected_files().items()}
+
+    def test_changes_without_located_nodes(self):
+
+        # Tag changes are located by the current copies, the deleted node and the new way in the files of their
+        # changeset
+        self.assertEqual({self.west: [('n', 6), ('w', 12)],
+                          self.east: [('w', 11), ('w', 12), ('w', 13), ('r', 20)]}, self.affected_files())
+
+        # The missing indexes of the files were built and stored
+        self.assertEqual(([10, 12], []), tuple(TileObjectIndex.load(self.west).ids[object_type].tolist()
+                                               for object_type in ['w', 'r']))
+        self.assertEqual(([11, 12], [20]), tuple(TileObjectIndex.load(self.east).ids[object_type].tolist()
+                                                 for object_type in ['w', 'r']))
+
+    def test_ways_are_located_by_the_index(self):
+
+        # The stored index is used instead of the ways of the file
+        TileObjectIndex([10], []).save(self.west)
+        affected = self.affected_files()
+        self.assertEqual([('w', 11), ('w', 12), ('w', 13), ('r', 20)], affected[self.east])
+        self.assertNotIn(self.west, affected)
+
+        # An outdated index is built again
+        os.utime(self.west, ns=(0, 0))
+        self.assertEqual([('n', 6), ('w', 12)], self.affected_files()[self.west])
+
+    def test_update_of_the_preprocessed_files(self):
+
+        preprocessor = Preprocessor()
+        preprocessor.halo = 1000
+        for path, core in [(self.west, (8.0, 53.0, 8.5, 53.5)), (self.east, (8.5, 53.0, 9.0, 53.5))]:
+            preprocessor.append_cache_file(path, preprocessor.cache_entry(preprocessor.file_statistics(path), core))
+        preprocessor.export_cache_file()
+        preprocessor.manifest.close()
+        preprocessor.statistics_cache.close()
+
+        Preprocessor(new_cache_file=False).update(self.change_file)
+
+        west = self.objects_of(self.west)
+        self.assertNotIn(('n', 6), west)
+        self.assertEqual({'highway': 'primary'}, west[('w', 12)])
+        self.assertEqual({'highway': 'residential'}, west[('w', 10)])
+
+        east = self.objects_of(self.east)
+        self.assertEqual({'highway': 'trunk'}, east[('w', 11)])
+        self.assertEqual({'highway': 'primary'}, east[('w', 12)])
+        self.assertEqual({'highway': 'service'}, east[('w', 13)])
+        self.assertEqual({'type': 'route', 'name': 'B 1'}, east[('r', 20)])
+        self.assertEqual([11, 12, 13], TileObjectIndex.load(self.east).ids['w'].tolist())
+
+        # The entries keep their core and get the bounds of the updated files
+        with open(glob.glob(os.path.join(self.path_to_preprocessed, 'cache_file_*.json'))[0]) as f:
+            cache_file = json.load(f)
+        west_entry = cache_file[self.west]
+        self.assertEqual({'lon min': 8.0, 'lon max': 8.5, 'lat min': 53.0, 'lat max': 53.5}, west_entry['core'])
+        self.assertEqual((8.1, 8.2), (float(west_entry['lon min']), float(west_entry['lon max'])))
+        self.assertEqual([], os.listdir(os.path.join('src', 'preprocessor', 'resources', 'buffer')))
+
+
+if __name__ == '__main__':
+    unittest.main()